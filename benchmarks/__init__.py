@@ -0,0 +1 @@
+"""Timing scripts for minichurch, run each one as a module from the repository root"""
@@ -0,0 +1,66 @@
+"""Compare building expressions through tokens and a parse tree with the single pass of build_source
+
+    python -m benchmarks.frontend --size 4
+"""
+import time
+
+import click
+
+from minichurch.lexer import lexer
+from minichurch.parser import definitions, parser
+
+from benchmarks.lexer import SAMPLE
+from benchmarks.suite import PRELUDE
+
+# applications of prelude definitions added to the sample, so references are resolved along with the names
+REFERENCES = 'add (mul one one) (pred (exp one one))\n'
+
+
+def library() -> definitions.Library:
+    """Fresh library with the definitions of the suite"""
+    output_val = definitions.Library()
+    output_val.index(PRELUDE.encode('utf-8'))
+    return output_val
+
+
+def tree(source: str):
+    """Scan the tokens, parse them into a syntax tree and build it"""
+    built = library()
+    return parser.build(parser.parse(lexer.Scanner(source, names=built.names)), library=built)
+
+
+def fused(source: str):
+    """Build the expression in one pass"""
+    return parser.build_source(source, library())
+
+
+def measure(front, source: str, repeat: int) -> float:
+    """Best wall time over the repeats"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        front(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@click.command()
+@click.option('--size', default=4.0, show_default=True, type=click.FloatRange(min=0, min_open=True), help='Size of the generated input in MB')
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(min=1), help='Number of runs, the best one is kept')
+def run(size, repeat):
+    """Time both front ends over the same generated input"""
+    line = SAMPLE + REFERENCES
+    source = line * int(size * 1e6 / len(line) + 1)
+    tokens = sum(1 for _ in lexer.Scanner(source, names=library().names))
+    print(f"Input: {len(source) / 1e6:.1f} MB, {tokens} tokens")
+    results = {}
+    for label, front in (('parse tree', tree), ('single pass', fused)):
+        elapsed = measure(front, source, repeat)
+        results[label] = elapsed
+        print(f"{label:>12}: {elapsed:.3f}s, {tokens / elapsed:,.0f} tokens/s")
+    print(f"Speedup: {results['parse tree'] / results['single pass']:.1f}x")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,87 @@
+"""Compare the optimal reduction of the interaction net engine with the solver and call-by-need on terms
+that copy a function whose body still holds redexes, and the read back of a large normal form
+
+    python -m benchmarks.inet --limit 10
+"""
+import time
+
+import click
+
+from minichurch.evaluator import memo, strategies, terms
+from minichurch.lexer import lexer
+from minichurch.parser import definitions, parser
+
+from benchmarks.suite import PRELUDE, numeral
+
+
+def identities(depth: int) -> str:
+    """Identity function wrapped in depth applications of the identity, each one a redex"""
+    return '(^y.y) (' * depth + '(^z.z)' + ')' * depth
+
+
+# workloads by name, (description, sizes, source builder)
+WORKLOADS = {
+    # n copies of a function whose body holds n redexes under its lambda, they are reduced n * n times without sharing
+    'shared-body': ("numeral n applied to ^x.(n identities) x", (32, 64, 128, 256, 512),
+                    lambda n: f"{numeral(n)} (^x.{identities(n)} x) a"),
+    # the identity built from 2 ** n copies of itself, the copies of a numeral share its reduced body
+    'exp-identity': ("numeral n applied to 2, the identity and a", (6, 8, 10, 12, 14),
+                     lambda n: f"{numeral(n)} {numeral(2)} (^x.x) a"),
+    # a normal form n applications deep, every occurrence of g is read back through the fans sharing the variable
+    'numeral-result': ("numeral n applied to g and z", (1000, 2000, 4000, 8000),
+                       lambda n: f"{numeral(n)} g z"),
+}
+# strategies that are timed, the first one gives the normal form the others are checked against
+COMPARED = ('need', 'subst', 'inet')
+
+
+def normal_form(source: str, strategy: str) -> tuple:
+    """Build and reduce a source with the prelude, returns the wall time and the term of the normal form"""
+    library = definitions.Library()
+    library.index(PRELUDE.encode('utf-8'))
+    output_val = parser.build(parser.parse(lexer.Scanner(source, names=library.names)), library=library)
+    start = time.perf_counter()
+    output_val = strategies.evaluate(output_val, strategy, cache=memo.create_cache(0))
+    elapsed = time.perf_counter() - start
+    return elapsed, terms.from_expression(output_val)
+
+
+@click.command()
+@click.option('--repeat', default=1, show_default=True, type=click.IntRange(min=1), help='Number of runs, the best one is kept')
+@click.option('--limit', default=10.0, show_default=True, type=click.FloatRange(min=0),
+              help='Seconds past which a strategy is no longer timed at the larger sizes of a workload')
+@click.option('--quick', is_flag=True, help='Flag to run only the two smallest sizes of each workload')
+def run(repeat, limit, quick):
+    """Time each workload with call-by-need, the subst solver and the inet engine at increasing sizes"""
+    print(f"{'workload':<20}" + ''.join(f"{strategy + ' (s)':>12}" for strategy in COMPARED))
+    differ = skipped = False
+    for workload, (_, sizes, build) in WORKLOADS.items():
+        # strategies that went past the limit at a smaller size
+        slow = set()
+        for size in sizes[:2] if quick else sizes:
+            source = build(size)
+            line = f"{workload + '/' + str(size):<20}"
+            expected = None
+            for strategy in COMPARED:
+                if strategy in slow:
+                    line += f"{'-':>12}"
+                    skipped = True
+                    continue
+                runs = [normal_form(source, strategy) for _ in range(repeat)]
+                elapsed = min(elapsed for elapsed, _ in runs)
+                if elapsed > limit:
+                    slow.add(strategy)
+                if expected is None:
+                    expected = runs[0][1]
+                same = runs[0][1] is expected
+                differ = differ or not same
+                line += f"{elapsed:>11.4f}{' ' if same else '*'}"
+            print(line, flush=True)
+    if differ:
+        print("* the normal form differs from the first strategy")
+    if skipped:
+        print(f"- took longer than {limit}s at a smaller size")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,62 @@
+"""Compare the token throughput of the chunked scanner with the one byte reader and per character lexer
+
+    python -m benchmarks.lexer --size 4
+"""
+import io
+import time
+
+import click
+
+from minichurch.lexer import lexer
+
+# source repeated to fill the input, only ascii since the one byte reader cannot decode wider characters
+SAMPLE = '(^f.^x.f (f (f x))) (^m.^n.^f.m (n f))\n(^x.x x) (^y.(y (^z.z)))\n'
+
+
+def streamfile(file):
+    """Read and decode one byte at a time, the way files used to be fed to the lexer"""
+    while True:
+        chunk = file.read(1).decode("utf-8")
+        if not chunk:
+            break
+        yield chunk
+
+
+def generator_chain(data: bytes) -> int:
+    """Count the tokens of the per character lexer fed by the one byte reader"""
+    return sum(1 for _ in lexer.lex(streamfile(io.BytesIO(data))))
+
+
+def scanner(data: bytes) -> int:
+    """Count the tokens of the chunked scanner"""
+    return sum(1 for _ in lexer.Scanner(io.BytesIO(data)))
+
+
+def measure(count, data: bytes, repeat: int) -> tuple:
+    """Best wall time over the repeats along with the number of tokens"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = count(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens
+
+
+@click.command()
+@click.option('--size', default=4.0, show_default=True, type=click.FloatRange(min=0, min_open=True), help='Size of the generated input in MB')
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(min=1), help='Number of runs, the best one is kept')
+def run(size, repeat):
+    """Time both lexer paths over the same generated input"""
+    data = (SAMPLE * int(size * 1e6 / len(SAMPLE) + 1)).encode('utf-8')
+    print(f"Input: {len(data) / 1e6:.1f} MB")
+    results = {}
+    for label, count in (('generator chain', generator_chain), ('scanner', scanner)):
+        elapsed, tokens = measure(count, data, repeat)
+        results[label] = elapsed
+        print(f"{label:>16}: {tokens} tokens in {elapsed:.3f}s, {tokens / elapsed:,.0f} tokens/s")
+    print(f"Speedup: {results['generator chain'] / results['scanner']:.1f}x")
+
+
+if __name__ == '__main__':
+    run()
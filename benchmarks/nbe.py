@@ -0,0 +1,52 @@
+"""Compare normalization by evaluation with the reference solver on the numeral and Y combinator workloads
+
+    python -m benchmarks.nbe --repeat 3
+"""
+import time
+
+import click
+
+from minichurch.evaluator import strategies, terms
+from minichurch.lexer import lexer
+from minichurch.parser import definitions, parser
+
+from benchmarks.suite import PRELUDE, WORKLOADS
+
+# workloads of the suite that are compared
+COMPARED = ('church-add', 'church-mul', 'church-exp', 'factorial', 'fibonacci')
+
+
+def normal_form(source: str, strategy: str) -> tuple:
+    """Build and reduce a source with the prelude, returns the wall time and the term of the normal form"""
+    library = definitions.Library()
+    library.index(PRELUDE.encode('utf-8'))
+    output_val = parser.build(parser.parse(lexer.Scanner(source, names=library.names)), library=library)
+    start = time.perf_counter()
+    output_val = strategies.evaluate(output_val, strategy)
+    elapsed = time.perf_counter() - start
+    return elapsed, terms.from_expression(output_val)
+
+
+@click.command()
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(min=1), help='Number of runs, the best one is kept')
+@click.option('--quick', is_flag=True, help='Flag to run only the smallest size of each workload')
+def run(repeat, quick):
+    """Time the reduction of each workload with the subst solver and the nbe backend"""
+    print(f"{'workload':<20}{'subst (s)':>11}{'nbe (s)':>11}{'speedup':>10}")
+    for workload in COMPARED:
+        _, sizes, build = WORKLOADS[workload]
+        for size in sizes[:1] if quick else sizes:
+            source = build(size)
+            times = {}
+            normals = {}
+            for strategy in ('subst', 'nbe'):
+                runs = [normal_form(source, strategy) for _ in range(repeat)]
+                times[strategy] = min(elapsed for elapsed, _ in runs)
+                normals[strategy] = runs[0][1]
+            same = '' if normals['subst'] is normals['nbe'] else '  normal forms differ'
+            print(f"{workload + '/' + str(size):<20}{times['subst']:>11.4f}{times['nbe']:>11.4f}"
+                  f"{times['subst'] / times['nbe']:>9.1f}x{same}", flush=True)
+
+
+if __name__ == '__main__':
+    run()
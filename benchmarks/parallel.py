@@ -0,0 +1,76 @@
+"""Time the parallel normalization of wide results against call-by-need with increasing numbers of workers
+
+    python -m benchmarks.parallel --width 16 --workers 4
+"""
+import os
+import time
+
+import click
+
+from minichurch.evaluator import memo, parallel, strategies, terms
+from minichurch.lexer import lexer
+from minichurch.parser import definitions, parser
+
+from benchmarks.suite import PRELUDE, church_list, numeral
+
+# workloads by name, each builds a term whose normal form holds width independent closed parts
+WORKLOADS = {
+    'fibonacci': lambda width: church_list([f"(fib {numeral(12)})" for _ in range(width)]),
+    'factorials': lambda width: church_list([f"(fact {numeral(6)})" for _ in range(width)]),
+    'products': lambda width: '(^p.p ' + ' '.join(f"(mul {numeral(100)} {numeral(100 + i)})" for i in range(width)) + ')',
+}
+
+
+def build(source: str):
+    """Build a source with the definitions of the suite"""
+    library = definitions.Library()
+    library.index(PRELUDE.encode('utf-8'))
+    return parser.build(parser.parse(lexer.Scanner(source, names=library.names)), library=library)
+
+
+def sequential(source: str, strategy: str) -> tuple:
+    """Reduce a source in this process, returns the wall time and the term of the normal form"""
+    expression = build(source)
+    start = time.perf_counter()
+    normal = strategies.evaluate(expression, strategy, cache=memo.create_cache(0))
+    return time.perf_counter() - start, terms.from_expression(normal)
+
+
+def split(source: str, pool) -> tuple:
+    """Reduce a source with its closed arguments normalized by a pool, returns the wall time and the normal form"""
+    expression = build(source)
+    start = time.perf_counter()
+    normal = parallel.normalize(expression, pool)
+    return time.perf_counter() - start, terms.from_expression(normal)
+
+
+@click.command()
+@click.option('--width', default=8, show_default=True, type=click.IntRange(min=1), help='Number of independent parts of each result')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, type=click.IntRange(min=1), help='Largest number of workers, every power of two up to it is timed')
+@click.option('--strategy', default='need', show_default=True, type=click.Choice(list(strategies.STRATEGIES)), help='Strategy of the workers')
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(min=1), help='Number of runs, the best one is kept')
+def run(width, workers, strategy, repeat):
+    """Time each workload reduced in this process with the strategy and with --parallel on pools of workers"""
+    counts = [count for count in (1 << power for power in range(workers.bit_length())) if count <= workers]
+    if counts[-1] != workers:
+        counts.append(workers)
+    print(f"{'workload':<14}{'sequential (s)':>16}" + ''.join(f"{f'{count} workers (s)':>18}" for count in counts))
+    differ = False
+    for workload, source in WORKLOADS.items():
+        source = source(width)
+        runs = [sequential(source, strategy) for _ in range(repeat)]
+        expected = runs[0][1]
+        line = f"{workload:<14}{min(elapsed for elapsed, _ in runs):>16.4f}"
+        for count in counts:
+            with parallel.start(count, strategy, 0) as pool:
+                runs = [split(source, pool) for _ in range(repeat)]
+            same = all(normal is expected for _, normal in runs)
+            differ = differ or not same
+            line += f"{min(elapsed for elapsed, _ in runs):>17.4f}{' ' if same else '*'}"
+        print(line, flush=True)
+    if differ:
+        print("* the normal form differs from the sequential one")
+
+
+if __name__ == '__main__':
+    run()
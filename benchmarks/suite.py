@@ -0,0 +1,166 @@
+"""Time standard lambda calculus workloads and compare them with a stored baseline
+
+    python -m benchmarks.suite --save
+    python -m benchmarks.suite --compare --threshold 0.1
+"""
+import io
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+
+import click
+
+import minichurch
+from minichurch.evaluator import memo, strategies, syntax
+from minichurch.lexer import lexer
+from minichurch.parser import definitions, parser
+
+from benchmarks.lexer import SAMPLE
+
+# results of a saved run, compared against with --compare
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# definitions shared by the reduction workloads
+PRELUDE = """
+true = ^x.^y.x
+false = ^x.^y.y
+zero = ^f.^x.x
+one = ^f.^x.f x
+add = ^m.^n.^f.^x.m f (n f x)
+mul = ^m.^n.^f.m (n f)
+exp = ^m.^n.n m
+pred = ^n.^f.^x.n (^g.^h.h (g f)) (^u.x) (^u.u)
+iszero = ^n.n (^x.false) true
+Y = ^f.(^x.f (x x)) (^x.f (x x))
+fact = Y (^r.^n.(iszero n) one (mul n (r (pred n))))
+fib = Y (^r.^n.(iszero n) zero ((iszero (pred n)) one (add (r (pred n)) (r (pred (pred n))))))
+"""
+
+
+def numeral(n: int) -> str:
+    """Church numeral of n"""
+    return '(^f.^x.' + 'f (' * n + 'x' + ')' * n + ')'
+
+
+def church_list(items: list) -> str:
+    """Right fold encoding of a list of terms"""
+    return '(^c.^n.' + ''.join(f'c {item} (' for item in items) + 'n' + ')' * len(items) + ')'
+
+
+# workloads by name, each is (kind, sizes, function building the input for a size)
+# reduce workloads are evaluated with the prelude, parse and lex workloads only go through the parser or the lexer
+WORKLOADS = {
+    'church-add': ('reduce', (100, 400, 1600), lambda n: f"add {numeral(n)} {numeral(n)}"),
+    'church-mul': ('reduce', (10, 20, 40), lambda n: f"mul {numeral(n)} {numeral(n)}"),
+    'church-exp': ('reduce', (3, 4, 5), lambda n: f"exp {numeral(n)} {numeral(n)}"),
+    'factorial': ('reduce', (2, 3, 4), lambda n: f"fact {numeral(n)}"),
+    'fibonacci': ('reduce', (4, 5, 6), lambda n: f"fib {numeral(n)}"),
+    'list-fold': ('reduce', (10, 40, 160), lambda n: f"{church_list([numeral(i % 5) for i in range(n)])} add zero"),
+    'nested-parens': ('parse', (1000, 10000, 100000), lambda n: '(' * n + 'x' + ')' * n),
+    'lexer-file': ('lex', (1, 4), lambda n: SAMPLE * (n * 1000000 // len(SAMPLE) + 1)),
+}
+
+
+def execute(kind: str, source: str, strategy: str) -> int:
+    """Run one input through its workload, returns the number of steps taken (beta steps or tokens)"""
+    if kind == 'lex':
+        return sum(1 for _ in lexer.Scanner(io.BytesIO(source.encode('utf-8'))))
+    if kind == 'parse':
+        # the explicit stack parser over the tokens of the scanner, without building the expression
+        parser.parse(lexer.Scanner(source))
+        return len(lexer.TOKEN.findall(source))
+    library = definitions.Library()
+    library.index(PRELUDE.encode('utf-8'))
+    output_val = parser.build_source(source, library=library)
+    output_val = strategies.evaluate(output_val, strategy, cache=memo.create_cache(0))
+    syntax.write(output_val)
+    return 0 if syntax.stats is None else syntax.stats.beta_steps
+
+
+def measure(kind: str, source: str, strategy: str, repeat: int) -> dict:
+    """Best wall time over the repeats, then one more run counting the steps and tracing the peak memory"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        execute(kind, source, strategy)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    syntax.stats = syntax.Stats()
+    tracemalloc.start()
+    try:
+        steps = execute(kind, source, strategy)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        syntax.stats = None
+    return {'wall': best, 'steps': steps, 'steps_per_sec': steps / best if best else 0.0, 'peak_memory': peak}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names of the workloads that got slower than the baseline by more than the threshold"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is not None and result['wall'] > before['wall'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+@click.command()
+@click.option('--only', default=None, help='Regular expression selecting the workloads to run, e.g. church')
+@click.option('--repeat', default=3, show_default=True, type=click.IntRange(min=1), help='Number of timed runs, the best one is kept')
+@click.option('--strategy', '-s', default=strategies.DEFAULT, type=click.Choice(list(strategies.STRATEGIES)), help='Reduction strategy of the reduce workloads')
+@click.option('--quick', is_flag=True, help='Flag to run only the smallest size of each workload')
+@click.option('--save', is_flag=True, help='Flag to store the results as the baseline')
+@click.option('--compare', 'check', is_flag=True, help='Flag to compare the results with the baseline, exits with 1 on a regression')
+@click.option('--baseline', default=BASELINE, show_default=True, type=click.Path(dir_okay=False), help='Path of the baseline json')
+@click.option('--threshold', default=0.1, show_default=True, type=click.FloatRange(min=0), help='Slowdown of the wall time (0.1 is 10%) counted as a regression')
+def run(only, repeat, strategy, quick, save, check, baseline, threshold):
+    """Time every workload at each of its sizes"""
+    stored = {}
+    if check:
+        if not os.path.exists(baseline):
+            # baselines are kept out of git, each machine records its own
+            raise click.ClickException(f"No baseline at {baseline}, record one with --save first")
+        with open(baseline) as file:
+            stored = json.load(file)
+        if stored.get('strategy') != strategy:
+            print(f"Baseline was recorded with the {stored.get('strategy')} strategy", file=sys.stderr)
+        stored = stored['results']
+    results = {}
+    print(f"{'workload':<22}{'wall (s)':>10}{'steps':>10}{'steps/s':>12}{'peak (MB)':>11}" + ('  vs baseline' if check else ''))
+    for workload, (kind, sizes, build) in WORKLOADS.items():
+        if only is not None and not re.search(only, workload):
+            continue
+        for size in sizes[:1] if quick else sizes:
+            name = f"{workload}/{size}"
+            result = results[name] = measure(kind, build(size), strategy, repeat)
+            line = (f"{name:<22}{result['wall']:>10.4f}{result['steps']:>10}{result['steps_per_sec']:>12,.0f}"
+                    f"{result['peak_memory'] / 1e6:>11.2f}")
+            before = stored.get(name)
+            if before is not None:
+                line += f"  {result['wall'] / before['wall'] - 1:+.1%}"
+                if result['wall'] > before['wall'] * (1 + threshold):
+                    line += ' REGRESSION'
+                if result['steps'] != before['steps']:
+                    line += f" (steps were {before['steps']})"
+            print(line, flush=True)
+    if save:
+        with open(baseline, 'w') as file:
+            json.dump({'version': minichurch.__version__, 'python': platform.python_version(),
+                       'strategy': strategy, 'results': results}, file, indent=2)
+        print(f"Saved baseline to {baseline}")
+    if check:
+        regressions = compare(results, stored, threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"No regressions over {threshold:.0%}")
+
+
+if __name__ == '__main__':
+    run()
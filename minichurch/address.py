@@ -0,0 +1,6 @@
+import os
+
+# socket the server listens on and the client connects to when no other path is given,
+# kept apart from the server so the client imports nothing else (tempfile is not imported for the same reason)
+DEFAULT_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp',
+                              f"minichurch-{os.getuid()}.sock")
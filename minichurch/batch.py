@@ -0,0 +1,212 @@
+import collections
+import concurrent.futures
+import itertools
+import json
+import signal
+import time
+import typing
+from concurrent.futures.process import BrokenProcessPool
+
+from minichurch.evaluator import budget, divergence, memo, strategies, syntax
+from minichurch.parser import definitions, parser
+
+# chunks kept waiting on the pool for each worker, so workers stay busy while results are written
+BACKLOG = 4
+
+
+class Timeout(Exception):
+    """Raised in a worker when an expression runs past the time limit"""
+
+
+class Worker:
+    """State of a worker process, kept between the expressions it evaluates"""
+    def __init__(self, prelude: str = None, strategy: str = strategies.DEFAULT,
+                 memo_size: int = memo.DEFAULT_SIZE, timeout: float = 0, stats: bool = False,
+                 limit: int = None, depth: int = None, share: bool = False, detect: bool = False):
+        self.library = definitions.Library()
+        if prelude is not None:
+            # only the definitions of the prelude are used, its expression is ignored
+            with open(prelude, 'rb') as file:
+                self.library.load(file)
+        self.strategy = strategy
+        self.cache = memo.create_cache(memo_size)
+        self.timeout = timeout
+        self.stats = stats  # add the statistics of each expression to its result
+        self.printing = (limit, depth, share)  # options of syntax.write for the results
+        self.detect = detect  # stop the solver once it loops, flag results that kept growing
+
+    def evaluate(self, expression: str, strategy: str = None, limits: budget.Budget = None) -> tuple:
+        """Parse, build and reduce an expression with a strategy (the worker's by default) within the limits if given.
+        Returns the string of its normal form and None, or the string of the term reached and the budget.Partial
+        of the limit that stopped it"""
+        with syntax.phase('build'):
+            output_val = parser.build_source(expression, library=self.library)
+        if output_val is None:
+            raise TypeError("Expected an expression")
+        with syntax.phase('solve'):
+            output_val = strategies.evaluate(output_val, strategy or self.strategy, cache=self.cache, limits=limits)
+        partial = None
+        if isinstance(output_val, budget.Partial):
+            partial, output_val = output_val, output_val.term
+        with syntax.phase('print'):
+            return syntax.write(output_val, *self.printing), partial
+
+    def run(self, item: tuple, strategy: str = None, timeout: float = None, steps: int = None) -> dict:
+        """Evaluate an (id, expression, error) item into its result record, failures are recorded instead of raised.
+        The strategy and timeout of the worker can be replaced for the item, steps limits the beta steps of subst.
+        An item that uses its steps up gets the term it reached as its result, and what stopped it as stopped"""
+        identifier, expression, error = item
+        record = {'id': identifier}
+        if error is not None:
+            record['error'] = error
+            return record
+        if timeout is None:
+            timeout = self.timeout
+        start = time.perf_counter()
+        if self.stats:
+            syntax.stats = syntax.Stats()
+        if self.detect:
+            syntax.watch = divergence.Watch()
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            record['result'], partial = self.evaluate(expression, strategy, None if steps is None else budget.Budget(steps))
+            if partial is not None:
+                record['stopped'] = partial.as_dict()
+        except Timeout:
+            record['error'] = f"Timeout: no normal form within {timeout:g}s"
+        except divergence.Diverges as e:
+            record['error'] = str(e)
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+        finally:
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        if self.detect:
+            if syntax.watch.growth is not None:
+                record['warning'] = syntax.watch.growth
+            syntax.watch = None
+        if self.stats:
+            record['stats'] = syntax.stats.as_dict()
+            syntax.stats = None
+        return record
+
+
+# worker of the current process, created by the pool initializer
+_worker = None
+
+
+def initialize(*settings):
+    """Set up a worker process with the arguments of Worker"""
+    global _worker
+    _worker = Worker(*settings)
+    signal.signal(signal.SIGALRM, expire)
+
+
+def expire(signum, frame):
+    raise Timeout()
+
+
+def evaluate_chunk(chunk: list) -> list:
+    """Evaluate a chunk of items in a worker process"""
+    return [_worker.run(item) for item in chunk]
+
+
+def evaluate_item(item: tuple, strategy: str = None, timeout: float = None, steps: int = None) -> dict:
+    """Evaluate a single item in a worker process with its own strategy and limits, see Worker.run"""
+    return _worker.run(item, strategy, timeout, steps)
+
+
+def read_lines(stream: typing.TextIO) -> typing.Generator[tuple, None, None]:
+    """Items of a stream with one expression per line, the id is the line number and blank lines are skipped"""
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            yield number, line, None
+
+
+def read_jsonl(stream: typing.TextIO) -> typing.Generator[tuple, None, None]:
+    """Items of a stream of json objects with an expression and an optional id (the line number otherwise)"""
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            yield record.get('id', number), str(record['expression']), None
+        except (ValueError, KeyError, AttributeError) as e:
+            yield number, None, f"Invalid record: {type(e).__name__}: {e}"
+
+
+def evaluate(items: typing.Iterable[tuple], workers: int, chunksize: int = 1, ordered: bool = True,
+             settings: tuple = ()) -> typing.Generator[dict, None, None]:
+    """Evaluate (id, expression, error) items over a pool of worker processes, yielding each result record
+    in input order or as soon as it is done. settings are the arguments of Worker.
+    When a worker process dies, the items it might have been running are tried again one at a time,
+    so only the item that kills a worker by itself is recorded as failed"""
+    items = iter(items)
+    chunks = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    # each slot is [chunk, future or None before it is submitted, True if it is run alone after a worker died]
+    slots = collections.deque()
+    executor = start(workers, settings)
+    try:
+        while True:
+            suspects = [slot for slot in slots if slot[2]]
+            if suspects:
+                # submit the next suspect once the one before it is done
+                if all(slot[1] is None or slot[1].done() for slot in suspects):
+                    waiting = next((slot for slot in suspects if slot[1] is None), None)
+                    if waiting is not None:
+                        waiting[1] = executor.submit(evaluate_chunk, waiting[0])
+            else:
+                while len(slots) < workers * BACKLOG:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    slots.append([chunk, executor.submit(evaluate_chunk, chunk), False])
+            if not slots:
+                return
+            if ordered:
+                slot = slots[0]
+                concurrent.futures.wait([slot[1]])
+            else:
+                running = {slot[1]: slot for slot in slots if slot[1] is not None}
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                slot = running[next(iter(done))]
+            try:
+                results = slot[1].result()
+            except BrokenProcessPool:
+                executor.shutdown(wait=True)
+                executor = start(workers, settings)
+                if slot[2]:
+                    # the item killed its worker while running alone
+                    slots.remove(slot)
+                    for identifier, _, _ in slot[0]:
+                        yield {'id': identifier, 'error': "Worker process exited unexpectedly"}
+                else:
+                    isolate(slots)
+                continue
+            slots.remove(slot)
+            yield from results
+    finally:
+        # a consumer that stops early leaves chunks waiting on the pool
+        for _, future, _ in slots:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=False)
+
+
+def start(workers: int, settings: tuple) -> concurrent.futures.ProcessPoolExecutor:
+    """Create the pool of worker processes"""
+    return concurrent.futures.ProcessPoolExecutor(workers, initializer=initialize, initargs=settings)
+
+
+def isolate(slots: collections.deque):
+    """Split every chunk that did not finish into items to run one at a time, keeping their order"""
+    isolated = []
+    for chunk, future, suspect in slots:
+        if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+            isolated.append([chunk, future, suspect])
+        else:
+            isolated.extend([[item], None, True] for item in chunk)
+    slots.clear()
+    slots.extend(isolated)
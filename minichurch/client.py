@@ -0,0 +1,75 @@
+# thin client of a running server, it only imports json, socket and argparse so a request does not pay for loading
+# the evaluator: python -m minichurch.client "add two two" or minichurch-client "add two two"
+import argparse
+import json
+import socket
+import sys
+import typing
+
+from minichurch.address import DEFAULT_SOCKET
+
+
+def send(requests: typing.Iterable[dict], path: str = DEFAULT_SOCKET) -> typing.Generator[dict, None, None]:
+    """Send json requests to a running server and yield the result records in the order the server finishes them"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        count = 0
+        for request in requests:
+            connection.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+        # the server answers the requests it has and closes the connection once they are done
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile('r', encoding='utf-8') as replies:
+            for _ in range(count):
+                line = replies.readline()
+                if not line:
+                    raise ConnectionError("The server closed the connection before answering every request")
+                yield json.loads(line)
+
+
+def evaluate(expressions: typing.Iterable[str], path: str = DEFAULT_SOCKET, **limits) -> typing.List[dict]:
+    """Evaluate expressions on a running server, returns their result records in input order.
+    limits are the strategy, timeout and steps of every request"""
+    requests = [dict(id=number, expression=expression, **limits) for number, expression in enumerate(expressions)]
+    records = [None] * len(requests)
+    for record in send(requests, path):
+        records[record['id']] = record
+    return records
+
+
+def write(records: typing.Iterable[dict], jsonl: bool = False):
+    """Print the result of each record, or the whole record as a json line.
+    A result that a limit stopped is followed by what stopped it on stderr, like a run with --max-steps"""
+    for record in records:
+        if jsonl:
+            print(json.dumps(record, ensure_ascii=False))
+        elif 'result' in record:
+            print(record['result'])
+            if 'stopped' in record:
+                print(f"stopped after {record['stopped']['steps']} steps: {record['stopped']['message']}",
+                      file=sys.stderr, flush=True)
+        else:
+            print(f"error: {record['error']}")
+
+
+def main(args: typing.List[str] = None):
+    """Evaluate expressions on a running server, each line of stdin is one when none are given"""
+    options = argparse.ArgumentParser(prog='minichurch-client', description=main.__doc__)
+    options.add_argument('expressions', nargs='*')
+    options.add_argument('--socket', dest='path', default=DEFAULT_SOCKET, help='Unix socket of the server (default: %(default)s)')
+    options.add_argument('--strategy', '-s', default=None, help="Reduction strategy, the server's by default")
+    options.add_argument('--timeout', default=None, type=float, help="Seconds each expression may take, the server's limit by default, 0 for no limit")
+    options.add_argument('--max-steps', dest='steps', default=None, type=int, help='Beta steps each expression may take (subst only)')
+    options.add_argument('--jsonl', action='store_true', help='Flag to write the result records as json lines')
+    options = options.parse_args(args)
+    expressions = options.expressions or [line for line in sys.stdin if line.strip()]
+    limits = {'strategy': options.strategy, 'timeout': options.timeout, 'steps': options.steps}
+    try:
+        records = evaluate(expressions, options.path, **{name: value for name, value in limits.items() if value is not None})
+    except OSError as e:
+        sys.exit(f"Error: No server answered on {options.path}: {e}")
+    write(records, options.jsonl)
+
+
+if __name__ == '__main__':
+    main()
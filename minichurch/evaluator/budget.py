@@ -0,0 +1,113 @@
+import time
+import tracemalloc
+
+from minichurch.evaluator import syntax
+
+# binding steps between two checks of the clock and of the traced memory
+CHECK_INTERVAL = 64
+# nodes measured per binding step on average, a term of size nodes is only measured every size // STRIDE steps
+STRIDE = 64
+# limits a budget can have, in the order they are checked
+LIMITS = ('steps', 'size', 'time', 'memory')
+
+
+class Exhausted(Exception):
+    """Raised by the reference solver when a limit of the run is used up"""
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit  # one of LIMITS
+
+
+class Partial:
+    """Where a run stopped when a limit of its budget was used up, returned by solve in place of a normal form"""
+    def __init__(self, term: syntax.Expression, steps: int, limit: str, message: str):
+        self.term = term  # the expression as far as it was reduced
+        self.steps = steps  # beta steps taken before the limit was hit
+        self.limit = limit  # one of LIMITS
+        self.message = message
+
+    def as_dict(self) -> dict:
+        return {'limit': self.limit, 'steps': self.steps, 'message': self.message}
+
+    def __str__(self):
+        return f"stopped after {self.steps} steps: {self.message}"
+
+
+class Budget:
+    """Limits of a run, checked by the reference solver while an instance is syntax.budget.
+    The step limit is exact. The clock and the traced memory are read every CHECK_INTERVAL steps and the size of the
+    term is measured every size // STRIDE steps, so the other limits can be passed by what those steps add.
+    memory counts the bytes allocated since start while tracemalloc traces them, it is started for the run if needed
+    and slows every allocation down while it runs"""
+    def __init__(self, steps: int = None, size: int = None, seconds: float = None, memory: int = None):
+        self.steps = steps  # beta steps the run may take, None for no limit
+        self.size = size  # nodes of the term being reduced
+        self.seconds = seconds  # wall time of the run
+        self.memory = memory  # bytes traced by tracemalloc
+        self.taken = 0
+        self.root = None  # expression being reduced, measured for the size limit
+        self._started = time.perf_counter()
+        self._baseline = 0  # bytes traced when the run started
+        self._tracing = False  # whether tracemalloc was started for the run
+        self._next_check = CHECK_INTERVAL
+        self._next_measure = 0
+
+    def start(self, expression: syntax.Expression):
+        """Begin a run reducing an expression"""
+        self.taken = 0
+        self.root = expression
+        self._next_check = CHECK_INTERVAL
+        self._next_measure = 0
+        if self.memory is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._baseline = tracemalloc.get_traced_memory()[0] if self.memory is not None else 0
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """End the run, tracemalloc is stopped if it was started for it"""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def step(self):
+        """A binding step is about to be taken, raises Exhausted instead once a limit is used up"""
+        if self.taken == self.steps:
+            raise Exhausted('steps', f"no normal form within {self.steps} steps")
+        if self.taken >= self._next_check:
+            self.check()
+        if self.size is not None and self.root is not None and self.taken >= self._next_measure:
+            self.measure()
+        self.taken += 1
+
+    def check(self):
+        """Raise Exhausted once the run took longer or traced more memory than allowed"""
+        self._next_check = self.taken + CHECK_INTERVAL
+        if self.seconds is not None and time.perf_counter() - self._started > self.seconds:
+            raise Exhausted('time', f"no normal form within {self.seconds:g}s")
+        if self.memory is not None and tracemalloc.get_traced_memory()[0] - self._baseline > self.memory:
+            raise Exhausted('memory', f"no normal form within {self.memory} bytes")
+
+    def measure(self):
+        """Raise Exhausted once the term being reduced is larger than allowed"""
+        nodes = syntax.size(self.root)
+        if nodes > self.size:
+            raise Exhausted('size', f"the term grew past {self.size} nodes")
+        self._next_measure = self.taken + max(nodes // STRIDE, 1)
+
+
+def solve(expression: syntax.Expression, limits: Budget, showstep=None, cache=None, target: str = syntax.NF):
+    """Reduce an expression with the reference solver within the limits of a budget.
+    Returns its normal form (or the head normal form of target), or a Partial holding the term reached
+    once a limit is used up"""
+    previous = syntax.budget
+    syntax.budget = limits
+    limits.start(expression)
+    try:
+        return syntax.solver(expression, showstep, cache, target)
+    except Exhausted as e:
+        # the step that hit the limit was not taken, so the term is whole
+        return Partial(expression.get(), limits.taken, e.limit, str(e))
+    finally:
+        limits.stop()
+        syntax.budget = previous
@@ -0,0 +1,210 @@
+import functools
+
+from minichurch.evaluator import machine, syntax, terms
+from minichurch.parser import parser
+
+# arithmetic arguments evaluated inside one another before falling back to plain beta steps,
+# each level is a nested machine run on the Python stack and takes four frames, well within the recursion limit
+MAX_DEPTH = 128
+
+
+class Native:
+    """Church numeral (int) or boolean (bool) carried as a Python value in place of a term.
+    It is expanded back into its lambda term once it is applied to something or read back"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def decode(term: terms.Term):
+    """Number of a term that is a Church numeral λf.λx.f (... (f x)), None for any other term"""
+    if type(term) is not terms.Lam or type(term.body) is not terms.Lam:
+        return None
+    body = term.body.body
+    count = 0
+    while type(body) is terms.App and type(body.left) is terms.Var and body.left.index == 1:
+        count += 1
+        body = body.right
+    return count if type(body) is terms.Var and body.index == 0 else None
+
+
+@functools.lru_cache(maxsize=256)
+def numeral(count: int) -> terms.Term:
+    """Term of the Church numeral of count"""
+    body = terms.Var(0)
+    function = terms.Var(1)
+    for _ in range(count):
+        body = terms.App(function, body)
+    return terms.Lam(terms.Lam(body, 'x'), 'f')
+
+
+def expand(value) -> terms.Term:
+    """Lambda term of a native value, false is the same term as zero"""
+    if value is True:
+        return TRUE
+    return numeral(int(value))
+
+
+def compile_term(source: str) -> terms.Term:
+    """Term of a closed lambda calculus source"""
+    return terms.from_expression(parser.build_source(source))
+
+
+TRUE = compile_term('^x.^y.x')
+
+
+# operations take a function that evaluates an argument closure to an int (None when it is not a numeral)
+# and the argument closures, they return the native result or None to leave the term to beta steps.
+# Arguments are evaluated in the order the normal form of the combinator needs them,
+# so an argument that plain reduction would never look at is never evaluated either
+def succ(number, n):
+    value = number(n)
+    return None if value is None else value + 1
+
+
+def add(number, m, n):
+    left = number(m)
+    if left is None:
+        return None
+    right = number(n)
+    return None if right is None else left + right
+
+
+def mul(number, m, n):
+    left = number(m)
+    if left is None:
+        return None
+    if left == 0:
+        return 0  # zero applies n f to nothing
+    right = number(n)
+    return None if right is None else left * right
+
+
+def power(number, m, n):
+    exponent = number(n)
+    if not exponent:
+        return None  # n m with a zero n is the identity, which is not a numeral
+    base = number(m)
+    return None if base is None else base ** exponent
+
+
+def pred(number, n):
+    value = number(n)
+    return None if value is None else max(value - 1, 0)
+
+
+def sub(number, m, n):
+    right = number(n)
+    if right is None:
+        return None
+    left = number(m)
+    return None if left is None else max(left - right, 0)
+
+
+def iszero(number, n):
+    value = number(n)
+    return None if value is None else value == 0
+
+
+# standard encodings of the combinators, hash consing makes every alpha-equivalent definition the same term
+COMBINATORS = {
+    succ: ('^n.^f.^x.f (n f x)', '^n.^f.^x.n f (f x)'),
+    add: ('^m.^n.^f.^x.m f (n f x)', '^m.^n.^f.^x.n f (m f x)', '^m.^n.m (^n.^f.^x.f (n f x)) n'),
+    mul: ('^m.^n.^f.m (n f)', '^m.^n.^f.^x.m (n f) x'),
+    power: ('^m.^n.n m',),
+    pred: ('^n.^f.^x.n (^g.^h.h (g f)) (^u.x) (^u.u)',),
+    sub: ('^m.^n.n (^n.^f.^x.n (^g.^h.h (g f)) (^u.x) (^u.u)) m',),
+    iszero: ('^n.n (^x.^a.^b.b) (^a.^b.a)',),
+}
+# operation and number of arguments by the term of each combinator
+OPERATIONS = {compile_term(source): (operation, operation.__code__.co_argcount - 1)
+              for operation, sources in COMBINATORS.items() for source in sources}
+
+
+def number_of(closure, depth: int):
+    """Evaluate an argument closure and return its number, None if it is not a numeral.
+    The thunk is updated with its weak head normal form as a call-by-need use of it would"""
+    if isinstance(closure, syntax.Name):
+        return None
+    term = closure.term
+    if not closure.evaluated:
+        if depth >= MAX_DEPTH:
+            return None
+        stack = [machine.Update(closure)]
+        term, _ = whnf(closure.term, closure.env, stack, depth + 1)
+        if stack:
+            return None  # stuck on a name that is being read back
+    if type(term) is Native:
+        return None if term.value is True else int(term.value)
+    return decode(term)
+
+
+def whnf(term, env: tuple, stack: list, depth: int = 0):
+    """Run the call-by-need machine of machine.whnf_shared until the term reaches weak head normal form.
+    A combinator from OPERATIONS applied to enough numerals is replaced by the Native value of its result"""
+    while True:
+        kind = type(term)
+        if kind is terms.App:
+            right = term.right
+            if type(right) is terms.Var:
+                stack.append(machine.lookup(env, right.index))
+            else:
+                stack.append(machine.Thunk(right, env))
+            term = term.left
+        elif kind is terms.Lam:
+            if not stack:
+                return term, env
+            operation = OPERATIONS.get(term)
+            if operation is not None and len(stack) >= operation[1]:
+                function, arity = operation
+                arguments = stack[:-arity - 1:-1]
+                if not any(type(argument) is machine.Update for argument in arguments):
+                    result = function(lambda closure: number_of(closure, depth), *arguments)
+                    if result is not None:
+                        del stack[-arity:]
+                        term, env = Native(result), None
+                        continue
+            argument = stack.pop()
+            if type(argument) is machine.Update:
+                thunk = argument.thunk
+                thunk.term, thunk.env, thunk.evaluated = term, env, True
+                continue
+            env = (argument, env)
+            term = term.body
+        elif kind is terms.Var:
+            closure = machine.lookup(env, term.index)
+            if isinstance(closure, syntax.Name):
+                return term, env
+            if not closure.evaluated:
+                stack.append(machine.Update(closure))
+            term, env = closure.term, closure.env
+        elif kind is Native:
+            if not stack:
+                return term, env
+            if type(stack[-1]) is machine.Update:
+                thunk = stack.pop().thunk
+                thunk.term, thunk.env, thunk.evaluated = term, None, True
+                continue
+            # used as a function, go on with its lambda term
+            term, env = expand(term.value), None
+        else:
+            return term, env
+
+
+def whnf_readback(term: terms.Term, env: tuple, stack: list):
+    """whnf for the readback, a Native result is expanded into its lambda term"""
+    term, env = whnf(term, env, stack)
+    if type(term) is Native:
+        return expand(term.value), None
+    return term, env
+
+
+def normalize_term(term: terms.Term) -> syntax.Expression:
+    """Reduce a term to its normal form with call-by-need and native Church arithmetic"""
+    return machine.normalize_shared(term, whnf_readback)
+
+
+def normalize(expression: syntax.Expression, cache=None) -> syntax.Expression:
+    """Reduce an expression to its normal form with native Church arithmetic, reusing a cache of normal forms if given"""
+    return machine.normalize(expression, cache, normalize_term)
@@ -0,0 +1,100 @@
+import collections
+import typing
+
+from minichurch.evaluator import syntax, terms
+
+# states that are remembered, a cycle longer than this many of them is not noticed
+HISTORY = 4096
+# nodes fingerprinted per binding step on average, a state of size nodes is only taken every size // STRIDE steps
+STRIDE = 64
+# size checks in a row at which the term has to be larger than at the one before for it to be flagged as growing
+GROWTH_CHECKS = 10
+
+
+class Diverges(Exception):
+    """Raised by the reference solver when the expression it reduces comes back to a state it was in before"""
+    def __init__(self, length: int, step: int):
+        super().__init__(f"diverges: cycle of length {length} at step {step}")
+        self.length = length
+        self.step = step
+
+
+class Watch:
+    """Loop detection for the reference solver, collected while an instance is syntax.watch.
+    A state is the term of the expression being reduced, terms are hash consed so alpha-equivalent states are the same
+    object. What is around that expression no longer changes, so the states are only compared until the solver moves
+    on to another part of the term. Taking a state costs a pass over it, so a large one is only taken every so many
+    steps: the states taken still follow each other deterministically and repeat once the reduction loops, then every
+    step is taken until the repeated state comes back to measure the exact length of the cycle.
+    The size of the state is checked after 1, 2, 4... steps and flagged as growing once it got larger at every one
+    of the last GROWTH_CHECKS checks, the flag is a warning since a long computation can grow for as long"""
+    def __init__(self, history: int = HISTORY, stream: typing.TextIO = None):
+        self.history = history
+        self.stream = stream  # where the growth warning is written as soon as it is flagged, if anywhere
+        self.expression = None
+        self.steps = 0
+        self.growth = None  # message of the growth warning once it is flagged
+        self._seen = {}  # step of each remembered state
+        self._order = collections.deque()  # remembered states, oldest first
+        self._next_state = 1  # step at which the next state is taken
+        self._every_since = 0  # step since which a state was taken after every step
+        self._repeated = None  # (state, step) of a repeated state once the exact cycle is being measured
+        self._sizes = collections.deque(maxlen=GROWTH_CHECKS + 1)
+        self._next_check = 1
+
+    def enter(self, expression: syntax.Expression):
+        """The solver starts reducing an expression, the states of the one before cannot come back.
+        The solver enters every part of the term it walks through, so the first state is only taken after the next
+        step and walking over parts that are already reduced costs nothing"""
+        self.expression = expression
+        if self._order:
+            self._seen.clear()
+            self._order.clear()
+        self._repeated = None
+        self._every_since = self.steps
+        self._next_state = self.steps + 1
+
+    def remember(self, state: terms.Term):
+        self._seen[state] = self.steps
+        self._order.append(state)
+        if len(self._order) > self.history:
+            del self._seen[self._order.popleft()]
+        stride = state.size // STRIDE
+        if stride > 1:
+            self._every_since = self.steps + stride
+        self._next_state = self.steps + max(stride, 1)
+
+    def step(self):
+        """A binding step is done, raises Diverges once the cycle of a state that was seen before is measured"""
+        self.steps += 1
+        if self.expression is None or self.steps < self._next_state:
+            return
+        state = terms.from_expression(self.expression)
+        if self._repeated is not None:
+            if state is self._repeated[0]:
+                raise Diverges(self.steps - self._repeated[1], self.steps)
+            self._next_state = self.steps + 1
+            return
+        if state in self._seen:
+            if self._seen[state] >= self._every_since:
+                raise Diverges(self.steps - self._seen[state], self.steps)
+            # steps were skipped since then, the cycle is shorter by a whole number of times
+            self._repeated = (state, self.steps)
+            self._next_state = self.steps + 1
+            return
+        self.remember(state)
+        if self.steps >= self._next_check:
+            self._next_check = 2 * self.steps
+            self.check(state.size)
+
+    def check(self, size: int):
+        """Flag the term as growing when its size went up at each of the last checks"""
+        self._sizes.append(size)
+        if self.growth is not None or len(self._sizes) <= GROWTH_CHECKS:
+            return
+        if all(before < after for before, after in zip(self._sizes, list(self._sizes)[1:])):
+            self.growth = (f"may diverge: the term grew at each of the last {GROWTH_CHECKS} checks, "
+                           f"to {size} nodes at step {self.steps}")
+            if self.stream is not None:
+                self.stream.write(f"warning: {self.growth}\n")
+                self.stream.flush()
@@ -0,0 +1,454 @@
+from minichurch.evaluator import machine, syntax, terms
+
+# kinds of node, every node has a principal port (slot 0) and up to two auxiliary ports (slots 1 and 2)
+ROOT = 0  # holds the term on slot 1
+LAM = 1  # slot 1 is the body, slot 2 the variable
+APP = 2  # principal faces the function, slot 1 is the argument, slot 2 the result
+FAN = 3  # shares what its principal faces between its two auxiliary ports
+CROISSANT = 4  # occurrence of a variable, leaving its box
+BRACKET = 5  # door of an argument box on a variable that comes from outside of it
+ERASER = 6  # end of an unused variable or of an erased term
+FREE = 7  # name that no function binds, the variable wire of every occurrence ends on slot 1
+
+# auxiliary ports of each kind of node, taking part in the interactions of its principal port
+ARITY = (0, 2, 2, 2, 1, 1, 0, 0)
+# change to the level of a node that passes through a node of a lower level
+SHIFT = (0, 0, 0, 0, -1, 1, 0, 0)
+
+# empty entry of a context and empty stack of entries, see Contexts
+EMPTY = 0
+# lowest level of a path that went through no nodes
+UNBOUNDED = float('inf')
+
+
+class Unreadable(Exception):
+    """Raised when the net of a term reaches a shape that the rules or the read back do not cover"""
+
+
+class Net:
+    """Interaction net of a term, nodes are indices into flat lists and a port is node << 2 | slot.
+    Levels follow Lamping's algorithm: a function argument is a box one level deeper than the application,
+    variables leave boxes through brackets and croissants, so a fan only meets the fan it was paired with at translation"""
+    def __init__(self):
+        self.kind = []
+        self.level = []
+        self.link = []  # four entries per node, the port each slot is connected to or -1
+        self.stuck = []  # nodes whose principal port is known to face an auxiliary port for good
+        self.symbol = {}  # symbol of each FREE node
+        self.hint = {}  # symbol printed for the variable of each LAM node
+        self.unused = []  # indices of nodes that were freed
+        self.root = None
+        self.interactions = 0
+
+    def node(self, kind: int, level: int = 0) -> int:
+        if self.unused:
+            node = self.unused.pop()
+            self.kind[node] = kind
+            self.level[node] = level
+            self.stuck[node] = False
+            self.link[node << 2:(node << 2) + 3] = (-1, -1, -1)
+        else:
+            node = len(self.kind)
+            self.kind.append(kind)
+            self.level.append(level)
+            self.stuck.append(False)
+            self.link.extend((-1, -1, -1, -1))
+        return node
+
+    def connect(self, a: int, b: int):
+        self.link[a] = b
+        self.link[b] = a
+
+    def free(self, node: int):
+        self.symbol.pop(node, None)
+        self.hint.pop(node, None)
+        self.unused.append(node)
+
+    def interact(self, a: int, b: int):
+        """Rewrite two nodes whose principal ports face each other"""
+        self.interactions += 1
+        kind, level, link = self.kind, self.level, self.link
+        ka, kb = kind[a], kind[b]
+        if ka == ERASER or kb == ERASER:
+            # erase the other node, its auxiliary ports get erasers of their own
+            other = b if ka == ERASER else a
+            for slot in range(1, ARITY[kind[other]] + 1):
+                self.connect(self.node(ERASER) << 2, link[other << 2 | slot])
+            self.free(a)
+            self.free(b)
+        elif ka != kb and ka in (LAM, APP) and kb in (LAM, APP):
+            if level[a] != level[b]:
+                raise Unreadable("Application and function met on different levels")
+            lam, app = (a, b) if ka == LAM else (b, a)
+            # beta step: the result is the body and the variable is the argument
+            self.fuse(((lam << 2 | 1, app << 2 | 2), (lam << 2 | 2, app << 2 | 1)))
+            self.free(a)
+            self.free(b)
+        elif ka == kb and level[a] == level[b]:
+            if ka in (LAM, APP):
+                raise Unreadable("Two functions or applications met")
+            # annihilate, the auxiliary ports are joined in order
+            self.fuse(tuple((a << 2 | slot, b << 2 | slot) for slot in range(1, ARITY[ka] + 1)))
+            self.free(a)
+            self.free(b)
+        elif level[a] == level[b] or ka == kb and ka in (LAM, APP):
+            raise Unreadable("Nodes met on a level that they cannot pass each other on")
+        else:
+            self.commute(a, b)
+
+    def fuse(self, pairs: tuple):
+        """Join the outside neighbours of each pair of ports that are removed"""
+        link = self.link
+        removed = {}
+        for x, y in pairs:
+            removed[x] = y
+            removed[y] = x
+        for x, y in pairs:
+            # follow wires that go through other removed ports, a wire that closes on itself disappears
+            ends = []
+            for start in (x, y):
+                port = link[start]
+                seen = 0
+                while port in removed and seen <= len(removed):
+                    port = link[removed[port]]
+                    seen += 1
+                ends.append(None if port in removed else port)
+            if ends[0] is not None and ends[1] is not None:
+                self.connect(ends[0], ends[1])
+
+    def commute(self, a: int, b: int):
+        """Let two nodes pass each other, each is copied onto the auxiliary ports of the other.
+        The node on the higher level has the level of its copies moved by the kind of the lower one"""
+        kind, level, link = self.kind, self.level, self.link
+        if level[a] > level[b]:
+            a, b = b, a
+        ka, kb = kind[a], kind[b]
+        la, lb = level[a], level[b] + SHIFT[ka]
+        arity_a, arity_b = ARITY[ka], ARITY[kb]
+        # copies of b go on the auxiliary ports of a and the other way round
+        copies_a = [self.node(ka, la) for _ in range(arity_b)]
+        copies_b = [self.node(kb, lb) for _ in range(arity_a)]
+        for copy in copies_a:
+            if a in self.hint:
+                self.hint[copy] = self.hint[a]
+        for copy in copies_b:
+            if b in self.hint:
+                self.hint[copy] = self.hint[b]
+        target = {}
+        for k in range(arity_a):
+            target[a << 2 | k + 1] = copies_b[k] << 2
+        for l in range(arity_b):
+            target[b << 2 | l + 1] = copies_a[l] << 2
+        outside = {port: link[port] for port in target}
+        for port, neighbour in outside.items():
+            if neighbour in target:
+                link[target[port]] = target[neighbour]
+            else:
+                self.connect(target[port], neighbour)
+        for k in range(arity_a):
+            for l in range(arity_b):
+                self.connect(copies_b[k] << 2 | l + 1, copies_a[l] << 2 | k + 1)
+        self.free(a)
+        self.free(b)
+
+    def evaluate(self, start: int) -> int:
+        """Reduce the wire leaving a port until the port at its other end is a principal port
+        or an auxiliary port of a node that is stuck, and return that port"""
+        kind, link, stuck = self.kind, self.link, self.stuck
+        # ports whose wire is reduced, each after the first is the principal port of the node the one before reaches
+        path = [start]
+        while True:
+            port = link[path[-1]]
+            node = port >> 2
+            if port & 3 == 0:
+                if len(path) == 1:
+                    return port
+                # the node the path went through faces another principal port
+                self.interact(path.pop() >> 2, node)
+                continue
+            current = kind[node]
+            if stuck[node] or current == LAM and port & 3 == 2 or current == FREE:
+                # the head of the wire is a variable, every node on the way is stuck
+                for ported in path[:-1]:
+                    stuck[link[ported] >> 2] = True
+                return link[start]
+            if current in (LAM, ROOT, ERASER) or current == APP and port & 3 != 2:
+                raise Unreadable("A wire leads into the body of a function or the argument of an application")
+            path.append(node << 2)
+
+
+def translate(term: terms.Term) -> Net:
+    """Build the net of a closed term, names that no function binds end on FREE nodes"""
+    net = Net()
+    # each result is (port of the term's value, {binder depth or free symbol: port of its variable wire})
+    results = []
+    # each task is (term, level, number of lambdas around it) or (None, Lam or App, level, depth, hint) to join its parts
+    tasks = [(term, 0, 0)]
+    while tasks:
+        task = tasks.pop()
+        if task[0] is None:
+            _, kind, level, depth, hint = task
+            if kind is terms.Lam:
+                body, variables = results.pop()
+                lam = net.node(LAM, level)
+                net.hint[lam] = hint
+                net.connect(lam << 2 | 1, body)
+                wire = variables.pop(depth, None)
+                net.connect(lam << 2 | 2, net.node(ERASER) << 2 if wire is None else wire)
+                results.append((lam << 2, variables))
+            else:
+                argument, inner = results.pop()
+                function, variables = results.pop()
+                app = net.node(APP, level)
+                net.connect(app << 2, function)
+                net.connect(app << 2 | 1, argument)
+                for key, wire in inner.items():
+                    # the variable leaves the box of the argument through a door
+                    bracket = net.node(BRACKET, level)
+                    net.connect(bracket << 2 | 1, wire)
+                    if key in variables:
+                        fan = net.node(FAN, level)
+                        net.connect(fan << 2 | 1, variables[key])
+                        net.connect(fan << 2 | 2, bracket << 2)
+                        variables[key] = fan << 2
+                    else:
+                        variables[key] = bracket << 2
+                results.append((app << 2 | 2, variables))
+            continue
+        term, level, depth = task
+        kind = type(term)
+        if kind is terms.Var or kind is terms.Free:
+            croissant = net.node(CROISSANT, level)
+            key = depth - 1 - term.index if kind is terms.Var else term.symbol
+            results.append((croissant << 2 | 1, {key: croissant << 2}))
+        elif kind is terms.Lam:
+            tasks.append((None, terms.Lam, level, depth, term.hint))
+            tasks.append((term.body, level, depth + 1))
+        else:
+            tasks.append((None, terms.App, level, depth, None))
+            tasks.append((term.right, level + 1, depth))
+            tasks.append((term.left, level, depth))
+    root, variables = results.pop()
+    net.root = net.node(ROOT)
+    net.connect(net.root << 2 | 1, root)
+    for key, wire in variables.items():
+        if not isinstance(key, str):
+            raise ValueError("Only terms without loose de Bruijn indices can be translated")
+        free = net.node(FREE)
+        net.symbol[free] = key
+        net.connect(free << 2 | 1, wire)
+    return net
+
+
+class Contexts:
+    """Contexts of a read back, kept as persistent stacks so the tasks that start from a context share it.
+    Entries and stacks are tuples interned in one table and referred to by id, so equal ones have the same id and 0 is
+    both the empty entry and the empty stack. A fan entry is (negated slot, entry it covers) and a joined level is
+    (entry of the lower level, entry of the upper level).
+    A context is (level, stack under the level, stack from the level up). The stacks only hold the levels that are
+    not empty: (level, entry, rest) under the level, the highest first, and (distance, entry, rest) from it up,
+    counted from the level or from the entry before. Moving the level to the node of an operation crosses only the
+    entries in between, adding or dropping a level changes the distance of the first entry above it, and the stack
+    under the level of a function is the id its binders are looked up by"""
+    def __init__(self):
+        self.ids = {}
+        self.parts = [None]
+
+    def intern(self, parts: tuple) -> int:
+        found = self.ids.get(parts)
+        if found is None:
+            found = self.ids[parts] = len(self.parts)
+            self.parts.append(parts)
+        return found
+
+    def shift(self, upper: int, by: int) -> int:
+        """Stack of the levels from a level up with all of them moved by a number of levels"""
+        if upper == EMPTY or by == 0:
+            return upper
+        distance, entry, rest = self.parts[upper]
+        return self.intern((distance + by, entry, rest))
+
+    def take(self, upper: int) -> tuple:
+        """Entry of the level a stack is counted from and the stack of the levels above it, counted from the same level"""
+        if upper != EMPTY:
+            distance, entry, rest = self.parts[upper]
+            if distance == 0:
+                return entry, rest
+        return EMPTY, upper
+
+    def put(self, entry: int, above: int) -> int:
+        """Stack of an entry on the level the stack of the levels above it is counted from"""
+        return above if entry == EMPTY else self.intern((0, entry, above))
+
+    def focus(self, context: tuple, at: int) -> tuple:
+        """Stacks of the entries under a level and from the level up"""
+        level, lower, upper = context
+        parts = self.parts
+        while upper != EMPTY and level + parts[upper][0] < at:
+            distance, entry, upper = parts[upper]
+            level += distance
+            lower = self.intern((level, entry, lower))
+        while lower != EMPTY and parts[lower][0] >= at:
+            below, entry, lower = parts[lower]
+            upper = self.intern((0, entry, self.shift(upper, level - below)))
+            level = below
+        return lower, self.shift(upper, level - at)
+
+    def below(self, context: tuple, at: int) -> int:
+        """Stack of the entries of a context for the levels under a level"""
+        return self.focus(context, at)[0]
+
+    def enter(self, context: tuple, kind: int, at: int, slot: int) -> tuple:
+        """Context after going from an auxiliary port of a node at a level out of its principal port"""
+        lower, upper = self.focus(context, at)
+        if kind == FAN:
+            entry, above = self.take(upper)
+            upper = self.put(self.intern((-slot, entry)), above)
+        elif upper == EMPTY:
+            # adding, or joining, empty levels past the end leaves the context as it is
+            pass
+        elif kind == CROISSANT:
+            upper = self.shift(upper, 1)
+        else:
+            entry, above = self.take(upper)
+            # the levels above the one joined in move down onto it
+            joined, above = self.take(self.shift(above, -1))
+            if entry != EMPTY or joined != EMPTY:
+                joined = self.intern((entry, joined))
+            upper = self.put(joined, above)
+        return at, lower, upper
+
+    def leave(self, context: tuple, kind: int, at: int) -> tuple:
+        """Context after going from the principal port of a node at a level out of an auxiliary port,
+        returns it with the slot of the port"""
+        lower, upper = self.focus(context, at)
+        entry, above = self.take(upper)
+        if kind == FAN:
+            if entry == EMPTY or self.parts[entry][0] >= 0:
+                raise Unreadable("A fan is left without the port it was entered from")
+            slot, covered = self.parts[entry]
+            return (at, lower, self.put(covered, above)), -slot
+        if upper == EMPTY:
+            return (at, lower, upper), 1
+        if kind == CROISSANT:
+            return (at, lower, self.shift(above, -1)), 1
+        if entry == EMPTY:
+            entry = (EMPTY, EMPTY)
+        elif self.parts[entry][0] < 0:
+            raise Unreadable("A bracket splits a level that was not joined")
+        else:
+            entry = self.parts[entry]
+        # the levels above the one split move up to make room for its upper half
+        return (at, lower, self.put(entry[0], self.shift(self.put(entry[1], above), 1))), 1
+
+
+def read_back(net: Net) -> syntax.Expression:
+    """Reduce the net from its root and read the normal form back as a new expression.
+    Only the pairs the read back runs into are rewritten, so parts of the net that are erased are never reduced.
+    A path through the net carries a context with an entry for each level: fans push the port they were entered
+    from and pop it to choose a port on the way out, croissants add or drop a level and brackets join or split two.
+    A variable belongs to the read function that was reached through the same node with the same context below its level.
+    Nodes that a path only enters on its way to a variable change the context from their own level up, so once a
+    path has gone that way the nodes on it jump straight to the variable, until the net is rewritten again"""
+    kind, level, link = net.kind, net.level, net.link
+    contexts = Contexts()
+    # node -> (port of the variable its principal port leads to through entered nodes, lowest level on the way)
+    jumps = {}
+    rewritten = net.interactions  # interactions when the jumps were recorded
+    chain = []  # nodes entered since the path last read or left a node
+    lowest = UNBOUNDED  # lowest level of the jump taken since then
+    free_names = {}
+    # (LAM node, stack under its level) -> names of the read functions around the task, the innermost last
+    bound = {}
+    root = syntax.Application()
+    # each task is (port to read from, context, parent expression, attribute of the parent to fill)
+    # or (None, binder key) to leave the function of the key once its body is read
+    tasks = [(net.root << 2 | 1, (0, EMPTY, EMPTY), root, 'left')]
+    while tasks:
+        task = tasks.pop()
+        if task[0] is None:
+            bound[task[1]].pop()
+            continue
+        port, context, parent, slot = task
+        chain.clear()
+        lowest = UNBOUNDED
+        while True:
+            port = net.evaluate(port)
+            if net.interactions != rewritten:
+                # the nodes entered so far might lead elsewhere now
+                jumps.clear()
+                chain.clear()
+                lowest = UNBOUNDED
+                rewritten = net.interactions
+            node = port >> 2
+            current = kind[node]
+            at = level[node]
+            if port & 3 == 0:
+                if current == LAM:
+                    name = syntax.Name(net.hint.get(node) or 'x')
+                    expression = syntax.Function(name)
+                    key = (node, contexts.below(context, at))
+                    bound.setdefault(key, []).append(name)
+                    tasks.append((None, key))  # the name goes out of scope after the body
+                    tasks.append((node << 2 | 1, context, expression, 'inner_data'))
+                    break
+                if current not in (FAN, CROISSANT, BRACKET):
+                    raise Unreadable("A wire leads into an erased term")
+                context, out = contexts.leave(context, current, at)
+                port = node << 2 | out
+                chain.clear()
+            elif current == APP:
+                expression = syntax.Application()
+                tasks.append((node << 2 | 1, context, expression, 'right'))
+                tasks.append((node << 2, context, expression, 'left'))
+                break
+            elif current == LAM:
+                names = bound.get((node, contexts.below(context, at)))
+                if not names:
+                    raise Unreadable("A variable is not bound by a function that was read")
+                expression = names[-1]
+                remember(jumps, chain, port, lowest, level)
+                break
+            elif current == FREE:
+                symbol = net.symbol[node]
+                if symbol not in free_names:
+                    free_names[symbol] = syntax.Name(symbol)
+                expression = free_names[symbol]
+                remember(jumps, chain, port, lowest, level)
+                break
+            else:
+                jump = jumps.get(node)
+                if jump is not None and (kind[jump[0] >> 2] == FREE or jump[1] >= level[jump[0] >> 2]):
+                    # the context under the level of the function is left as it is on the way,
+                    # reading from the other end of the wire of the variable reaches it again
+                    lowest = min(lowest, jump[1])
+                    port = link[jump[0]]
+                    continue
+                chain.append(node)
+                context = contexts.enter(context, current, at, port & 3)
+                port = node << 2
+        setattr(parent, slot, expression)
+    return root.left
+
+
+def remember(jumps: dict, chain: list, port: int, lowest: int, level: list):
+    """Let each node of a chain of entered nodes jump to the variable port the chain ended at,
+    lowest is the lowest level of a jump taken at the end of the chain"""
+    for node in reversed(chain):
+        lowest = min(lowest, level[node])
+        jumps[node] = (port, lowest)
+    chain.clear()
+
+
+def normalize_term(term: terms.Term) -> syntax.Expression:
+    """Normalize a closed term by rewriting its interaction net and reading the result back.
+    A net that reaches a shape the rules do not cover is left and the term is reduced by the call-by-need machine"""
+    try:
+        return read_back(translate(term))
+    except Unreadable:
+        return machine.normalize_shared(term)
+
+
+def normalize(expression: syntax.Expression, cache=None) -> syntax.Expression:
+    """Reduce an expression to its normal form with an interaction net, reusing a cache of normal forms if given"""
+    return machine.normalize(expression, cache, normalize_term)
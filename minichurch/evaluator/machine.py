@@ -0,0 +1,180 @@
+from minichurch.evaluator import syntax, terms
+
+
+def lookup(env: tuple, index: int):
+    """Retrieve the closure or readback name stored at a de Bruijn index"""
+    for _ in range(index):
+        env = env[1]
+    return env[0]
+
+
+def whnf(term: terms.Term, env: tuple, stack: list):
+    """Run the Krivine machine until the term reaches weak head normal form.
+    Environments are linked (closure, outer) tuples where a closure is a (term, env) pair
+    or a syntax Name standing in for a variable that is under a lambda being read back.
+    Returns the head term and environment; the arguments still to apply remain on the stack."""
+    while True:
+        kind = type(term)
+        if kind is terms.App:
+            # push the argument as a closure, nothing is copied
+            stack.append((term.right, env))
+            term = term.left
+        elif kind is terms.Lam:
+            if not stack:
+                return term, env
+            # bind the argument closure to the lambda's variable
+            env = (stack.pop(), env)
+            term = term.body
+        elif kind is terms.Var:
+            closure = lookup(env, term.index)
+            if isinstance(closure, syntax.Name):
+                # variable of a lambda that is being read back
+                return term, env
+            term, env = closure
+        else:
+            return term, env
+
+
+def normalize_term(term: terms.Term) -> syntax.Expression:
+    """Reduce a term to its normal form with an environment machine and read the result back as a new expression"""
+    free_names = {}
+    root = syntax.Application()
+    # each task is (term, env, parent expression, attribute of the parent to fill)
+    tasks = [(term, None, root, 'left')]
+    while tasks:
+        term, env, parent, slot = tasks.pop()
+        stack = []
+        term, env = whnf(term, env, stack)
+        if type(term) is terms.Lam:
+            # read back under the lambda with a fresh name standing in for its variable
+            name = syntax.Name(term.hint if term.hint is not None else 'x')
+            node = syntax.Function(name)
+            tasks.append((term.body, (name, env), node, 'inner_data'))
+        else:
+            if type(term) is terms.Var:
+                node = lookup(env, term.index)
+            else:
+                if term.symbol not in free_names:
+                    free_names[term.symbol] = syntax.Name(term.symbol)
+                node = free_names[term.symbol]
+            # rebuild the spine of pending arguments, the top of the stack is the first argument
+            while stack:
+                argterm, argenv = stack.pop()
+                node = syntax.Application().set_left(node)
+                tasks.append((argterm, argenv, node, 'right'))
+        setattr(parent, slot, node)
+    return root.left
+
+
+class Thunk:
+    """Argument closure shared by every use of the variable it is bound to.
+    Once it has been evaluated to a lambda its term and environment are replaced by the lambda's"""
+    __slots__ = ('term', 'env', 'evaluated')
+
+    def __init__(self, term: terms.Term, env: tuple):
+        self.term = term
+        self.env = env
+        self.evaluated = False
+
+
+class Update:
+    """Stack marker of a thunk under evaluation, the lambda that reaches it becomes the thunk's value"""
+    __slots__ = ('thunk',)
+
+    def __init__(self, thunk: Thunk):
+        self.thunk = thunk
+
+
+def whnf_shared(term: terms.Term, env: tuple, stack: list):
+    """Run the lazy Krivine machine until the term reaches weak head normal form.
+    Like whnf, but environments hold Thunks (or readback Names) and a thunk is evaluated at most once:
+    entering it pushes an Update marker and the lambda its evaluation ends in is written back into it.
+    A thunk whose evaluation gets stuck on a readback name is left as it was.
+    The stack holds Thunks, Names and Update markers, the markers are not arguments"""
+    while True:
+        kind = type(term)
+        if kind is terms.App:
+            right = term.right
+            if type(right) is terms.Var:
+                # pass the variable's closure on instead of wrapping it in another thunk
+                stack.append(lookup(env, right.index))
+            else:
+                stack.append(Thunk(right, env))
+            term = term.left
+        elif kind is terms.Lam:
+            if not stack:
+                return term, env
+            argument = stack.pop()
+            if type(argument) is Update:
+                # the thunk under evaluation reached a value, share it
+                thunk = argument.thunk
+                thunk.term, thunk.env, thunk.evaluated = term, env, True
+                continue
+            env = (argument, env)
+            term = term.body
+        elif kind is terms.Var:
+            closure = lookup(env, term.index)
+            if isinstance(closure, syntax.Name):
+                # variable of a lambda that is being read back
+                return term, env
+            if not closure.evaluated:
+                stack.append(Update(closure))
+            term, env = closure.term, closure.env
+        else:
+            return term, env
+
+
+def normalize_shared(term: terms.Term, whnf=whnf_shared) -> syntax.Expression:
+    """Reduce a term to its normal form with call-by-need and read the result back as a new expression.
+    Each argument is evaluated to weak head normal form at most once, every use of it sees that result.
+    whnf is the machine run on each term, it gets the Thunks, Names and Update markers of whnf_shared"""
+    free_names = {}
+    root = syntax.Application()
+    # each task is (term, env, parent expression, attribute of the parent to fill)
+    tasks = [(term, None, root, 'left')]
+    while tasks:
+        term, env, parent, slot = tasks.pop()
+        stack = []
+        term, env = whnf(term, env, stack)
+        if type(term) is terms.Lam:
+            # read back under the lambda with a fresh name standing in for its variable
+            name = syntax.Name(term.hint if term.hint is not None else 'x')
+            node = syntax.Function(name)
+            tasks.append((term.body, (name, env), node, 'inner_data'))
+        else:
+            if type(term) is terms.Var:
+                node = lookup(env, term.index)
+            else:
+                if term.symbol not in free_names:
+                    free_names[term.symbol] = syntax.Name(term.symbol)
+                node = free_names[term.symbol]
+            # rebuild the spine of pending arguments, skipping the markers of thunks that got stuck
+            while stack:
+                argument = stack.pop()
+                if type(argument) is Update:
+                    continue
+                node = syntax.Application().set_left(node)
+                if isinstance(argument, syntax.Name):
+                    node.right = argument
+                else:
+                    tasks.append((argument.term, argument.env, node, 'right'))
+        setattr(parent, slot, node)
+    return root.left
+
+
+def normalize(expression: syntax.Expression, cache=None, normalizer=normalize_term) -> syntax.Expression:
+    """Reduce an expression to its normal form with an environment machine, reusing a cache of normal forms if given"""
+    if cache is None:
+        return normalizer(terms.from_expression(expression))
+    key = cache.key(expression)
+    normal = cache.fetch(key)
+    if normal is None:
+        normal = normalizer(terms.from_expression(expression) if key is None else key)
+        if key is not None:
+            cache.remember(key, normal)
+    return normal
+
+
+def normalize_need(expression: syntax.Expression, cache=None) -> syntax.Expression:
+    """Reduce an expression to its normal form with call-by-need, reusing a cache of normal forms if given"""
+    return normalize(expression, cache, normalize_shared)
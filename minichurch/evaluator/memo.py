@@ -0,0 +1,92 @@
+from collections import OrderedDict
+
+from minichurch.evaluator import syntax, terms
+
+# number of normal forms kept when no size is given
+DEFAULT_SIZE = 1024
+
+
+class NormalFormCache:
+    """Bounded map from a closed term to the term of its normal form, the least recently used entry is evicted first.
+    Terms are hash-consed so alpha-equivalent expressions share an entry. The forms of the other targets of
+    syntax.TARGETS are kept under (term, target) keys, so a head normal form never stands in for a normal form"""
+    def __init__(self, size: int = DEFAULT_SIZE):
+        self._entries = OrderedDict()
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, term):
+        """Retrieve the normal form stored for a term (or the form stored for a key of another target) or None"""
+        normal = self._entries.get(term)
+        if normal is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(term)
+        return normal
+
+    def store(self, term, normal: terms.Term):
+        """Remember the normal form of a term, evicting the oldest entries past the size"""
+        self._entries[term] = normal
+        self._entries.move_to_end(term)
+        self._evict()
+
+    def resize(self, size: int):
+        """Change the number of entries kept, evicting the oldest ones if it shrinks"""
+        self.size = size
+        self._evict()
+
+    def key(self, expression: syntax.Expression, outer: set = None, known: dict = None, target: str = syntax.NF):
+        """Retrieve the key an expression reduced to a target is cached under, its term for the normal form.
+        Only expressions that still have a function to bind are cached, None is returned for others
+        and for ones using a name bound by one of the outer functions"""
+        if not redex_headed(expression):
+            return None
+        term = terms.from_expression(expression, outer, known)
+        if term is None or target == syntax.NF:
+            return term
+        return term, target
+
+    def fetch(self, term):
+        """Build a new expression from the normal form stored for a term, None if there is none"""
+        if term is None:
+            return None
+        normal = self.lookup(term)
+        return None if normal is None else terms.to_expression(normal)
+
+    def remember(self, term, expression: syntax.Expression, known: dict = None) -> terms.Term:
+        """Store a reduced expression as the normal form of a term, returns the term of the normal form"""
+        normal = terms.from_expression(expression, known=known)
+        self.store(term, normal)
+        return normal
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def _evict(self):
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return f"{len(self)}/{self.size} entries, {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+def create_cache(size: int) -> NormalFormCache:
+    """Create a cache of the given size, a size of 0 disables caching"""
+    return NormalFormCache(size) if size > 0 else None
+
+
+def redex_headed(expression: syntax.Expression) -> bool:
+    """Check if the head of an application spine is a function, so the expression still has work to do"""
+    expression = terms.unwrap(expression)
+    while isinstance(expression, syntax.Application):
+        expression = terms.unwrap(expression.left)
+    return isinstance(expression, syntax.Function)
@@ -0,0 +1,156 @@
+import weakref
+
+from minichurch.evaluator import machine, syntax, terms
+
+# compiled code of every live term, terms are hash-consed so a shared subterm is compiled once
+_compiled = weakref.WeakKeyDictionary()
+
+
+class Fun:
+    """Value of a lambda, body takes the Lazy argument and returns the value of the body"""
+    __slots__ = ('body', 'hint')
+
+    def __init__(self, body, hint: str):
+        self.body = body
+        self.hint = hint
+
+
+class Neutral:
+    """Value stuck on a variable, head is the Name of a lambda being read back or the symbol of a free name.
+    args is a linked (last argument, earlier arguments) list, None without arguments, so applying a neutral value
+    shares the arguments it already has instead of copying them"""
+    __slots__ = ('head', 'args')
+
+    def __init__(self, head, args: tuple = None):
+        self.head = head
+        self.args = args
+
+
+class Lazy:
+    """Argument evaluated the first time its value is needed, every use shares the value"""
+    __slots__ = ('code', 'env', 'value')
+
+    def __init__(self, code, env: tuple, value=None):
+        self.code = code
+        self.env = env
+        self.value = value
+
+    def force(self):
+        if self.code is not None:
+            self.value = self.code(self.env)
+            self.code = self.env = None
+        return self.value
+
+
+def lookup(env: tuple, index: int) -> Lazy:
+    """Retrieve the argument stored at a de Bruijn index of a linked (argument, outer) environment"""
+    for _ in range(index):
+        env = env[1]
+    return env[0]
+
+
+def apply(function, argument: Lazy):
+    """Apply a value to a lazy argument"""
+    if type(function) is Fun:
+        return function.body(argument)
+    return Neutral(function.head, (argument, function.args))
+
+
+def compile_var(index: int):
+    if index == 0:
+        return lambda env: env[0].force()
+    if index == 1:
+        return lambda env: env[1][0].force()
+    return lambda env: lookup(env, index).force()
+
+
+def compile_free(symbol: str):
+    value = Neutral(symbol)
+    return lambda env: value
+
+
+def compile_lam(body, hint: str):
+    return lambda env: Fun(lambda argument: body((argument, env)), hint)
+
+
+def compile_app(left, right, index):
+    if index is not None:
+        # pass the variable's argument on instead of wrapping it in another Lazy
+        if index == 0:
+            return lambda env: apply(left(env), env[0])
+        return lambda env: apply(left(env), lookup(env, index))
+    return lambda env: apply(left(env), Lazy(right, env))
+
+
+def compile_term(term: terms.Term):
+    """Compile a term into a Python closure taking an environment and returning the value of the term.
+    Compiled without recursion, subterms that have been compiled before are reused"""
+    tasks = [(term, False)]
+    while tasks:
+        term, ready = tasks.pop()
+        if term in _compiled:
+            continue
+        kind = type(term)
+        if kind is terms.Var:
+            _compiled[term] = compile_var(term.index)
+        elif kind is terms.Free:
+            _compiled[term] = compile_free(term.symbol)
+        elif not ready:
+            tasks.append((term, True))
+            if kind is terms.Lam:
+                tasks.append((term.body, False))
+            else:
+                tasks.append((term.right, False))
+                tasks.append((term.left, False))
+        elif kind is terms.Lam:
+            _compiled[term] = compile_lam(_compiled[term.body], term.hint if term.hint is not None else 'x')
+        else:
+            index = term.right.index if type(term.right) is terms.Var else None
+            _compiled[term] = compile_app(_compiled[term.left], _compiled[term.right], index)
+    return _compiled[term]
+
+
+def read_back(value) -> syntax.Expression:
+    """Turn a value into a new expression, applying each function to a fresh name to read its body"""
+    free_names = {}
+    root = syntax.Application()
+    # each task is (value, parent expression, attribute of the parent to fill)
+    tasks = [(value, root, 'left')]
+    while tasks:
+        value, parent, slot = tasks.pop()
+        if type(value) is Fun:
+            name = syntax.Name(value.hint)
+            node = syntax.Function(name)
+            tasks.append((value.body(Lazy(None, None, Neutral(name))), node, 'inner_data'))
+        else:
+            head = value.head
+            if not isinstance(head, syntax.Name):
+                if head not in free_names:
+                    free_names[head] = syntax.Name(head)
+                head = free_names[head]
+            node = head
+            arguments = []
+            args = value.args
+            while args is not None:
+                arguments.append(args[0])
+                args = args[1]
+            # the list starts with the last argument
+            for argument in reversed(arguments):
+                node = syntax.Application().set_left(node)
+                tasks.append((argument.force(), node, 'right'))
+        setattr(parent, slot, node)
+    return root.left
+
+
+def normalize_term(term: terms.Term) -> syntax.Expression:
+    """Normalize a closed term by evaluating its compiled closure and reading the value back.
+    Evaluation nests Python calls, a term that runs out of stack is reduced by the call-by-need machine instead"""
+    try:
+        return read_back(compile_term(term)(None))
+    except RecursionError:
+        return machine.normalize_shared(term)
+
+
+def normalize(expression: syntax.Expression, cache=None) -> syntax.Expression:
+    """Reduce an expression to its normal form by evaluation, reusing a cache of normal forms if given"""
+    return machine.normalize(expression, cache, normalize_term)
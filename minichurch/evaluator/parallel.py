@@ -0,0 +1,139 @@
+import concurrent.futures
+import typing
+
+from minichurch.evaluator import machine, memo, strategies, syntax, terms
+from minichurch.parser import compiled
+
+# nodes of a closed argument before it is sent to a worker instead of being reduced here
+THRESHOLD = 32
+# nodes of a closed argument past which it is reduced here, copying out its shared closures would cost too much
+SIZE_LIMIT = 1 << 20
+
+
+# strategy and cache of the current worker process, set by the pool initializer
+_strategy = strategies.DEFAULT
+_cache = None
+
+
+def initialize(strategy: str = strategies.DEFAULT, memo_size: int = memo.DEFAULT_SIZE):
+    """Set up a worker process with the strategy that reduces the arguments it is sent"""
+    global _strategy, _cache
+    _strategy = strategy
+    _cache = memo.create_cache(memo_size)
+
+
+def normalize_compiled(data: bytes) -> bytes:
+    """Reduce the compiled form of a closed expression in a worker process, returns the compiled normal form"""
+    expression = strategies.evaluate(compiled.loads(data), _strategy, cache=_cache)
+    # retrieve the bound values in place so the compiled form holds the normal form itself
+    syntax.renamer(expression)
+    return compiled.dump(expression)
+
+
+def start(workers: int, strategy: str = strategies.DEFAULT,
+          memo_size: int = memo.DEFAULT_SIZE) -> concurrent.futures.ProcessPoolExecutor:
+    """Create the pool of worker processes, each one reduces arguments with a strategy and keeps its own cache"""
+    return concurrent.futures.ProcessPoolExecutor(workers, initializer=initialize, initargs=(strategy, memo_size))
+
+
+def close(term: terms.Term, env: tuple, closed: dict) -> typing.Optional[terms.Term]:
+    """Substitute the closures of an environment into a term, returns the closed term
+    or None when it uses the variable of a lambda that is being read back.
+    closed maps the Thunks that were substituted so far to their terms, or to None for the open ones"""
+    results = []  # terms of the finished parts
+    # each task is (term, env, lambdas of the term above it), (None, Lam or App, hint) to join the parts
+    # above it or (None, Thunk, None) to remember what a thunk closed into once its parts are done
+    tasks = [(term, env, 0)]
+    while tasks:
+        term, env, depth = tasks.pop()
+        if term is None:
+            if env is terms.Lam:
+                results.append(terms.Lam(results.pop(), depth))
+            elif env is terms.App:
+                right = results.pop()
+                results.append(terms.App(results.pop(), right))
+            else:
+                closed[env] = results[-1]
+        elif type(term) is terms.Var:
+            if term.index < depth:
+                results.append(term)
+                continue
+            closure = machine.lookup(env, term.index - depth)
+            if isinstance(closure, syntax.Name) or closed.get(closure, ()) is None:
+                # the thunks that were being substituted depend on it as well
+                for marker, thunk, _ in tasks:
+                    if marker is None and type(thunk) is machine.Thunk:
+                        closed[thunk] = None
+                return None
+            if closure in closed:
+                results.append(closed[closure])
+            else:
+                # substituted terms are closed, so they need no shifting under the lambdas around them
+                tasks.append((None, closure, None))
+                tasks.append((closure.term, closure.env, 0))
+        elif type(term) is terms.Lam:
+            tasks.append((None, terms.Lam, term.hint))
+            tasks.append((term.body, env, depth + 1))
+        elif type(term) is terms.App:
+            tasks.append((None, terms.App, None))
+            tasks.append((term.right, env, depth))
+            tasks.append((term.left, env, depth))
+        else:
+            results.append(term)
+    return results[0]
+
+
+def normalize_term(term: terms.Term, pool: concurrent.futures.Executor,
+                   threshold: int = THRESHOLD) -> syntax.Expression:
+    """Reduce a term to its normal form like machine.normalize_shared, but send the arguments that are closed and
+    at least threshold nodes large to a pool of workers while the rest is read back here.
+    The normal forms that come back are spliced into the result in place of those arguments"""
+    free_names = {}
+    closed = {}
+    root = syntax.Application()
+    # arguments given to the workers, (future, parent expression, attribute of the parent to fill)
+    sent = []
+    tasks = [(term, None, root, 'left')]
+    while tasks:
+        term, env, parent, slot = tasks.pop()
+        stack = []
+        term, env = machine.whnf_shared(term, env, stack)
+        if type(term) is terms.Lam:
+            name = syntax.Name(term.hint if term.hint is not None else 'x')
+            node = syntax.Function(name)
+            tasks.append((term.body, (name, env), node, 'inner_data'))
+        else:
+            if type(term) is terms.Var:
+                node = machine.lookup(env, term.index)
+            else:
+                if term.symbol not in free_names:
+                    free_names[term.symbol] = syntax.Name(term.symbol)
+                node = free_names[term.symbol]
+            while stack:
+                argument = stack.pop()
+                if type(argument) is machine.Update:
+                    continue
+                node = syntax.Application().set_left(node)
+                if isinstance(argument, syntax.Name):
+                    node.right = argument
+                    continue
+                if argument in closed:
+                    result = closed[argument]
+                else:
+                    result = closed[argument] = close(argument.term, argument.env, closed)
+                if result is not None and threshold <= result.size <= SIZE_LIMIT:
+                    data = compiled.dump(terms.to_expression(result))
+                    sent.append((pool.submit(normalize_compiled, data), node, 'right'))
+                else:
+                    tasks.append((argument.term, argument.env, node, 'right'))
+        setattr(parent, slot, node)
+    for future, parent, slot in sent:
+        setattr(parent, slot, compiled.loads(future.result()))
+    return root.left
+
+
+def normalize(expression: syntax.Expression, pool: concurrent.futures.Executor, threshold: int = THRESHOLD,
+              cache=None) -> syntax.Expression:
+    """Reduce an expression to its normal form, normalizing its independent closed arguments in a pool of workers.
+    The head of every subterm is reduced here with call-by-need, reusing a cache of normal forms if given"""
+    return machine.normalize(expression, cache, lambda term: normalize_term(term, pool, threshold))
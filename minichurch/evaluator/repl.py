@@ -1,84 +1,377 @@
 from cmd import Cmd
+import os
 import readline
+import sys
 from colorama import Fore
 
-from minichurch.parser import parser
-from minichurch.evaluator import syntax
+from minichurch import jobs
+from minichurch.parser import definitions, parser, parsertypes
+from minichurch.evaluator import budget, memo, strategies, syntax
 from minichurch.lexer import lexer
 
 
-def create_tree(statement):
-    # create an input stream
-    lexstream = lexer.lex(statement)
+def create_tree(statement, library=None):
+    # create a token stream, looking for the names of the definitions
+    lexstream = lexer.Scanner(statement, names=None if library is None else library.names)
     # parse the stream into a parse tree
-    built_tree = parser.parse(lexstream)
+    built_tree = parser.parse_timed(lexstream)
     return built_tree
 
 
+def create_expression(statement, library=None):
+    # lex, parse and build the statement in one pass, the parse tree is only made for show
+    with syntax.phase('build'):
+        output_val = parser.build_source(statement, library)
+    if output_val is None:
+        raise TypeError("Expected an expression")
+    return output_val
+
+
+# characters of a result that is still pushed onto the history
+HISTORY_LIMIT = 4096
+# characters of a statement shown in the list of jobs
+JOB_LIMIT = 60
+# bytes in a megabyte of the memory limit
+MEGABYTE = 1 << 20
+
+
 def push_output(syntax_statement):
-    """Push a compiled statement onto the output"""
+    """Push a compiled statement onto the output, unless it is too long to be recalled"""
+    res = syntax.write(syntax_statement, HISTORY_LIMIT)
+    if len(res) > HISTORY_LIMIT:
+        return
     # replace lambdas with chevrons and strip spaces
-    res = str(syntax_statement.get()).replace('λ', '^').replace(' ', '')
+    res = res.replace('λ', '^').replace(' ', '')
     # push onto history to be accessed using up key
     readline.add_history(res)
 
 
 class LambdaREPL(Cmd):
+    # reduction strategy used by exec
+    strategy = strategies.DEFAULT
+
+    def __init__(self, memo_size: int = memo.DEFAULT_SIZE, stats: bool = False,
+                 max_length: int = None, max_depth: int = None, share: bool = False, limits: tuple = None):
+        super().__init__()
+        # statements are evaluated by worker processes, which keep the normal forms between them
+        self.jobs = jobs.Jobs(memo_size)
+        # definitions made or imported so far
+        self.library = definitions.Library()
+        # whether statistics are collected and those of the last statement
+        self.collect = stats
+        self.last_stats = None
+        # options of the printed terms, None for no limit
+        self.max_length = max_length
+        self.max_depth = max_depth
+        self.share = share
+        # steps, size, seconds and bytes a statement may use by name of the limit, None for no limit
+        self.limits = dict(zip(budget.LIMITS, limits or (None,) * len(budget.LIMITS)))
+
     def do_exec(self, statement):
         """exec [statement]
-        Parse and evaluate a lambda calculus statement"""
-        try:
-            built_tree = create_tree(statement)
-            # take the parse tree and build a compiled instruction
-            output_val = parser.build(built_tree)
-            print(f"\tInput:  \033[1m{output_val.get()}\033[0m")
-            # interpret and solve the instruction
-            output_val = syntax.solver(output_val)
-            # rebind variables that are conflicting
-            syntax.renamer(output_val)
-            print(f"\tResult: \033[1m{output_val.get()}\033[0m")
-            # add the evaluated result to history
-            push_output(output_val)
+        Parse and evaluate a lambda calculus statement, Ctrl-C cancels the evaluation"""
+        job = self.submit(statement)
+        if job is not None:
+            self.jobs.wait(job)
+            self.report(job)
+
+    def do_whnf(self, statement):
+        """whnf [statement]
+        Evaluate a lambda calculus statement only until it is a function or a name applied to arguments,
+        always with the subst strategy since the others only stop at the normal form"""
+        self.evaluate_to(statement, syntax.WHNF)
+
+    def do_hnf(self, statement):
+        """hnf [statement]
+        Evaluate a lambda calculus statement only until it is functions around a name applied to arguments,
+        always with the subst strategy since the others only stop at the normal form"""
+        self.evaluate_to(statement, syntax.HNF)
+
+    def evaluate_to(self, statement: str, target: str):
+        """Evaluate a statement to a target with the reference solver and wait for it, Ctrl-C cancels the evaluation"""
+        if self.strategy != strategies.DEFAULT:
+            print(f"\tStrategy: \033[1m{strategies.DEFAULT}\033[0m (only {strategies.DEFAULT} can stop at a "
+                  f"{syntax.FORMS[target]}, exec keeps using {self.strategy})")
+        job = self.submit(statement, target=target, strategy=strategies.DEFAULT)
+        if job is not None:
+            self.jobs.wait(job)
+            self.report(job)
+
+    def do_bg(self, statement):
+        """bg [statement]
+        Parse a lambda calculus statement and evaluate it in the background, its result is displayed once it is done"""
+        job = self.submit(statement, background=True)
+        if job is not None:
+            print(f"\t[{job.number}] {job.state}")
 
+    def submit(self, statement: str, background: bool = False, target: str = syntax.NF, strategy: str = None):
+        """Build a statement and queue it for evaluation to a target with a strategy (the one of exec by default),
+        returns its job or None if it could not be built"""
+        if self.collect:
+            syntax.stats = syntax.Stats()
+        try:
+            output_val = create_expression(statement, self.library)
+            self.display("\tInput:  ", output_val)
+            return self.jobs.submit(statement.strip(), output_val, strategy or self.strategy, background, syntax.stats,
+                                    self.statement_limits(), target)
         except Exception as e:
             # display error in red
             print(Fore.RED+str(e)+Fore.RESET)
+            self.end_stats()
+        finally:
+            syntax.stats = None
+
+    def report(self, job: jobs.Job):
+        """Display the result of a job that is no longer pending"""
+        syntax.stats = job.stats
+        try:
+            if job.state == 'done':
+                with syntax.phase('print'):
+                    self.display("\tResult: ", job.result)
+                # add the evaluated result to history
+                push_output(job.result)
+            elif job.state == 'stopped':
+                with syntax.phase('print'):
+                    self.display("\tPartial: ", job.result)
+                print(Fore.RED+job.error+Fore.RESET)
+            elif job.state == 'failed':
+                print(Fore.RED+job.error+Fore.RESET)
+            else:
+                print(Fore.RED+f"Cancelled after {job.elapsed:.1f}s"+Fore.RESET)
+        finally:
+            self.end_stats()
 
     def do_explain(self, statement):
         """explain [statement]
-        Parse and evaluate a lambda calculus statement while explaining each reduction step"""
+        Parse and evaluate a lambda calculus statement while explaining each reduction step, Ctrl-C stops it"""
+        if self.collect:
+            syntax.stats = syntax.Stats()
+        showstep = None
         try:
-            built_tree = create_tree(statement)
-            # take the parse tree and build a compiled instruction
-            output_val = parser.build(built_tree)
+            output_val = create_expression(statement, self.library)
             # create a display function that will count steps and display the result
             showstep = syntax.create_showstep(output_val)
-            print(f"\tInput:  \033[1m{output_val.get()}\033[0m")
+            self.display("\tInput:  ", output_val)
             # interpret and solve the instruction
-            output_val = syntax.solver(output_val, showstep)
+            limits = self.statement_limits()
+            with syntax.phase('solve'):
+                if limits is None:
+                    output_val = syntax.solver(output_val, showstep)
+                else:
+                    output_val = budget.solve(output_val, budget.Budget(*limits), showstep)
+            partial = None
+            if isinstance(output_val, budget.Partial):
+                partial = output_val
+                output_val = partial.term
             # rebind variables that are conflicting
-            syntax.renamer(output_val, showstep=showstep)
-            print(f"\n\tResult: \033[1m{output_val.get()}\033[0m")
+            with syntax.phase('rename'):
+                syntax.renamer(output_val, showstep=showstep)
+            showstep.close()
+            with syntax.phase('print'):
+                self.display("\n\tResult: " if partial is None else "\n\tPartial: ", output_val)
+            if partial is not None:
+                print(Fore.RED+str(partial)+Fore.RESET)
             # add the evaluated result to history
             push_output(output_val)
+        except KeyboardInterrupt:
+            # the explanation runs in the REPL itself, only the statement is lost
+            if showstep is not None:
+                showstep.close()
+            print(Fore.RED+"Cancelled"+Fore.RESET)
         except Exception as e:
             # display error in red
             print(Fore.RED+str(e)+Fore.RESET)
+        finally:
+            self.end_stats()
+
+    def display(self, prefix: str, expression: syntax.Expression):
+        """Print a term in bold after a prefix, cut short as the print settings ask"""
+        sys.stdout.write(prefix + "\033[1m")
+        syntax.dump(expression, sys.stdout, self.max_length, self.max_depth, self.share)
+        sys.stdout.write("\033[0m\n")
+
+    def statement_limits(self) -> tuple:
+        """Arguments of the budget.Budget of a statement, None when it has no limits"""
+        limits = tuple(self.limits[name] for name in budget.LIMITS)
+        return None if all(limit is None for limit in limits) else limits
+
+    def end_stats(self):
+        """Keep the statistics of the statement that finished and stop collecting them"""
+        if syntax.stats is not None:
+            self.last_stats = syntax.stats
+            syntax.stats = None
 
     def do_show(self, statement):
         """show [statement]
         Parse a lambda calculus statement and display the syntax tree"""
         try:
-            built_tree = create_tree(statement)
-            print(built_tree)
+            built_tree = create_tree(statement, self.library)
+            parsertypes.dump_tree(built_tree, sys.stdout, self.max_length, self.max_depth)
+            print()
         except Exception as e:
             # display error in red
             print(Fore.RED+str(e)+Fore.RESET)
 
+    def do_strategy(self, name):
+        """strategy [name]
+        Display the reduction strategy used by exec or switch to another one (explain always uses subst)"""
+        name = name.strip()
+        if not name:
+            print(f"\tStrategy: \033[1m{self.strategy}\033[0m (available: {', '.join(strategies.STRATEGIES)})")
+        elif name in strategies.STRATEGIES:
+            self.strategy = name
+        else:
+            print(Fore.RED+f"Unknown strategy {name}, choose from {', '.join(strategies.STRATEGIES)}"+Fore.RESET)
+
+    def do_memo(self, args):
+        """memo [size|clear]
+        Display the normal form cache counters, resize the cache (0 disables it) or clear it"""
+        args = args.strip()
+        if not args:
+            size = self.jobs.memo_size
+            # counters of the worker after its last job, an empty cache before the first one
+            info = 'disabled' if size == 0 else self.jobs.cache_info or memo.create_cache(size)
+            print(f"\tMemo: \033[1m{info}\033[0m")
+        elif args == 'clear':
+            self.jobs.memo()
+        elif args.isdigit():
+            self.jobs.memo(int(args))
+        else:
+            print(Fore.RED+"Expected a cache size or clear"+Fore.RESET)
+
+    def do_stats(self, args):
+        """stats [on|off|json]
+        Display the reduction counters and phase times of the last statement, as json, or switch collecting them"""
+        args = args.strip()
+        if args == 'on':
+            self.collect = True
+        elif args == 'off':
+            self.collect = False
+        elif args in ('', 'json'):
+            if self.last_stats is None:
+                print(f"\tStats: \033[1m{'no statement run yet' if self.collect else 'disabled, use stats on'}\033[0m")
+            else:
+                print(self.last_stats.to_json() if args else self.last_stats)
+        else:
+            print(Fore.RED+"Expected on, off or json"+Fore.RESET)
+
+    def do_print(self, args):
+        """print [length|depth size] [shared on|off]
+        Display how terms are printed, cut them short after a length or nesting depth (0 for no limit)
+        or print subterms that are shared once"""
+        args = args.split()
+        if not args:
+            print(f"\tPrint: \033[1mlength {self.max_length or 'unlimited'}, depth {self.max_depth or 'unlimited'}, "
+                  f"shared {'on' if self.share else 'off'}\033[0m")
+        elif len(args) == 2 and args[0] in ('length', 'depth') and args[1].isdigit():
+            setattr(self, 'max_' + args[0], int(args[1]) or None)
+        elif len(args) == 2 and args[0] == 'shared' and args[1] in ('on', 'off'):
+            self.share = args[1] == 'on'
+        else:
+            print(Fore.RED+"Expected length or depth with a size, or shared with on or off"+Fore.RESET)
+
+    def do_limits(self, args):
+        """limits [steps|size|time|memory value|off]
+        Display the limits of a statement or set one, in beta steps, term nodes, seconds or megabytes (0 for no limit).
+        A statement that uses one up stops with the term it reached (subst only)"""
+        args = args.split()
+        if not args:
+            shown = []
+            for name in budget.LIMITS:
+                value = self.limits[name]
+                if name == 'memory' and value is not None:
+                    value = f"{value / MEGABYTE:g}MB"
+                elif name == 'time' and value is not None:
+                    value = f"{value:g}s"
+                shown.append(f"{name} {value or 'unlimited'}")
+            print(f"\tLimits: \033[1m{', '.join(shown)}\033[0m")
+        elif args == ['off']:
+            self.limits = dict.fromkeys(budget.LIMITS)
+        elif len(args) == 2 and args[0] in budget.LIMITS:
+            try:
+                value = float(args[1]) if args[0] in ('time', 'memory') else int(args[1])
+            except ValueError:
+                value = -1
+            if not 0 <= value < float('inf'):
+                print(Fore.RED+"Expected a limit of zero or more"+Fore.RESET)
+            elif args[0] == 'memory':
+                self.limits['memory'] = int(value * MEGABYTE) or None
+            else:
+                self.limits[args[0]] = value or None
+        else:
+            print(Fore.RED+f"Expected off or one of {', '.join(budget.LIMITS)} with a value"+Fore.RESET)
+
+    def do_jobs(self, args):
+        """jobs
+        List the running and queued evaluations with their beta steps (subst only) and time so far"""
+        pending = self.jobs.pending()
+        if not pending:
+            print("\tJobs: \033[1mnone\033[0m")
+        for job in pending:
+            steps, elapsed = self.jobs.progress(job)
+            progress = '' if job.state == 'queued' else f"{elapsed:.1f}s" if steps is None else f"{steps} steps, {elapsed:.1f}s"
+            statement = job.statement if len(job.statement) <= JOB_LIMIT else job.statement[:JOB_LIMIT] + '…'
+            print(f"\t[{job.number}] {job.state:<8}{progress:<24}\033[1m{statement}\033[0m")
+
+    def do_cancel(self, args):
+        """cancel [job]
+        Cancel a queued evaluation or stop a running one (the one started last by default), the REPL keeps its definitions"""
+        args = args.strip()
+        if args and not args.isdigit():
+            print(Fore.RED+"Expected the number of a job"+Fore.RESET)
+            return
+        if args:
+            job = self.jobs.find(int(args))
+        else:
+            # the job started last
+            job = next(reversed(self.jobs.running()), None)
+        if job is None:
+            print(Fore.RED+(f"No job {args} is running or queued" if args else "No job is running")+Fore.RESET)
+        else:
+            self.jobs.cancel(job)
+            print(f"\t[{job.number}] cancelled")
+
+    def precmd(self, line: str) -> str:
+        # display the background jobs that finished since the last command
+        self.jobs.poll()
+        for job in self.jobs.finished:
+            print(f"\t[{job.number}] {job.state}: \033[1m{job.statement}\033[0m")
+            self.report(job)
+        self.jobs.finished.clear()
+        return line
+
+    def emptyline(self):
+        # only display the background jobs that are done, instead of running the last command again
+        pass
+
+    def cmdloop(self, intro=None):
+        # Ctrl-C at the prompt starts a new line instead of leaving the REPL
+        while True:
+            try:
+                return super().cmdloop(intro)
+            except KeyboardInterrupt:
+                print('^C')
+                intro = ''
+
+    def do_import(self, path):
+        """import "[path]"
+        Make the definitions of a file available to the statements that follow"""
+        try:
+            self.library.import_file(path.strip().strip('"'))
+        except Exception as e:
+            print(Fore.RED+str(e)+Fore.RESET)
+
     def default(self, line: str) -> None:
-        return self.do_exec(line)
+        # record a name = term definition, execute anything else
+        try:
+            statement = self.library.index(line.encode('utf-8'), os.getcwd()).decode('utf-8')
+        except Exception as e:
+            print(Fore.RED+str(e)+Fore.RESET)
+            return
+        if statement.strip():
+            return self.do_exec(statement)
 
     def do_exit(self, args):
         """Quit the REPL"""
-
+        self.jobs.close()
         raise SystemExit
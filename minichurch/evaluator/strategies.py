@@ -0,0 +1,44 @@
+from minichurch.evaluator import budget, church, inet, machine, nbe, syntax
+
+# name of the strategy used when none is specified
+DEFAULT = 'subst'
+
+# reduction strategies by name, each takes a built expression and returns its normal form
+STRATEGIES = {
+    # reference solver that substitutes copies of the argument for each use of a name
+    'subst': syntax.solver,
+    # environment machine that shares argument closures instead of copying them (call-by-name)
+    'name': machine.normalize,
+    # the same machine with arguments shared as thunks that are evaluated at most once (call-by-need)
+    'need': machine.normalize_need,
+    # call-by-need that carries Church numerals and booleans as Python values through the standard combinators
+    'church': church.normalize,
+    # normalization by evaluation, terms are compiled into Python closures and their values read back
+    'nbe': nbe.normalize,
+    # optimal reduction, the term is rewritten as an interaction net where a shared function body is reduced once
+    'inet': inet.normalize,
+}
+
+
+def evaluate(expression: syntax.Expression, strategy: str = DEFAULT, showstep=None, cache=None,
+             limits: budget.Budget = None, target: str = syntax.NF):
+    """Reduce an expression with the named strategy, reusing normal forms from the cache if one is given.
+    target is one of syntax.TARGETS, the reduction stops once the expression reaches it.
+    Only the reference solver can explain its steps, stop at a head normal form and keep to the limits of a budget,
+    with limits a budget.Partial is returned in place of the result once one of them is used up"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}, choose from {', '.join(STRATEGIES)}")
+    if target not in syntax.TARGETS:
+        raise ValueError(f"Unknown target {target}, choose from {', '.join(syntax.TARGETS)}")
+    if strategy != DEFAULT:
+        if target != syntax.NF:
+            raise ValueError(f"Only the {DEFAULT} strategy can stop at a {syntax.FORMS[target]}")
+        if limits is not None:
+            raise ValueError(f"Only the {DEFAULT} strategy can be given limits")
+        if showstep is not None:
+            raise ValueError(f"Only the {DEFAULT} strategy can explain its steps")
+    if limits is not None:
+        return budget.solve(expression, limits, showstep, cache, target)
+    if showstep is not None or target != syntax.NF:
+        return syntax.solver(expression, showstep, cache, target)
+    return STRATEGIES[strategy](expression, cache=cache)
@@ -1,5 +1,11 @@
-import copy
+import contextlib
+import io
+import itertools
+import json
 import string
+import sys
+import time
+import typing
 from colorama import Fore
 
 
@@ -23,6 +29,9 @@ class Expression:
     def __repr__(self):
         return str(self)
 
+    def __str__(self):
+        return write(self)
+
 
 class Name(Expression):
     def __init__(self, symbol=None):
@@ -34,8 +43,7 @@ class Name(Expression):
         if self.value is None:
             self.value = expr
             if showstep is not None:
-                print(
-                    f"{Fore.GREEN+str(self.symbol)+Fore.RESET} becomes {Fore.GREEN+str(self.value)+Fore.RESET}")
+                showstep.bound(self)
             return True
         else:
             # pass through if already bound
@@ -43,7 +51,7 @@ class Name(Expression):
 
     def get(self):
         # retrieve self if floor, else pass through a copy
-        return self if self.value is None else self.value.get().replicate()
+        return self if self.value is None else walk(self)
 
     def get_inner(self):
         return self.get()
@@ -51,29 +59,10 @@ class Name(Expression):
     def replicate(self, replacement=None):
         if replacement is None:
             replacement = {}
-        # unbounded name
-        if self.value is None:
-            # name has been marked for copy
-            if self in replacement:
-                # retrieve replacement
-                return replacement[self]
-            else:
-                # return self (no copy)
-                return self
-        else:
-            # pass through
-            return self.value.get().replicate(replacement)
-
-    def __str__(self):
-        # print string value of name if not bound
+        # unbounded name, retrieve the replacement if it has been marked for copy
         if self.value is None:
-            if self.symbol is not None:
-                return self.symbol
-            else:
-                return str(id(self))
-        else:
-            # pass through to value
-            return str(self.value.get())
+            return replacement.get(self, self)
+        return walk(self, replacement)
 
 
 class Function(Expression):
@@ -97,35 +86,19 @@ class Function(Expression):
             return True
 
     def get(self):
-        self.inner_data = self.inner_data.get()
-        return self.inner_data.get() if self.bound else self
+        return walk(self)
 
     def get_inner(self):
-        return self.inner_data.get_inner()
+        # walk down the chain of nested functions
+        inner = self.inner_data
+        while isinstance(inner, Function):
+            inner = inner.inner_data
+        return inner.get_inner()
 
     def replicate(self, replacement=None):
         if replacement is None:
             replacement = {}
-        # pass through
-        if self.bound:
-            return self.inner_data.get().replicate(replacement)
-        else:
-            # create a new name to copy
-            newname = copy.deepcopy(self.name)
-            # create a copy of the replacements
-            # instead of mutating the commonly passed one
-            rep = replacement.copy()
-            # bind the new replacement
-            rep[self.name] = newname
-            # replicate the expr of the function
-            newinner = self.inner_data.replicate(rep)
-            return Function(newname).set_expr(newinner)
-
-    def __str__(self):
-        if self.bound:
-            return str(self.inner_data.get())
-        else:
-            return f"λ {self.name.get()}. {self.inner_data.get()}"
+        return walk(self, replacement)
 
 
 class Application(Expression):
@@ -146,37 +119,95 @@ class Application(Expression):
         return self
 
     def bind(self, expr, showstep=None):
-        # simplify
-        self.right = self.right.get()
-        self.left = self.left.get()
-        if self.right is None:
-            return False
-        if isinstance(self.left, Application):
-            # reduce the left side until you can pass in values
-            while isinstance(self.left, Application):
-                bound = self.left.bind(None, showstep)  # bind inner
-                self.left = self.left.get()  # retrieve result
+        return self.reduce(showstep)[0]
+
+    def reduce(self, showstep=None):
+        """Take one binding step, returns whether the left side was bound and how many
+        functions were bound on the way (0 means the step left the expression unchanged)"""
+        # applications suspended until their left or right side finished its binding step
+        waiting = []
+        app = self
+        bound = None  # None until the current application has been bound
+        steps = 0
+        while True:
+            if bound is None:
+                # simplify
+                app.right = app.right.get()
+                app.left = app.left.get()
+                if app.right is None:
+                    bound = False
+                elif isinstance(app.left, Application):
+                    # reduce the left side until you can pass in values
+                    waiting.append((app, WAIT_LEFT))
+                    app = app.left
+                    continue
+                else:
+                    if showstep is not None:
+                        showstep.locate(waiting)
+                    bound = app.bind_left(showstep)
+                    if bound is None:
+                        waiting.append((app, WAIT_RIGHT))
+                        app = app.right
+                        continue
+                    steps += bound
+            if not waiting:
+                return bound, steps
+            # pass the result to the application that was waiting on it
+            app, side = waiting.pop()
+            if side == WAIT_RIGHT:
+                app.right = app.right.get()
+                bound = False
+            else:
+                app.left = app.left.get()  # retrieve result
                 if not bound:  # reduced down to a name
-                    return False
-            
+                    bound = False
+                elif isinstance(app.left, Application):
+                    # bind inner again
+                    waiting.append((app, WAIT_LEFT))
+                    app = app.left
+                    bound = None
+                else:
+                    if showstep is not None:
+                        showstep.locate(waiting)
+                    bound = app.bind_left(showstep)
+                    if bound is None:
+                        waiting.append((app, WAIT_RIGHT))
+                        app = app.right
+                    else:
+                        steps += bound
+
+    def bind_left(self, showstep=None):
+        """Bind the right side into the left side once the left side is no longer an application.
+        Returns None when the right side is an application that has to be reduced instead"""
         if isinstance(self.left, Function):  # only bind functions
+            if budget is not None:
+                budget.step()  # before anything records the step, it is not taken when a limit is used up
             if showstep is not None:
-                print(
-                    f"\nAssociate {Fore.GREEN+str(self.right)+Fore.RESET} with {Fore.GREEN+str(self.left)+Fore.RESET}")
+                showstep.associate(self)
+            if stats is not None:
+                stats.beta_steps += 1
+            if progress is not None:
+                progress.steps += 1
             self.left.bind(self.right, showstep) # bind outer
             self.left = self.left.get()# retrieve result
             self.applied = True
             if showstep is not None:
-                showstep()
+                showstep.step()
+            if watch is not None:
+                watch.step()
             return True
         # right side becomes left-most outer-most redex
-        elif isinstance(self.right, Expression):
-            self.right.bind(None, showstep) # bind right outermost
-            self.right = self.right.get()
+        elif isinstance(self.right, Application):
+            return None
+        # names and functions on the right are already as reduced as they can be here
         return False
 
+    def descends_right(self) -> bool:
+        """Whether a binding step that could not bind the left side went on to the right side"""
+        return not isinstance(self.left, (Application, Function)) and isinstance(self.right, Application)
+
     def get(self):
-        return self.left.get() if self.applied else self
+        return walk(self) if self.applied else self
 
     def get_inner(self):
         return self
@@ -184,98 +215,797 @@ class Application(Expression):
     def replicate(self, replacement=None):
         if replacement is None:
             replacement = {}
-        # pass through
-        if self.applied:
-            return self.left.get().replicate(replacement)
+        return walk(self, replacement)
+
+
+# sides of an application that Application.bind waits on
+WAIT_LEFT = 0
+WAIT_RIGHT = 1
+
+# continuation frames of walk
+GET_NAME = 0  # copy the value retrieved for a bound name
+GET_FUNCTION = 1  # store the retrieved body in the function
+REPLICATE_RESOLVED = 2  # copy a retrieved value
+REPLICATE_FUNCTION = 3  # wrap a copied body in a new function
+REPLICATE_LEFT = 4  # copy the retrieved left side of an application
+REPLICATE_RIGHT = 5  # retrieve the right side of an application
+REPLICATE_RIGHT_RESOLVED = 6  # copy the retrieved right side of an application
+REPLICATE_APPLICATION = 7  # join the copied sides into a new application
+
+
+def walk(expression: Expression, replacement: dict = None) -> Expression:
+    """Explicit stack implementation of get (replacement is None) and replicate (replacement is the
+    dict of Names marked for copy) that does not recurse on the depth of the expression.
+    Results and side effects match the nested get/replicate calls step for step"""
+    frames = []
+    node = expression
+    # copies of bound values and nodes created for them, only reported when statistics are collected
+    copies = 0 if replacement is None else 1
+    allocated = 0
+    while True:
+        # descend until a value can be returned
+        while True:
+            if replacement is None:
+                # get: follow bound values
+                if isinstance(node, Name):
+                    if node.value is None:
+                        break
+                    # chained names would copy the same value twice, copy it once instead
+                    if not frames or frames[-1][0] != GET_NAME:
+                        frames.append((GET_NAME,))
+                    node = node.value
+                elif isinstance(node, Function):
+                    frames.append((GET_FUNCTION, node))
+                    node = node.inner_data
+                elif isinstance(node, Application) and node.applied:
+                    node = node.left
+                else:
+                    break
+            else:
+                # replicate: copy floors, pass through bound values
+                if isinstance(node, Name):
+                    if node.value is None:
+                        # name has been marked for copy, otherwise keep self (no copy)
+                        node = replacement.get(node, node)
+                        break
+                    frames.append((REPLICATE_RESOLVED, replacement))
+                    node = node.value
+                    replacement = None
+                elif isinstance(node, Function):
+                    if node.bound:
+                        frames.append((REPLICATE_RESOLVED, replacement))
+                        node = node.inner_data
+                        replacement = None
+                    else:
+                        # create a new name to copy and mark the old one for replacement
+                        newname = Name(node.name.symbol)
+                        frames.append((REPLICATE_FUNCTION, newname, replacement,
+                                       node.name, replacement.get(node.name)))
+                        replacement[node.name] = newname
+                        node = node.inner_data
+                elif isinstance(node, Application):
+                    if node.applied:
+                        frames.append((REPLICATE_RESOLVED, replacement))
+                    else:
+                        frames.append((REPLICATE_LEFT, node, replacement))
+                    node = node.left
+                    replacement = None
+                else:
+                    break
+        # ascend with the value until a frame needs another descent
+        result = node
+        while frames:
+            frame = frames.pop()
+            kind = frame[0]
+            if kind == GET_NAME:
+                node = result
+                replacement = {}
+                copies += 1
+                break
+            elif kind == GET_FUNCTION:
+                function = frame[1]
+                function.inner_data = result
+                if not function.bound:
+                    result = function
+            elif kind == REPLICATE_RESOLVED:
+                node = result
+                replacement = frame[1]
+                break
+            elif kind == REPLICATE_FUNCTION:
+                _, newname, replacement, oldname, previous = frame
+                # unmark the old name once its scope has been copied
+                if previous is None:
+                    del replacement[oldname]
+                else:
+                    replacement[oldname] = previous
+                result = Function(newname).set_expr(result)
+                allocated += 2
+            elif kind == REPLICATE_LEFT:
+                frames.append((REPLICATE_RIGHT, frame[1], frame[2]))
+                node = result
+                replacement = frame[2]
+                break
+            elif kind == REPLICATE_RIGHT:
+                frames.append((REPLICATE_RIGHT_RESOLVED, result, frame[2]))
+                node = frame[1].right
+                replacement = None
+                break
+            elif kind == REPLICATE_RIGHT_RESOLVED:
+                frames.append((REPLICATE_APPLICATION, frame[1]))
+                node = result
+                replacement = frame[2]
+                break
+            else:
+                result = Application().set_left(frame[1]).set_right(result)
+                allocated += 1
+        else:
+            if stats is not None:
+                stats.replicate_calls += copies
+                stats.nodes_allocated += allocated
+            return result
+
+
+# pieces of output collected before they are written to the stream
+DUMP_BUFFER = 4096
+# marks the end of a nesting level in the items left to dump
+LEAVE = object()
+
+
+class Output:
+    """Pieces of text written to a stream in blocks, cut short with an ellipsis once they go past a limit of characters"""
+    def __init__(self, stream: typing.TextIO, limit: int = None):
+        self.stream = stream
+        self.limit = limit
+        self.length = 0
+        self.pieces = []
+
+    def add(self, piece: str) -> bool:
+        """Add a piece of text, returns False once the limit has been reached and nothing else should be added"""
+        if self.limit is not None and self.length + len(piece) > self.limit:
+            self.pieces.append(piece[:self.limit - self.length] + '…')
+            return False
+        self.length += len(piece)
+        self.pieces.append(piece)
+        if len(self.pieces) >= DUMP_BUFFER:
+            self.flush()
+        return True
+
+    def flush(self):
+        self.stream.write(''.join(self.pieces))
+        self.pieces.clear()
+
+
+def resolve(expression: Expression) -> Expression:
+    """Follow bound values down to the expression that is printed in place of an expression, without retrieving it"""
+    while True:
+        if isinstance(expression, Name):
+            if expression.value is None:
+                return expression
+            expression = expression.value
+        elif isinstance(expression, Function):
+            if not expression.bound:
+                return expression
+            expression = expression.inner_data
+        elif isinstance(expression, Application):
+            if not expression.applied and expression.right is not None:
+                return expression
+            expression = expression.left
         else:
-            # create a new application with copies
-            return Application().set_left(self.left.get().replicate(replacement)).set_right(self.right.get().replicate(replacement))
+            return expression
+
+
+def shared(expression: Expression) -> set:
+    """Functions and applications that are printed more than once in an expression, each one is visited once"""
+    seen = set()
+    found = set()
+    nodes = [expression]
+    while nodes:
+        node = resolve(nodes.pop())
+        if isinstance(node, Name):
+            continue
+        if node in seen:
+            found.add(node)
+            continue
+        seen.add(node)
+        if isinstance(node, Function):
+            nodes.append(node.inner_data)
+        elif isinstance(node, Application):
+            nodes.append(node.right)
+            nodes.append(node.left)
+    return found
+
+
+def dump(expression: Expression, stream: typing.TextIO, limit: int = None, depth: int = None, share: bool = False):
+    """Write the printed form of an expression to a text stream in one pass, following bound values without copying them.
+    With a limit the output is cut to that many characters followed by an ellipsis, the rest is never visited.
+    With a depth the functions and applications nested deeper than it are written as an ellipsis.
+    With share a function or application reached more than once is written the first time labelled #n= and as #n# after that"""
+    # label of every shared node, 0 until it has been written
+    labels = dict.fromkeys(shared(expression), 0) if share else None
+    count = 0
+    level = 0
+    output = Output(stream, limit)
+    pieces = output.pieces
+    # literal strings and expressions left to print, LEAVE marks the end of a nesting level when there is a depth
+    items = [expression]
+    while items:
+        node = items.pop()
+        if type(node) is str:
+            piece = node
+        elif node is LEAVE:
+            level -= 1
+            continue
+        else:
+            # follow bound values
+            while True:
+                if isinstance(node, Name):
+                    if node.value is None:
+                        break
+                    node = node.value
+                elif isinstance(node, Function):
+                    if not node.bound:
+                        break
+                    node = node.inner_data
+                elif isinstance(node, Application):
+                    if not node.applied and node.right is not None:
+                        break
+                    node = node.left
+                else:
+                    break
+            if isinstance(node, Name):
+                piece = node.symbol if node.symbol is not None else str(id(node))
+            elif not isinstance(node, (Function, Application)):
+                piece = object.__repr__(node)
+            elif depth is not None and level >= depth:
+                piece = '…'
+            elif labels is not None and labels.get(node):
+                piece = f"#{labels[node]}#"
+            else:
+                piece = ''
+                if labels is not None and node in labels:
+                    count += 1
+                    labels[node] = count
+                    piece = f"#{count}="
+                if depth is not None:
+                    level += 1
+                    items.append(LEAVE)
+                if isinstance(node, Function):
+                    piece += "λ " + (node.name.symbol if node.name.symbol is not None else str(id(node.name))) + ". "
+                    items.append(node.inner_data)
+                else:
+                    piece += "("
+                    items.append(")")
+                    items.append(node.right)
+                    items.append(" ")
+                    items.append(node.left)
+        if limit is not None:
+            if not output.add(piece):
+                break
+        else:
+            pieces.append(piece)
+            if len(pieces) >= DUMP_BUFFER:
+                output.flush()
+    output.flush()
+
+
+def write(expression: Expression, limit: int = None, depth: int = None, share: bool = False) -> str:
+    """Build the string form of an expression, see dump for the options"""
+    stream = io.StringIO()
+    dump(expression, stream, limit, depth, share)
+    return stream.getvalue()
+
+
+def size(expression: Expression) -> int:
+    """Count the names, functions and applications in the printed form of an expression without retrieving it"""
+    count = 0
+    items = [expression]
+    while items:
+        item = items.pop()
+        if isinstance(item, Name):
+            if item.value is None:
+                count += 1
+            else:
+                items.append(item.value)
+        elif isinstance(item, Function):
+            if not item.bound:
+                count += 1
+            items.append(item.inner_data)
+        elif isinstance(item, Application):
+            if item.applied:
+                items.append(item.left)
+            else:
+                count += 1
+                items.append(item.left)
+                if item.right is not None:
+                    items.append(item.right)
+    return count
+
+
+# beta steps between two measurements of the term size once the steps are past it
+SAMPLE_INTERVAL = 4096
+
+
+class Progress:
+    """Beta steps of the reference solver taken so far, counted while an instance is the module level progress.
+    Costs a single addition per step, for reporting progress without collecting the Stats"""
+    __slots__ = ('steps',)
+
+    def __init__(self):
+        self.steps = 0
+
+
+class Stats:
+    """Counters of the reference solver and the wall and CPU time spent in each phase of a run.
+    Collected while an instance is the module level stats, which is None when they are disabled"""
+    PHASES = ('lex', 'parse', 'build', 'solve', 'rename', 'print')
+
+    def __init__(self):
+        self.beta_steps = 0
+        self.replicate_calls = 0  # copies of bound values
+        self.nodes_allocated = 0  # functions, names and applications created by the copies
+        self.max_term_size = 0  # largest size measured, the term is measured at growing step intervals
+        self.wall = dict.fromkeys(self.PHASES, 0.0)
+        self.cpu = dict.fromkeys(self.PHASES, 0.0)
+        self._next_sample = 1
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Add the wall and CPU time of the block to a phase"""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.wall[name] = self.wall.get(name, 0.0) + time.perf_counter() - wall
+            self.cpu[name] = self.cpu.get(name, 0.0) + time.process_time() - cpu
+
+    def measure(self, expression: Expression):
+        """Record the size of an expression if it is the largest so far"""
+        self.max_term_size = max(self.max_term_size, size(expression))
+
+    def sample(self, expression: Expression):
+        """Measure the expression being solved after 1, 2, 4... beta steps and every SAMPLE_INTERVAL steps after that"""
+        if self.beta_steps >= self._next_sample:
+            self.measure(expression)
+            self._next_sample = self.beta_steps + min(self.beta_steps, SAMPLE_INTERVAL)
+
+    def add(self, other: 'Stats'):
+        """Add the counters and phase times of statistics collected elsewhere, such as in another process"""
+        self.beta_steps += other.beta_steps
+        self.replicate_calls += other.replicate_calls
+        self.nodes_allocated += other.nodes_allocated
+        self.max_term_size = max(self.max_term_size, other.max_term_size)
+        for name in other.wall:
+            self.wall[name] = self.wall.get(name, 0.0) + other.wall[name]
+            self.cpu[name] = self.cpu.get(name, 0.0) + other.cpu[name]
+
+    def as_dict(self) -> dict:
+        return {'beta_steps': self.beta_steps, 'replicate_calls': self.replicate_calls,
+                'nodes_allocated': self.nodes_allocated, 'max_term_size': self.max_term_size,
+                'wall': self.wall, 'cpu': self.cpu}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
 
     def __str__(self):
-        if self.right is not None and not self.applied:
-            return f"({self.left.get()} {self.right.get()})"
-        else:
-            return str(self.left.get())
+        lines = [f"beta steps:      {self.beta_steps}",
+                 f"replicate calls: {self.replicate_calls}",
+                 f"nodes allocated: {self.nodes_allocated}",
+                 f"max term size:   {self.max_term_size}",
+                 f"{'phase':<8}{'wall (s)':>12}{'cpu (s)':>12}"]
+        for name in self.wall:
+            lines.append(f"{name:<8}{self.wall[name]:>12.6f}{self.cpu[name]:>12.6f}")
+        return '\n'.join(lines)
+
+
+# statistics of the current run, None when they are not collected so every hook is a single check
+stats = None
+# step counter of the current run, None when progress is not reported
+progress = None
+# loop detection of the current run (a divergence.Watch), None when it is disabled
+watch = None
+# limits of the current run (a budget.Budget), None when it has none
+budget = None
+_untimed = contextlib.nullcontext()
+
+
+def phase(name: str):
+    """Context that times a phase of the run into stats, does nothing when statistics are disabled"""
+    return _untimed if stats is None else stats.phase(name)
+
+
+class Observer:
+    """Follows the binding steps of the reference solver and the renames of the renamer, passed to them as showstep.
+    position is the path of the application being bound from the root, l and r for its sides and b for a function body"""
+    def __init__(self):
+        self.prefix = ''  # path of the expression the solver is reducing
+        self.position = ''
 
+    def descend(self, path: str):
+        """The solver went on to reduce the expression at the path below the current one"""
+        self.prefix += path
 
-def create_showstep(expression: Expression) -> Function:
-    """Create a function that will count steps and display the full expression"""
-    count = 1
+    def locate(self, waiting: list):
+        """The application about to be bound is below the (application, side) entries waiting on it"""
+        self.position = self.prefix + ''.join('l' if side == WAIT_LEFT else 'r' for _, side in waiting)
 
-    def showstep():
-        nonlocal count
-        print(str(count)+'. '+Fore.BLUE+str(expression.get())+Fore.RESET)
-        count += 1
-    return showstep
+    def associate(self, application: 'Application'):
+        """The right side of the application is about to be bound into the function on its left"""
 
+    def bound(self, name: Name):
+        """The name of a function got its value"""
 
-def solver(expression: Expression, showstep=None) -> Expression:
-    """Given an expression, reduce it until it is no longer possible"""
-    # bind every application until it is reduced as much as possible
-    while isinstance(expression, Application):
-        evaled = expression.bind(None, showstep)
-        expression = expression.get()
-        if not evaled:  # binding did not work, left is expression or name
-            break
-    # retrieve the body of the expression
-    innerexpr = expression.get_inner()
-    if isinstance(innerexpr, Application):
-        # left was fully evaluated, evaluate right
-        if innerexpr == expression:
-            solver(expression.right, showstep)
+    def step(self):
+        """A binding step is done"""
+
+    def renamed(self, name: Name, old_symbol: str):
+        """A name has been given a new symbol"""
+
+    def close(self):
+        """Nothing else will be observed, write out whatever is buffered"""
+
+
+class Observers(Observer):
+    """Pass every observation on to several observers"""
+    def __init__(self, *observers: Observer):
+        super().__init__()
+        self.observers = observers
+
+    def descend(self, path: str):
+        for observer in self.observers:
+            observer.descend(path)
+
+    def locate(self, waiting: list):
+        for observer in self.observers:
+            observer.locate(waiting)
+
+    def associate(self, application: 'Application'):
+        for observer in self.observers:
+            observer.associate(application)
+
+    def bound(self, name: Name):
+        for observer in self.observers:
+            observer.bound(name)
+
+    def step(self):
+        for observer in self.observers:
+            observer.step()
+
+    def renamed(self, name: Name, old_symbol: str):
+        for observer in self.observers:
+            observer.renamed(name, old_symbol)
+
+    def close(self):
+        for observer in self.observers:
+            observer.close()
+
+
+# lines an Explainer keeps before writing them out
+EXPLAIN_BUFFER = 256
+# characters of a function or argument shown with each step when the full term is not shown every step
+EXPLAIN_LIMIT = 120
+
+
+class Explainer(Observer):
+    """Display every binding step and the full expression after every so many of them.
+    Showing the expression after each step (every=1) is the full explanation, with larger intervals
+    the messages of the steps are cut short as well, so a step costs little more than the step itself"""
+    def __init__(self, expression: Expression, every: int = 1, stream: typing.TextIO = None):
+        super().__init__()
+        self.expression = expression
+        self.every = every
+        self.limit = None if every == 1 else EXPLAIN_LIMIT
+        self.stream = stream
+        self.count = 1
+        self._lines = []
+
+    def write(self, line: str):
+        self._lines.append(line)
+        if len(self._lines) >= EXPLAIN_BUFFER:
+            self.close()
+
+    def show(self):
+        """Display the full expression numbered with the current step"""
+        self.write(str(self.count)+'. '+Fore.BLUE+write(self.expression)+Fore.RESET)
+
+    def associate(self, application: 'Application'):
+        self.write(f"\nAssociate {Fore.GREEN+write(application.right, self.limit)+Fore.RESET} "
+                   f"with {Fore.GREEN+write(application.left, self.limit)+Fore.RESET}")
+
+    def bound(self, name: Name):
+        self.write(f"{Fore.GREEN+str(name.symbol)+Fore.RESET} becomes {Fore.GREEN+write(name.value, self.limit)+Fore.RESET}")
+
+    def step(self):
+        if self.every and self.count % self.every == 0:
+            self.show()
+        self.count += 1
+
+    def renamed(self, name: Name, old_symbol: str):
+        self.write(f"\nRenaming {Fore.GREEN+old_symbol+Fore.RESET} to {Fore.GREEN+name.symbol+Fore.RESET}")
+        self.show()
+        self.count += 1
+
+    def close(self):
+        stream = self.stream or sys.stdout
+        if self._lines:
+            stream.write('\n'.join(self._lines) + '\n')
+            self._lines.clear()
+        stream.flush()
+
+
+def create_showstep(expression: Expression, every: int = 1) -> Explainer:
+    """Create an observer that will count steps and display the full expression"""
+    return Explainer(expression, every)
+
+
+# how far solver reduces an expression
+NF = 'nf'  # normal form, nothing is left to reduce
+HNF = 'hnf'  # head normal form, functions around a name applied to arguments that are left as they are
+WHNF = 'whnf'  # weak head normal form, a function or a name applied to arguments, nothing inside either is reduced
+TARGETS = (NF, HNF, WHNF)
+# name of the form each target reduces to, for messages
+FORMS = {NF: 'normal form', HNF: 'head normal form', WHNF: 'weak head normal form'}
+
+
+def solver(expression: Expression, showstep=None, cache=None, target: str = NF) -> Expression:
+    """Given an expression, reduce it until it is no longer possible, or only until it reaches a head normal form.
+    A cache of normal forms is reused for the expression and the closed arguments it reduces, unless steps are shown"""
+    if target != NF:
+        return head(expression, target == WHNF, showstep, cache)
+    if showstep is not None:
+        cache = None
+        showstep.prefix = ''
+    key = None
+    if cache is not None:
+        key = cache.key(expression)
+        normal = cache.fetch(key)
+        if normal is not None:
+            return normal
+    root = expression
+    if stats is not None:
+        stats.measure(root)
+    if watch is not None:
+        watch.enter(expression)
+    # every expression that was reduced with its cache key, retrieved again once all of the inner ones are done
+    reduced = []
+    # application whose binding step is known to change nothing, since the step that
+    # reached it from the application above went through it without binding anything
+    settled = None
+    # names of the functions whose bodies are being reduced and the terms of cached normal forms
+    enclosing = set()
+    known = {}
+    # applications of a stuck spine whose right sides are left to reduce, with the showstep path of the
+    # spine and how far down it each one is
+    pending = []
+    while True:
+        # bind every application until it is reduced as much as possible
+        while isinstance(expression, Application):
+            if watch is not None:
+                # the expression is a new copy after each step that changed it
+                watch.expression = expression
+            if expression is settled:
+                evaled, steps = False, 0
+            else:
+                evaled, steps = expression.reduce(showstep)
+                if stats is not None:
+                    stats.sample(root)
+            settled = expression.right if not evaled and steps == 0 and expression.descends_right() else None
+            expression = expression.get()
+            if not evaled:  # binding did not work, left is expression or name
+                break
+        reduced.append((expression, key))
+        key = None
+        # retrieve the body of the expression
+        innerexpr = expression.get_inner()
+        if not isinstance(innerexpr, Application):
+            innerexpr = None
+        elif innerexpr is expression:
+            # left was fully evaluated so the head of the spine is stuck, queue every argument of the spine in one
+            # walk down it, the first one ends up on top
+            spine = expression
+            depth = 0
+            while isinstance(spine, Application):
+                pending.append((spine, None if showstep is None else showstep.prefix, depth))
+                spine.left = spine.left.get()
+                spine = spine.left
+                depth += 1
+            innerexpr = None
         else:
             # reduce the body of a function
-            solver(innerexpr, showstep)
-    return expression.get()
+            if cache is not None or showstep is not None:
+                function = expression
+                while isinstance(function, Function):
+                    if cache is not None:
+                        enclosing.add(function.name)
+                    if showstep is not None:
+                        showstep.descend('b')
+                    function = function.inner_data
+            expression = innerexpr
+            if watch is not None:
+                watch.enter(expression)
+        while innerexpr is None and pending:
+            application, prefix, depth = pending.pop()
+            if showstep is not None:
+                showstep.prefix = prefix + 'l' * depth
+            # evaluate the argument unless its normal form is known
+            if cache is not None:
+                key = cache.key(application.right, enclosing, known)
+                normal = cache.fetch(key)
+                if normal is not None:
+                    application.right = normal
+                    key = None
+                    continue
+            expression = innerexpr = application.right
+            if showstep is not None:
+                showstep.descend('r')
+            if watch is not None:
+                watch.enter(expression)
+        if innerexpr is None:
+            break
+    while reduced:
+        expression, key = reduced.pop()
+        expression = expression.get()
+        if key is not None:
+            known[expression] = cache.remember(key, expression, known)
+    if stats is not None:
+        stats.measure(expression)
+    return expression
+
+
+def head(expression: Expression, weak: bool = False, showstep=None, cache=None) -> Expression:
+    """Reduce an expression to its head normal form, or its weak head normal form when weak.
+    Only the redexes at the head are bound, in the same order as the solver takes them, so the arguments of the head
+    name are left as they are and a weak head normal form stops at the first function.
+    A cache is reused for the expression as a whole, under a key of its target so normal forms are never mixed in"""
+    if showstep is not None:
+        cache = None
+        showstep.prefix = ''
+    key = None
+    if cache is not None:
+        key = cache.key(expression, target=WHNF if weak else HNF)
+        reduced = cache.fetch(key)
+        if reduced is not None:
+            return reduced
+    if stats is not None:
+        stats.measure(expression)
+    if watch is not None:
+        watch.enter(expression)
+    expression = weak_head(expression, showstep)
+    if not weak:
+        # reduce the bodies of the functions at the head until one of them is a name applied to arguments
+        function = expression
+        while isinstance(function, Function):
+            if showstep is not None:
+                showstep.descend('b')
+            body = function.inner_data
+            if not isinstance(body, Function):
+                if watch is not None:
+                    watch.enter(body)
+                body = function.inner_data = weak_head(body, showstep)
+            function = body
+    if stats is not None:
+        stats.measure(expression)
+    if key is not None:
+        cache.remember(key, expression)
+    return expression
+
+
+def weak_head(expression: Expression, showstep=None) -> Expression:
+    """Bind the leftmost application of the spine of an expression until it is a function or a name applied to
+    arguments, returns the expression retrieved"""
+    expression = expression.get()
+    # applications of the spine waiting on their left side, the outermost first
+    spine = []
+    app = expression
+    while isinstance(app, Application):
+        app.left = app.left.get()
+        if isinstance(app.left, Application):
+            spine.append((app, WAIT_LEFT))
+            app = app.left
+            continue
+        if not isinstance(app.left, Function) or app.right is None:
+            break  # the head is a name
+        if watch is not None:
+            watch.expression = expression
+        if showstep is not None:
+            showstep.locate(spine)
+        app.bind_left(showstep)
+        # the result takes the place of the application and is reduced in turn
+        result = app.get()
+        if spine:
+            app = spine.pop()[0]
+            app.left = result
+        else:
+            app = expression = result
+    return expression
 
 
 valid_alphabet = list(string.ascii_lowercase)
 valid_alphabet.extend(list(string.ascii_uppercase))
 
 
-def get_next_name(cur_names: dict):
-    """Get a single-character alphabetical new name string that is not in cur_names"""
-    for char in valid_alphabet:
-        if char not in cur_names:
-            return char
-    raise Exception("Could not find any more alphabetical names")
-
-
-def renamer(expression: Expression, cur_names: dict = None, showstep = None):
-    """Loops through a statement and renames Names that have the same name in the same scope"""
-    # set cur_names to empty if none (create new empty)
-    if cur_names is None:
-        cur_names = {}
-    expr = expression.get()
-    if isinstance(expr, Name):
-        if expr.symbol in cur_names:
-            if expr != cur_names[expr.symbol]:
-                try:
-                    # get new name
-                    new_symbol = get_next_name(cur_names)
-                    old_symbol = expr.symbol
-                    # change symbol
-                    expr.symbol = new_symbol
-                    # display message
-                    if showstep is not None:
-                        print(
-                            f"\nRenaming {Fore.GREEN+old_symbol+Fore.RESET} to {Fore.GREEN+new_symbol+Fore.RESET}")
-                        showstep()
-                    cur_names[new_symbol] = expr
-                except:
-                    if showstep is not None:
-                        print("Could not rename further...")
-                return
-            else:  # ignore, already seen
-                return
-        else:  # register new symbol
-            cur_names[expr.symbol] = expr
-    elif isinstance(expr, Application):
-        # rename for left and right sides, copy current dict to prevent mutation
-        renamer(expr.left.get(), cur_names.copy(), showstep)
-        renamer(expr.right.get(), cur_names.copy(), showstep)
-    elif isinstance(expr, Function):
-        # register new name on right or rename it
-        renamer(expr.name.get(), cur_names, showstep)
-        # use updated dict to update inner
-        renamer(expr.inner_data.get(), cur_names.copy(), showstep)
+def fresh_names(taken: set) -> typing.Iterator[str]:
+    """Generate the symbols that are not in taken, adding each one to it: a to Z, then a1, ..., Z1, a2, ...
+    once the letters run out. Every character of a source is a name of its own, so a numbered name is for reading only"""
+    numbered = (char + str(number) for number in itertools.count(1) for char in valid_alphabet)
+    for symbol in itertools.chain(valid_alphabet, numbered):
+        if symbol not in taken:
+            taken.add(symbol)
+            yield symbol
+
+
+def retrieve(expression: Expression) -> Expression:
+    """Retrieve an expression without walking into the body of a function, only bound names are copied"""
+    while True:
+        if isinstance(expression, Name):
+            return expression if expression.value is None else expression.get()
+        elif isinstance(expression, Function) and expression.bound:
+            expression = expression.inner_data
+        elif isinstance(expression, Application) and expression.applied:
+            expression = expression.left
+        else:
+            return expression
+
+
+def renamer(expression: Expression, showstep=None):
+    """Loops through a statement and renames the functions whose name captures another Name of the same symbol.
+    Every node is visited once with a single scope of the symbols, so only the conflicting functions get a new symbol"""
+    expression = retrieve(expression)
+    # retrieve every node in place so the renamed names are the ones printed, collecting the symbols in use
+    taken = set()
+    items = [expression]
+    while items:
+        expr = items.pop()
+        if isinstance(expr, Function):
+            taken.add(expr.name.symbol)
+            expr.inner_data = retrieve(expr.inner_data)
+            items.append(expr.inner_data)
+        elif isinstance(expr, Application):
+            expr.left = retrieve(expr.left)
+            items.append(expr.left)
+            if expr.right is not None:
+                expr.right = retrieve(expr.right)
+                items.append(expr.right)
+        else:
+            taken.add(expr.symbol)
+    fresh = fresh_names(taken)
+    # function name in scope by symbol and the one each function name hides (None if there is none)
+    scope = {}
+    hidden = {}
+    # a tuple holding a function name marks the end of its scope
+    items = [expression]
+    while items:
+        expr = items.pop()
+        if isinstance(expr, tuple):
+            name = expr[0]
+            outer = hidden.pop(name)
+            if outer is None:
+                del scope[name.symbol]
+            else:
+                scope[name.symbol] = outer
+        elif isinstance(expr, Function):
+            name = expr.name
+            if name.symbol is not None:
+                hidden[name] = scope.get(name.symbol)
+                scope[name.symbol] = name
+                items.append((name,))
+            items.append(expr.inner_data)
+        elif isinstance(expr, Application):
+            if expr.right is not None:
+                items.append(expr.right)
+            items.append(expr.left)
+        else:
+            # move the functions between the name and its own function (or the top for a free name) to new symbols
+            binder = scope.get(expr.symbol)
+            while binder is not None and binder is not expr:
+                old_symbol = binder.symbol
+                binder.symbol = next(fresh)
+                outer = hidden[binder]
+                if outer is None:
+                    del scope[old_symbol]
+                else:
+                    scope[old_symbol] = outer
+                scope[binder.symbol] = binder
+                hidden[binder] = None
+                if showstep is not None:
+                    showstep.renamed(binder, old_symbol)
+                binder = outer
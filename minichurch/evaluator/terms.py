@@ -0,0 +1,176 @@
+import weakref
+
+from minichurch.evaluator import syntax
+
+# every live term by its structure, so building a term that already exists returns the existing object
+# the table holds terms weakly, a term is dropped from it once nothing else refers to it
+_table = weakref.WeakValueDictionary()
+
+
+class Term:
+    """Immutable de Bruijn indexed term shared through the global table.
+    Alpha-equivalent terms are the same object, so they compare and hash by identity.
+    size is the number of nodes, free is one more than the largest de Bruijn index
+    that points outside of the term (0 when the term does not refer to any enclosing lambda)"""
+    __slots__ = ('size', 'free', '__weakref__')
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Terms are immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("Terms are immutable")
+
+    def __str__(self):
+        return str(to_expression(self))
+
+    def __repr__(self):
+        return str(self)
+
+
+def _intern(cls, key, fields: dict):
+    """Retrieve the term for the key or create it with the given slot values"""
+    term = _table.get(key)
+    if term is None:
+        term = object.__new__(cls)
+        for slot, value in fields.items():
+            object.__setattr__(term, slot, value)
+        _table[key] = term
+    return term
+
+
+class Var(Term):
+    """Name bound by the lambda index levels out (0 is the innermost)"""
+    __slots__ = ('index',)
+
+    def __new__(cls, index: int):
+        return _intern(cls, (Var, index), {'index': index, 'size': 1, 'free': index + 1})
+
+
+class Free(Term):
+    """Name that is not bound by any lambda"""
+    __slots__ = ('symbol',)
+
+    def __new__(cls, symbol: str):
+        return _intern(cls, (Free, symbol), {'symbol': symbol, 'size': 1, 'free': 0})
+
+
+class Lam(Term):
+    """Lambda over a body, hint is the symbol to print for its name.
+    The hint does not take part in the identity of the term, the first one seen is kept"""
+    __slots__ = ('body', 'hint')
+
+    def __new__(cls, body: Term, hint: str = None):
+        return _intern(cls, (Lam, body), {'body': body, 'hint': hint,
+                                          'size': body.size + 1, 'free': max(body.free - 1, 0)})
+
+
+class App(Term):
+    """Application of the right term to the left term"""
+    __slots__ = ('left', 'right')
+
+    def __new__(cls, left: Term, right: Term):
+        return _intern(cls, (App, left, right), {'left': left, 'right': right,
+                                                 'size': left.size + right.size + 1,
+                                                 'free': max(left.free, right.free)})
+
+
+def interned() -> int:
+    """Number of distinct terms that are currently alive"""
+    return len(_table)
+
+
+def unwrap(expression: syntax.Expression) -> syntax.Expression:
+    """Follow bound Names, bound Functions and applied Applications without replicating anything"""
+    while True:
+        if isinstance(expression, syntax.Name):
+            if expression.value is None:
+                return expression
+            expression = expression.value
+        elif isinstance(expression, syntax.Function):
+            if not expression.bound:
+                return expression
+            expression = expression.inner_data
+        elif isinstance(expression, syntax.Application):
+            if not expression.applied:
+                return expression
+            expression = expression.left
+        else:
+            return expression
+
+
+def from_expression(expression: syntax.Expression, outer: set = None, known: dict = None) -> Term:
+    """Convert a syntax expression into a term, names bound by a Function become de Bruijn indices.
+    outer holds Names bound by functions around the expression, the conversion returns None when one of them is used.
+    known maps expressions that have been converted already (without outer names) to their terms"""
+    levels = {}  # binder name -> number of lambdas enclosing it
+    results = []
+    # each task is (expression, lambda depth, None or the level a function shadowed once its children are converted)
+    tasks = [(expression, 0, None)]
+    while tasks:
+        expr, depth, ready = tasks.pop()
+        if ready is not None:
+            if isinstance(expr, syntax.Function):
+                # leave the scope of the function's name
+                if ready < 0:
+                    del levels[expr.name]
+                else:
+                    levels[expr.name] = ready
+                results.append(Lam(results.pop(), expr.name.symbol))
+            else:
+                right = results.pop()
+                results.append(App(results.pop(), right))
+            continue
+        expr = unwrap(expr)
+        if known is not None and expr in known:
+            results.append(known[expr])
+        elif isinstance(expr, syntax.Name):
+            if expr in levels:
+                results.append(Var(depth - levels[expr] - 1))
+            elif outer is not None and expr in outer:
+                return None
+            else:
+                results.append(Free(expr.symbol))
+        elif isinstance(expr, syntax.Function):
+            tasks.append((expr, depth, levels.get(expr.name, -1)))
+            levels[expr.name] = depth
+            tasks.append((expr.inner_data, depth + 1, None))
+        else:
+            tasks.append((expr, depth, 0))
+            tasks.append((expr.right, depth, None))
+            tasks.append((expr.left, depth, None))
+    return results[0]
+
+
+def to_expression(term: Term) -> syntax.Expression:
+    """Convert a term into a new syntax expression, each lambda gets its own Name printed with its hint"""
+    free_names = {}
+    binders = []  # Names of the enclosing lambdas, innermost last
+    root = syntax.Application()
+    # each task is (term, parent expression, attribute of the parent to fill) or None to leave a lambda
+    tasks = [(term, root, 'left')]
+    while tasks:
+        task = tasks.pop()
+        if task is None:
+            binders.pop()
+            continue
+        term, parent, slot = task
+        if isinstance(term, Var):
+            if term.index >= len(binders):
+                raise ValueError("Only terms without loose de Bruijn indices can be converted")
+            expression = binders[-1 - term.index]
+        elif isinstance(term, Free):
+            if term.symbol not in free_names:
+                free_names[term.symbol] = syntax.Name(term.symbol)
+            expression = free_names[term.symbol]
+        elif isinstance(term, Lam):
+            name = syntax.Name(term.hint if term.hint is not None else 'x')
+            expression = syntax.Function(name)
+            binders.append(name)
+            tasks.append(None)
+            tasks.append((term.body, expression, 'inner_data'))
+        else:
+            expression = syntax.Application()
+            tasks.append((term.right, expression, 'right'))
+            tasks.append((term.left, expression, 'left'))
+        setattr(parent, slot, expression)
+    return root.left
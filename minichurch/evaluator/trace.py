@@ -0,0 +1,107 @@
+import base64
+import json
+import typing
+
+import minichurch
+from minichurch.evaluator import syntax
+from minichurch.parser import compiled
+
+# layout of the trace records
+FORMAT = 1
+# characters of an argument recorded with each step
+ARGUMENT_LIMIT = 200
+
+
+class Trace(syntax.Observer):
+    """Record the binding steps of the reference solver as json lines.
+    The first record holds the compiled input so the trace can be replayed, each step only records the path of
+    the application that was bound, the name of its function and the start of its argument.
+    The full term is recorded every so many steps (never with 0), when snapshot is called and at the end"""
+    def __init__(self, stream: typing.TextIO, expression: syntax.Expression, every: int = 0,
+                 limit: int = ARGUMENT_LIMIT, target: str = syntax.NF):
+        super().__init__()
+        self.stream = stream
+        self.expression = expression
+        self.every = every
+        self.limit = limit
+        self.count = 0
+        self._binder = None
+        self._argument = None
+        self.record(type='start', format=FORMAT, version=minichurch.__version__, term=syntax.write(expression),
+                    compiled=base64.b64encode(compiled.dump(expression)).decode('ascii'), target=target)
+
+    def record(self, **fields):
+        self.stream.write(json.dumps(fields, ensure_ascii=False) + '\n')
+
+    def snapshot(self):
+        """Record the full term as it is after the current step"""
+        self.record(type='term', step=self.count, term=syntax.write(self.expression))
+
+    def associate(self, application: syntax.Application):
+        self._binder = application.left.name.symbol
+        self._argument = syntax.write(application.right, self.limit)
+
+    def step(self):
+        self.count += 1
+        self.record(type='step', step=self.count, position=self.position, binder=self._binder, argument=self._argument)
+        if self.every and self.count % self.every == 0:
+            self.snapshot()
+
+    def renamed(self, name: syntax.Name, old_symbol: str):
+        self.record(type='rename', step=self.count, old=old_symbol, new=name.symbol)
+
+    def close(self):
+        self.record(type='end', steps=self.count, term=syntax.write(self.expression))
+        self.stream.flush()
+
+
+class Reached(Exception):
+    """Raised by a Replay once the step it is looking for is done"""
+
+
+class Replay(syntax.Observer):
+    """Check the steps of a solver run against the step records of a trace, stopping after a step"""
+    def __init__(self, records: typing.Iterator[dict], stop: int = None):
+        super().__init__()
+        self.records = records
+        self.stop = stop
+        self.count = 0
+        self._binder = None
+
+    def associate(self, application: syntax.Application):
+        self._binder = application.left.name.symbol
+
+    def step(self):
+        self.count += 1
+        expected = next((record for record in self.records if record.get('type') == 'step'), None)
+        if expected is None:
+            raise ValueError(f"Step {self.count} is not in the trace")
+        if (expected['position'], expected['binder']) != (self.position, self._binder):
+            raise ValueError(f"Step {self.count} binds {self._binder} at {self.position or 'the root'}, "
+                             f"the trace has {expected['binder']} at {expected['position'] or 'the root'}")
+        if self.count == self.stop:
+            raise Reached()
+
+
+def replay(lines: typing.Iterable[str], step: int = None) -> syntax.Expression:
+    """Rebuild the term after a step of a trace (the normal form when step is None) by reducing its input again.
+    Every step on the way is checked against the trace, a ValueError is raised when they part"""
+    records = (json.loads(line) for line in lines if line.strip())
+    header = next(records, None)
+    if header is None or header.get('type') != 'start':
+        raise ValueError("Expected a trace starting with its input")
+    if header.get('format') != FORMAT:
+        raise ValueError(f"Trace format {header.get('format')} is not supported")
+    expression = compiled.loads(base64.b64decode(header['compiled']))
+    if expression is None:
+        raise ValueError("Trace was recorded by another version")
+    if step == 0:
+        return expression
+    try:
+        # the run ends where the recorded one did
+        normal = syntax.solver(expression, Replay(records, step), target=header.get('target', syntax.NF))
+    except Reached:
+        return expression
+    if step is not None:
+        raise ValueError(f"The reduction ends before step {step}")
+    return normal
@@ -0,0 +1,249 @@
+import collections
+import multiprocessing
+import multiprocessing.connection
+import signal
+import threading
+import time
+import typing
+
+from minichurch.evaluator import budget, memo, strategies, syntax
+from minichurch.parser import compiled
+
+# seconds between two updates of the step count of a running job
+PROGRESS_INTERVAL = 0.1
+# jobs running at the same time, the others wait in the queue
+WORKERS = 2
+
+
+class Job:
+    """Statement evaluated by one of the worker processes of Jobs, queued jobs start in the order they were submitted
+    as soon as a worker is free, up to WORKERS of them running at the same time"""
+    def __init__(self, number: int, statement: str, data: bytes, strategy: str, background: bool = False,
+                 stats: syntax.Stats = None, limits: tuple = None, target: str = syntax.NF):
+        self.number = number
+        self.statement = statement
+        self.data = data  # compiled form of the built expression
+        self.strategy = strategy
+        self.background = background  # reported once done instead of waited on
+        self.limits = limits  # arguments of the budget.Budget the evaluation keeps to, None for no limits
+        self.target = target  # one of syntax.TARGETS
+        self.state = 'queued'  # then running, and done, stopped, failed or cancelled
+        self.started = None
+        self.elapsed = None
+        self.result = None  # normal form once done, the term reached so far once stopped by a limit
+        self.error = None  # why it failed or stopped
+        self.stats = stats  # statistics of the statement when they are collected, the worker's are added to them
+
+    @property
+    def pending(self) -> bool:
+        return self.state in ('queued', 'running')
+
+
+def serve(connection, steps, memo_size: int):
+    """Evaluate the jobs a worker of the pool receives on its connection, keeping a cache of normal forms between them.
+    Jobs hands each worker a new job once it answered the last one, the other workers run theirs at the same time.
+    The beta steps of the running job are copied to steps every PROGRESS_INTERVAL"""
+    # Ctrl-C in the REPL reaches the worker too, the REPL cancels the job instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cache = memo.create_cache(memo_size)
+
+    def report():
+        while True:
+            time.sleep(PROGRESS_INTERVAL)
+            current = syntax.progress
+            if current is not None:
+                steps.value = current.steps
+
+    threading.Thread(target=report, daemon=True).start()
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return  # the REPL is gone
+        if message[0] == 'memo':
+            # resize the cache (0 disables it) or clear it with a size of None
+            size = message[1]
+            if size is None:
+                if cache is not None:
+                    cache.clear()
+            elif cache is None:
+                cache = memo.create_cache(size)
+            elif size == 0:
+                cache = None
+            else:
+                cache.resize(size)
+            continue
+        _, number, data, strategy, limits, target, collect = message
+        # statistics are only collected for the jobs that carry them, the steps are always counted for the progress
+        syntax.progress = syntax.Progress()
+        syntax.stats = syntax.Stats() if collect else None
+        try:
+            expression = compiled.loads(data)
+            with syntax.phase('solve'):
+                expression = strategies.evaluate(expression, strategy, cache=cache,
+                                                 limits=None if limits is None else budget.Budget(*limits),
+                                                 target=target)
+            partial = None
+            if isinstance(expression, budget.Partial):
+                partial = expression
+                expression = partial.term
+            # rebind variables that are conflicting
+            with syntax.phase('rename'):
+                syntax.renamer(expression)
+            if partial is None:
+                reply = ('done', number, compiled.dump(expression))
+            else:
+                reply = ('stopped', number, (compiled.dump(expression), str(partial)))
+        except Exception as e:
+            reply = ('failed', number, str(e))
+        reply += (syntax.stats, None if cache is None else str(cache))
+        syntax.stats = syntax.progress = None
+        connection.send(reply)
+
+
+class Slot:
+    """Worker process of Jobs and the job it is running"""
+    def __init__(self, memo_size: int):
+        self.connection, child = multiprocessing.Pipe()
+        self.steps = multiprocessing.RawValue('Q', 0)
+        self.process = multiprocessing.Process(target=serve, args=(child, self.steps, memo_size), daemon=True)
+        self.process.start()
+        child.close()
+        self.job = None
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+class Jobs:
+    """Statements of the REPL evaluated by worker processes, so a long reduction can be stopped without leaving the REPL.
+    Up to workers jobs run at the same time and the others wait in a queue. Every worker keeps its own cache,
+    stopping a running job stops its worker and a new one with an empty cache takes its place"""
+    def __init__(self, memo_size: int = memo.DEFAULT_SIZE, workers: int = WORKERS):
+        self.memo_size = memo_size
+        self.workers = workers
+        self.cache_info = None  # counters of the cache of the worker that finished a job last
+        self.queue = collections.deque()
+        self.finished = []  # background jobs that are done and have not been reported yet
+        self._count = 0
+        self._slots = []  # workers started so far
+
+    def submit(self, statement: str, expression: syntax.Expression, strategy: str, background: bool = False,
+               stats: syntax.Stats = None, limits: tuple = None, target: str = syntax.NF) -> Job:
+        """Queue a built expression for evaluation to a target, limits are the arguments of a budget.Budget it keeps to"""
+        self._count += 1
+        job = Job(self._count, statement, compiled.dump(expression), strategy, background, stats, limits, target)
+        self.queue.append(job)
+        self.poll()
+        return job
+
+    def poll(self, timeout: float = 0):
+        """Collect the results of the running jobs that are done, waiting up to timeout for one, and start queued jobs"""
+        busy = [slot for slot in self._slots if slot.job is not None]
+        ready = multiprocessing.connection.wait([slot.connection for slot in busy], timeout) if busy else []
+        for slot in busy:
+            if slot.connection not in ready:
+                continue
+            try:
+                reply = slot.connection.recv()
+            except EOFError:
+                reply = ('failed', slot.job.number, 'The worker process stopped', None, None)
+                slot.stop()
+                self._slots.remove(slot)
+            self._finish(slot.job, *reply)
+            slot.job = None
+        while self.queue:
+            slot = next((slot for slot in self._slots if slot.job is None), None)
+            if slot is None:
+                if len(self._slots) >= self.workers:
+                    break
+                slot = Slot(self.memo_size)
+                self._slots.append(slot)
+            job = slot.job = self.queue.popleft()
+            job.state = 'running'
+            job.started = time.perf_counter()
+            slot.steps.value = 0
+            slot.connection.send(('job', job.number, job.data, job.strategy, job.limits, job.target,
+                                  job.stats is not None))
+
+    def wait(self, job: Job):
+        """Block until a job is done, Ctrl-C cancels it"""
+        try:
+            while job.pending:
+                self.poll(PROGRESS_INTERVAL)
+        except KeyboardInterrupt:
+            self.cancel(job)
+
+    def cancel(self, job: Job) -> bool:
+        """Cancel a queued job or stop a running one, returns False if it was no longer pending"""
+        if not job.pending:
+            return False
+        slot = self._slot(job)
+        if slot is not None:
+            slot.stop()
+            self._slots.remove(slot)
+            job.elapsed = time.perf_counter() - job.started
+        else:
+            self.queue.remove(job)
+        job.state = 'cancelled'
+        self.poll()
+        return True
+
+    def find(self, number: int) -> typing.Optional[Job]:
+        """Running or queued job with a number"""
+        return next((job for job in self.pending() if job.number == number), None)
+
+    def running(self) -> list:
+        """Running jobs in the order they were started"""
+        return sorted((slot.job for slot in self._slots if slot.job is not None), key=lambda job: job.started)
+
+    def pending(self) -> list:
+        """Running jobs followed by the queued ones"""
+        return self.running() + list(self.queue)
+
+    def progress(self, job: Job) -> tuple:
+        """Beta steps (None when the strategy does not count them) and seconds of a job so far"""
+        slot = self._slot(job)
+        if slot is None:
+            return None, job.elapsed or 0.0
+        steps = slot.steps.value if job.strategy == strategies.DEFAULT else None
+        return steps, time.perf_counter() - job.started
+
+    def memo(self, size: int = None):
+        """Resize the caches of the workers (0 disables them) or clear them with a size of None, applied before their next job"""
+        if size is not None:
+            self.memo_size = size
+        if not size:
+            self.cache_info = None
+        for slot in self._slots:
+            slot.connection.send(('memo', size))
+
+    def close(self):
+        """Stop the workers, jobs that were left are cancelled"""
+        for job in self.pending():
+            job.state = 'cancelled'
+        self.queue.clear()
+        for slot in self._slots:
+            slot.stop()
+        self._slots.clear()
+
+    def _slot(self, job: Job) -> typing.Optional[Slot]:
+        return next((slot for slot in self._slots if slot.job is job), None)
+
+    def _finish(self, job: Job, state: str, number: int, value, stats, cache_info):
+        job.elapsed = time.perf_counter() - job.started
+        job.state = state
+        if job.stats is not None and stats is not None:
+            job.stats.add(stats)
+        self.cache_info = cache_info
+        if state == 'done':
+            job.result = compiled.loads(value)
+        elif state == 'stopped':
+            data, job.error = value
+            job.result = compiled.loads(data)
+        else:
+            job.error = value
+        if job.background:
+            self.finished.append(job)
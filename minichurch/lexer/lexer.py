@@ -1,5 +1,24 @@
+import codecs
+import operator
+import re
 import typing
 from minichurch.lexer.tokens import *
+from minichurch.lexer import tokens
+
+# number of bytes read from a file at a time by the scanner
+CHUNK_SIZE = 1 << 16
+
+# whitespace separates tokens, every other character is a token on its own
+TOKEN = re.compile(r'\S')
+# runs of name characters, matched whole when looking for the names of definitions
+WORD = re.compile(r'[^\s()^.λ]+|\S')
+# run of name characters at the end of a chunk, it may go on in the next chunk
+TAIL = re.compile(r'[^\s()^.λ]+\Z')
+# characters that take more than one byte in utf-8
+WIDE = re.compile(r'[^\x00-\x7f]')
+# tokens that do not depend on the scope
+SEPARATORS = {'^': func_val, 'λ': func_val, '.': body_val}
+
 
 def lex(inputstream: typing.Generator[str, None, None])-> typing.Generator[Token, None, None]:
     """recieve an input generator and become a functional generator that lazily evaluates tokens"""
@@ -18,11 +37,11 @@ def lex(inputstream: typing.Generator[str, None, None])-> typing.Generator[Token
         new_block = ClosingBlock(scope)
         scope -= 1
         return new_block
-    
+
     def get_func():
         """retrieve the static token value"""
         return func_val
-    
+
     def get_body():
         """retrieve the static body val"""
         return body_val
@@ -39,4 +58,137 @@ def lex(inputstream: typing.Generator[str, None, None])-> typing.Generator[Token
             yield lookup_table[char]()
         # yield a name because the character is not known
         else:
-            yield Name(char)
\ No newline at end of file
+            yield Name(char)
+
+
+class Scanner:
+    """Tokens of a string or of a file opened in binary mode, iterating over the scanner yields them.
+    Files are read and decoded in large chunks and each chunk is tokenized at once into shared tokens.
+    Tokens do not hold their position, offset is the position of the last token yielded instead, which the parser
+    adds to its errors.
+    A run of name characters that is one of names becomes a reference to that definition"""
+    def __init__(self, source: typing.Union[str, typing.BinaryIO], chunk_size: int = CHUNK_SIZE, names: set = None):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.names = names
+        self.scope = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._known = dict(SEPARATORS)  # tokens by character, names are added as they are seen
+        self._text = ''
+        self._carry = ''  # start of a run of name characters cut off by the end of the last chunk
+        self._tokens = []
+        self._remaining = iter(self._tokens)  # tokens of the current chunk that have not been yielded
+        self._base = 0  # position of the current chunk in the source
+        self._size = 0  # length of the current chunk in the source
+        self._starts = None  # positions of the tokens in the current chunk, found when asked for
+        self._binary = False  # positions are counted in bytes once the source turns out to hold bytes
+        self._done = False
+
+    def __iter__(self) -> typing.Generator[Token, None, None]:
+        while not self._done:
+            self._base += self._size
+            text = self._carry + self._read()
+            self._carry = ''
+            if self.names and not self._done:
+                # scan a run split between chunks as a whole with the next chunk
+                tail = TAIL.search(text)
+                if tail is not None:
+                    self._carry = tail.group()
+                    text = text[:tail.start()]
+            if self._binary and not text.isascii():
+                self._size = len(text.encode('utf-8'))
+            else:
+                self._size = len(text)
+            self._text = text
+            self._tokens, self.scope = scan(text, self.scope, self._known, self.names)
+            self._starts = None
+            self._remaining = iter(self._tokens)
+            yield from self._remaining
+
+    @property
+    def offset(self) -> typing.Optional[int]:
+        """Position of the last token yielded, in bytes for files and in characters for strings"""
+        # the list iterator knows how many tokens are left in the chunk
+        index = len(self._tokens) - operator.length_hint(self._remaining) - 1
+        if index < 0:
+            return None
+        if self._starts is None:
+            self._starts = self._locate()
+        return self._base + self._starts[index]
+
+    @property
+    def unit(self) -> str:
+        """What offset counts, bytes once the source turned out to hold bytes and characters otherwise"""
+        return 'byte' if self._binary else 'character'
+
+    def _read(self) -> str:
+        """Retrieve the next chunk of text, marks the scanner as done at the end of the source"""
+        if isinstance(self.source, str):
+            # the whole string is one chunk
+            self._done = True
+            return self.source
+        data = self.source.read(self.chunk_size)
+        self._done = not data
+        if isinstance(data, str):
+            # text files are already decoded
+            return data
+        self._binary = True
+        # a character split across chunks is decoded with the next one
+        return self._decoder.decode(data, final=not data)
+
+    def _locate(self) -> list:
+        """Find the position of every token in the current chunk"""
+        if self.names:
+            starts = []
+            for match in WORD.finditer(self._text):
+                if len(match.group()) > 1 and match.group() not in self.names:
+                    # every character of the run is a name of its own
+                    starts.extend(range(match.start(), match.end()))
+                else:
+                    starts.append(match.start())
+        else:
+            starts = [match.start() for match in TOKEN.finditer(self._text)]
+        if not self._binary or self._text.isascii():
+            return starts
+        # count the extra bytes of every wide character before each token
+        wide = [(match.start(), len(match.group().encode('utf-8')) - 1) for match in WIDE.finditer(self._text)]
+        extra = 0
+        passed = 0
+        for index, start in enumerate(starts):
+            while passed < len(wide) and wide[passed][0] < start:
+                extra += wide[passed][1]
+                passed += 1
+            starts[index] = start + extra
+        return starts
+
+
+def scan(text: str, scope: int = 0, known: dict = None, names: set = None) -> tuple:
+    """Tokenize a whole piece of text, returns the list of tokens and the scope reached at its end.
+    known maps characters to their tokens and gains every name seen.
+    Runs of name characters that are one of names become references, otherwise every character is a name"""
+    if known is None:
+        known = dict(SEPARATORS)
+    found = []
+    append = found.append
+    for piece in (WORD if names else TOKEN).findall(text):
+        token = known.get(piece)
+        if token is None:
+            if piece == '(':
+                scope += 1
+                token = tokens.opening(scope)
+            elif piece == ')':
+                token = tokens.closing(scope)
+                scope -= 1
+            elif len(piece) == 1:
+                token = known[piece] = tokens.name(piece)
+            elif piece in names:
+                token = known[piece] = tokens.reference(piece)
+            else:
+                for char in piece:
+                    token = known.get(char)
+                    if token is None:
+                        token = known[char] = tokens.name(char)
+                    append(token)
+                continue
+        append(token)
+    return found, scope
@@ -1,5 +1,7 @@
 class Token:
     """Base class for a lexer token"""
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     def __repr__(self):
@@ -9,42 +11,64 @@ class Token:
 class OpeningBlock(Token):
     """Token to represent an opening parentheses to parse.
     Holds the scope number under value to deliminate the depth"""
+    __slots__ = ()
+
     def __init__(self, value):
         self.value = value
-    
+
     def __str__(self):
         return f'{self.value}('
 
 class ClosingBlock(Token):
     """Token to represent a closing parentheses to parse.
     Holds the scope number under value to deliminate the depth"""
+    __slots__ = ()
+
     def __init__(self, value):
         self.value = value
-    
+
     def __str__(self):
         return f'{self.value})'
 
 class Name(Token):
     """Token to represent a Name instance
     Holds the string value of the encountered value"""
+    __slots__ = ()
+
     def __init__(self, value):
         self.value = value
-    
+
+    def __str__(self):
+        return str(self.value)
+
+
+class Reference(Token):
+    """Token to represent a use of a named definition longer than a character
+    Holds the name of the definition"""
+    __slots__ = ()
+
+    def __init__(self, value):
+        self.value = value
+
     def __str__(self):
         return str(self.value)
 
 
 class Function(Token):
     """Token to represent the starting character of a Function expression"""
+    __slots__ = ()
+
     def __init__(self, value):
         self.value = '^'
-    
+
     def __str__(self):
         return 'λ'
 
 
 class Body(Token):
     """Token to represent the name/body separator of a function expression"""
+    __slots__ = ()
+
     def __init__(self, value):
         self.value = '.'
     def __str__(self):
@@ -53,3 +77,44 @@ class Body(Token):
 
 func_val = Function(None)
 body_val = Body(None)
+
+# shared tokens, tokens hold no position so one object serves every occurrence
+_names = {}
+_references = {}
+_openings = [None]
+_closings = [None]
+
+
+def name(symbol: str) -> Name:
+    """Retrieve the shared name token for a symbol"""
+    token = _names.get(symbol)
+    if token is None:
+        token = _names[symbol] = Name(symbol)
+    return token
+
+
+def reference(definition: str) -> Reference:
+    """Retrieve the shared reference token for the name of a definition"""
+    token = _references.get(definition)
+    if token is None:
+        token = _references[definition] = Reference(definition)
+    return token
+
+
+def opening(scope: int) -> OpeningBlock:
+    """Retrieve the shared opening block token for a scope number"""
+    if scope < 1:
+        # only unbalanced input leaves the outermost scope
+        return OpeningBlock(scope)
+    while len(_openings) <= scope:
+        _openings.append(OpeningBlock(len(_openings)))
+    return _openings[scope]
+
+
+def closing(scope: int) -> ClosingBlock:
+    """Retrieve the shared closing block token for a scope number"""
+    if scope < 1:
+        return ClosingBlock(scope)
+    while len(_closings) <= scope:
+        _closings.append(ClosingBlock(len(_closings)))
+    return _closings[scope]
@@ -1,49 +1,241 @@
 import click
+import io
+import json
+import os
 import sys
 
-from minichurch.evaluator import syntax
+from minichurch import batch, client, server
+from minichurch.address import DEFAULT_SOCKET
+from minichurch.evaluator import budget, divergence, memo, parallel, strategies, syntax, trace
 from minichurch.evaluator.repl import LambdaREPL
 from minichurch.lexer import lexer
-from minichurch.parser import parser
+from minichurch.parser import compiled, definitions, parser, parsertypes
 
+# bytes in a megabyte of --max-memory
+MEGABYTE = 1 << 20
 
-# increase the recursion limit for big reductions
-sys.setrecursionlimit(1000000)
-def streamfile(file):
-    """Takes a buffered reader and returns a generator that reads individual characters"""
-    while True:
-        chunk = file.read(1).decode("utf-8") 
-        if not chunk:
-            break
-        yield chunk
 
-@click.command()
+@click.group(invoke_without_command=True)
+@click.pass_context
 @click.option('--file', '-f', default=None, type=click.File('rb'), help='Path to the file to parse')
 @click.option('--explain', '-e', is_flag=True, help='Flag to explain each association step')
 @click.option('--parsetree', '-p', is_flag=True, help='Flag to display the parse tree before the evaluation')
-def run(file, explain, parsetree):
+@click.option('--strategy', '-s', default=strategies.DEFAULT, type=click.Choice(list(strategies.STRATEGIES)), help='Reduction strategy used to evaluate the file')
+@click.option('--memo-size', default=memo.DEFAULT_SIZE, show_default=True, type=click.IntRange(min=0), help='Number of normal forms to cache for reuse, 0 disables the cache')
+@click.option('--no-cache', is_flag=True, help='Flag to parse the file again instead of loading its compiled form')
+@click.option('--precompile', default=None, type=click.Path(exists=True, file_okay=False), help='Compile every .lc file in a directory into the cache and exit')
+@click.option('--batch', '-b', 'batchfile', default=None, type=click.File('r', encoding='utf-8'), help='Evaluate every line of a file in a pool of processes, the definitions of --file are available to each line')
+@click.option('--jsonl', is_flag=True, help='Flag to read the batch as json lines with an "expression" and an optional "id", results are written as json lines too')
+@click.option('--workers', '-w', default=None, type=click.IntRange(min=1), help='Number of processes evaluating the batch or the --parallel arguments, one per CPU by default')
+@click.option('--chunksize', default=8, show_default=True, type=click.IntRange(min=1), help='Number of batch lines sent to a process at a time')
+@click.option('--unordered', is_flag=True, help='Flag to write batch results as they finish instead of in input order')
+@click.option('--timeout', default=10.0, show_default=True, type=click.FloatRange(min=0), help='Seconds a batch line may take before it is given up, 0 for no limit')
+@click.option('--stats', is_flag=True, help='Flag to display the reduction counters and the time of each phase on stderr')
+@click.option('--stats-json', default=None, type=click.File('w'), help='Write the reduction counters and phase times as json to a file (- for stdout)')
+@click.option('--trace', 'tracefile', default=None, type=click.File('w', encoding='utf-8'), help='Record each reduction step as json lines to a file, the trace can be replayed')
+@click.option('--snapshot-every', default=None, type=click.IntRange(min=0), help='Steps between displays (--explain, default 1) or records (--trace, default 0 for never) of the full term')
+@click.option('--replay', default=None, type=click.File('r', encoding='utf-8'), help='Rebuild the term of a recorded trace after --step and exit')
+@click.option('--step', default=None, type=click.IntRange(min=0), help='Step of the trace to rebuild with --replay, the normal form by default')
+@click.option('--max-length', default=None, type=click.IntRange(min=1), help='Characters of a printed term or parse tree before it is cut short with an ellipsis')
+@click.option('--max-depth', default=None, type=click.IntRange(min=1), help='Nesting of the functions and applications printed before an ellipsis')
+@click.option('--shared', 'share', is_flag=True, help='Flag to print a subterm shared by several parts of a term once, labelled #n= and referred to as #n#')
+@click.option('--parallel', 'split', is_flag=True, help='Flag to normalize the independent closed arguments of the result in a pool of --workers processes')
+@click.option('--split-size', default=parallel.THRESHOLD, show_default=True, type=click.IntRange(min=1), help='Nodes of a closed argument before --parallel sends it to a worker')
+@click.option('--detect-loops', is_flag=True, help='Flag to stop with an error once the term comes back to an earlier state and warn when it keeps growing (subst only)')
+@click.option('--max-steps', default=None, type=click.IntRange(min=0), help='Beta steps the evaluation may take before it stops with the term reached so far (subst only)')
+@click.option('--max-size', default=None, type=click.IntRange(min=1), help='Nodes the term may grow to before the evaluation stops with it (subst only)')
+@click.option('--max-time', default=None, type=click.FloatRange(min=0, min_open=True), help='Seconds the evaluation may take before it stops with the term reached so far (subst only)')
+@click.option('--max-memory', default=None, type=click.FloatRange(min=0, min_open=True), help='Megabytes the evaluation may allocate, traced with tracemalloc which slows it down, before it stops with the term reached so far (subst only)')
+@click.option('--target', '-t', default=syntax.NF, type=click.Choice(list(syntax.TARGETS)), help='Evaluate the file to its normal form, or stop at its head normal form or weak head normal form (subst only)')
+def run(ctx, file, explain, parsetree, strategy, memo_size, no_cache, precompile, batchfile, jsonl, workers, chunksize,
+        unordered, timeout, stats, stats_json, tracefile, snapshot_every, replay, step, max_length, max_depth, share,
+        split, split_size, detect_loops, max_steps, max_size, max_time, max_memory, target):
     """Simple lambda calculus executor, opens a repl shell if a file is not specified"""
-    if file is not None:
-        inputs = streamfile(file) # create a file stream for the lexer
-        lexstream = lexer.lex(inputs) # create a token stream from the lexer
-        built_tree = parser.parse(lexstream) # parse and build a tree
-        if parsetree:
-            print(built_tree)
-        output_val = parser.build(built_tree) # build an evaluatable expression
-        showstep =  None
-        if explain:
-            showstep = syntax.create_showstep(output_val)
-            print(f"Input:  {output_val.get()}")
-        output_val = syntax.solver(output_val, showstep)
+    if ctx.invoked_subcommand is not None:
+        # the options belong to a plain run, the command has its own
+        return
+    if (explain or tracefile is not None) and strategy != strategies.DEFAULT:
+        raise click.UsageError(f"--explain and --trace are only supported by the {strategies.DEFAULT} strategy")
+    if split and (explain or tracefile is not None or batchfile is not None):
+        raise click.UsageError("--parallel cannot be used with --explain, --trace or --batch")
+    if detect_loops and (strategy != strategies.DEFAULT or split):
+        raise click.UsageError(f"--detect-loops is only supported by the {strategies.DEFAULT} strategy without --parallel")
+    if target != syntax.NF and (strategy != strategies.DEFAULT or split or batchfile is not None):
+        raise click.UsageError(f"--target {target} is only supported by the {strategies.DEFAULT} strategy "
+                               f"without --parallel or --batch")
+    # steps, size, seconds and bytes the evaluation may use, in the order of budget.Budget
+    limits = (max_steps, max_size, max_time, None if max_memory is None else int(max_memory * MEGABYTE))
+    if any(limit is not None for limit in limits):
+        if strategy != strategies.DEFAULT or split or batchfile is not None:
+            raise click.UsageError(f"--max-steps, --max-size, --max-time and --max-memory are only supported by the "
+                                   f"{strategies.DEFAULT} strategy without --parallel or --batch")
+    else:
+        limits = None
+    if replay is not None:
+        try:
+            display(trace.replay(replay, step), '', max_length, max_depth, share)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        return
+    if batchfile is not None and (stats and not jsonl or stats_json is not None):
+        raise click.UsageError("--stats with --batch needs --jsonl, the statistics are added to each result")
+    if (stats or stats_json is not None) and batchfile is None:
+        syntax.stats = syntax.Stats()
+    if batchfile is not None:
+        if explain or parsetree:
+            raise click.UsageError("--explain and --parsetree cannot be used with --batch")
+        prelude = None
+        if file is not None:
+            prelude = definitions.source_path(file)
+            if prelude is None:
+                raise click.UsageError("--file has to be a file on disk to be used with --batch")
+        items = batch.read_jsonl(batchfile) if jsonl else batch.read_lines(batchfile)
+        settings = (prelude, strategy, memo_size, timeout, stats, max_length, max_depth, share, detect_loops)
+        for record in batch.evaluate(items, workers or os.cpu_count() or 1, chunksize, not unordered, settings):
+            if jsonl:
+                line = json.dumps(record, ensure_ascii=False)
+            else:
+                line = record['result'] if 'result' in record else f"error: {record['error']}"
+                if unordered:
+                    # the line number tells which line a result belongs to
+                    line = f"{record['id']}\t{line}"
+            print(line, flush=True)
+    elif precompile is not None:
+        for path, result in compiled.precompile(precompile):
+            if isinstance(result, Exception):
+                print(f"{path}: {result}")
+            elif result is None:
+                print(f"{path}: skipped, no expression to compile")
+            else:
+                print(f"{path} -> {result}")
+    elif file is not None:
+        with syntax.phase('lex'):
+            source = definitions.read(file)
+        # the parse tree is only known after parsing
+        cached = None if no_cache or parsetree else compiled.locate(source, definitions.source_directory(file))
+        with syntax.phase('build'):
+            output_val = None if cached is None else compiled.load(cached)
+        if output_val is None:
+            library = definitions.Library()
+            try:
+                with syntax.phase('lex'):
+                    main = library.load(file, source) # index the definitions and imports, leaving the main expression
+                if parsetree:
+                    lexstream = lexer.Scanner(io.BytesIO(main), names=library.names) # create a token stream that reads in chunks
+                    built_tree = parser.parse_timed(lexstream) # parse and build a tree
+                    parsertypes.dump_tree(built_tree, sys.stdout, max_length, max_depth)
+                    print()
+                    with syntax.phase('build'):
+                        output_val = parser.build(built_tree, library=library) # build an evaluatable expression
+                else:
+                    with syntax.phase('build'):
+                        # lex, parse and build in one pass without a parse tree
+                        output_val = parser.build_source(main.decode('utf-8'), library=library)
+                    if output_val is None:
+                        raise click.ClickException("Expected an expression")
+            except (NameError, TypeError, OSError) as e:
+                # a malformed term, a definition that refers to itself or an import that cannot be read
+                raise click.ClickException(str(e))
+            if cached is not None:
+                # store the compiled form before the evaluation changes the expression
+                imports = compiled.dependencies(library.imported - {definitions.source_path(file)})
+                compiled.save(cached, output_val, imports)
+        observers = []
         if explain:
-            print(f"\nResult: {output_val.get()}")
-        else:
-            print(output_val.get())
+            observers.append(syntax.create_showstep(output_val, 1 if snapshot_every is None else snapshot_every))
+            display(output_val, "Input:  ", max_length, max_depth, share)
+        if tracefile is not None:
+            observers.append(trace.Trace(tracefile, output_val, snapshot_every or 0, target=target))
+        showstep = None if not observers else observers[0] if len(observers) == 1 else syntax.Observers(*observers)
+        if detect_loops:
+            syntax.watch = divergence.Watch(stream=sys.stderr)
+        partial = None
+        try:
+            with syntax.phase('solve'):
+                if split:
+                    with parallel.start(workers or os.cpu_count() or 1, strategy, memo_size) as pool:
+                        output_val = parallel.normalize(output_val, pool, split_size, memo.create_cache(memo_size))
+                else:
+                    output_val = strategies.evaluate(output_val, strategy, showstep, memo.create_cache(memo_size),
+                                                     None if limits is None else budget.Budget(*limits), target)
+        except divergence.Diverges as e:
+            raise click.ClickException(str(e))
+        finally:
+            if showstep is not None:
+                showstep.close()
+        if isinstance(output_val, budget.Partial):
+            # a limit was used up, the term reached so far is the result
+            partial = output_val
+            output_val = partial.term
+        with syntax.phase('print'):
+            display(output_val, ("\nResult: " if partial is None else "\nPartial: ") if explain else '', max_length, max_depth, share)
+        report(stats, stats_json)
+        if partial is not None:
+            click.echo(partial, err=True)
+            ctx.exit(1)
     else:
-        prompt = LambdaREPL()
+        prompt = LambdaREPL(memo_size, stats, max_length, max_depth, share, limits)
         prompt.prompt = '>>> '
         prompt.cmdloop('Starting minichurch Lambda Calculus REPL... \nUse "exit" or Ctrl-Z to quit, type "help" for more information')
 
 
+@run.command('serve')
+@click.option('--socket', 'path', default=DEFAULT_SOCKET, show_default=True, type=click.Path(dir_okay=False), help='Unix socket to listen on')
+@click.option('--file', '-f', default=None, type=click.Path(exists=True, dir_okay=False), help='File whose definitions are available to every request')
+@click.option('--strategy', '-s', default=strategies.DEFAULT, type=click.Choice(list(strategies.STRATEGIES)), help='Reduction strategy of the requests that do not name one')
+@click.option('--memo-size', default=memo.DEFAULT_SIZE, show_default=True, type=click.IntRange(min=0), help='Number of normal forms each worker caches for reuse, 0 disables the cache')
+@click.option('--workers', '-w', default=None, type=click.IntRange(min=1), help='Number of processes evaluating requests, one per CPU by default')
+@click.option('--timeout', default=10.0, show_default=True, type=click.FloatRange(min=0), help='Seconds a request may take unless it sets its own limit, 0 for no limit')
+@click.option('--max-length', default=None, type=click.IntRange(min=1), help='Characters of a result before it is cut short with an ellipsis')
+@click.option('--max-depth', default=None, type=click.IntRange(min=1), help='Nesting of the functions and applications of a result printed before an ellipsis')
+def serve(path, file, strategy, memo_size, workers, timeout, max_length, max_depth):
+    """Evaluate json requests of clients on a unix socket, keeping the definitions and caches loaded between them"""
+    settings = (file and os.path.abspath(file), strategy, memo_size, timeout, False, max_length, max_depth)
+    try:
+        # every worker loads the definitions, a broken file is reported here instead of bringing them down
+        batch.Worker(*settings)
+    except Exception as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Listening on {path}", err=True)
+    try:
+        server.Server(path, workers or os.cpu_count() or 1, settings).run()
+    except OSError as e:
+        raise click.ClickException(str(e))
+
+
+@run.command('client')
+@click.argument('expressions', nargs=-1)
+@click.option('--socket', 'path', default=DEFAULT_SOCKET, show_default=True, type=click.Path(dir_okay=False), help='Unix socket of the server')
+@click.option('--strategy', '-s', default=None, type=click.Choice(list(strategies.STRATEGIES)), help="Reduction strategy, the server's by default")
+@click.option('--timeout', default=None, type=click.FloatRange(min=0), help="Seconds each expression may take, the server's limit by default, 0 for no limit")
+@click.option('--max-steps', default=None, type=click.IntRange(min=0), help='Beta steps each expression may take (subst only)')
+@click.option('--jsonl', is_flag=True, help='Flag to write the result records as json lines')
+def forward(expressions, path, strategy, timeout, max_steps, jsonl):
+    """Evaluate expressions on a running server, each line of stdin is one when none are given"""
+    if not expressions:
+        expressions = [line for line in sys.stdin if line.strip()]
+    limits = {'strategy': strategy, 'timeout': timeout, 'steps': max_steps}
+    try:
+        records = client.evaluate(expressions, path, **{name: value for name, value in limits.items() if value is not None})
+    except OSError as e:
+        raise click.ClickException(f"No server answered on {path}: {e}")
+    client.write(records, jsonl)
+
+
+def display(expression: syntax.Expression, prefix: str, limit: int, depth: int, share: bool):
+    """Print a term after a prefix, streaming it to stdout"""
+    sys.stdout.write(prefix)
+    syntax.dump(expression, sys.stdout, limit, depth, share)
+    sys.stdout.write('\n')
+
+
+def report(stats: bool, stats_json):
+    """Display or write the statistics that were collected"""
+    if stats:
+        click.echo(str(syntax.stats), err=True)
+    if stats_json is not None:
+        stats_json.write(syntax.stats.to_json() + '\n')
+
+
 if __name__ == '__main__':
     run()
\ No newline at end of file
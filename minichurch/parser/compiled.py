@@ -0,0 +1,263 @@
+import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import typing
+
+import minichurch
+from minichurch.evaluator import syntax
+from minichurch.parser import definitions, parser
+
+# first bytes of a compiled file, followed by the length of its json header
+MAGIC = b'MCC\x00'
+# layout of compiled files, part of their names along with the interpreter version
+FORMAT = 1
+COMPILED_EXTENSION = '.mcc'
+SOURCE_EXTENSION = '.lc'
+
+# kinds of nodes, stored in the low bits of each node word with the operand above them
+VAR = 0  # name bound by the function operand levels out (0 is the innermost)
+FREE = 1  # name that no function binds, operand is its slot in the table of free names
+LAM = 2  # function, operand is the symbol of its name, followed by its body
+APP = 3  # application, followed by its left and then its right side
+BOUND = 4  # name bound to a definition, operand is the segment holding the definition
+KIND_BITS = 3
+KIND_MASK = (1 << KIND_BITS) - 1
+
+
+def cache_directory() -> str:
+    """Directory compiled files are kept in, MINICHURCH_CACHE or the user cache directory"""
+    if os.environ.get('MINICHURCH_CACHE'):
+        return os.environ['MINICHURCH_CACHE']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'minichurch')
+
+
+def digest(source: bytes) -> str:
+    """Hash of the contents of a file"""
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+
+def locate(source: bytes, directory: str, cache: str = None) -> str:
+    """Path of the compiled file for a source read from a directory (its imports are relative to it).
+    The name holds a hash of both and the interpreter version, so a changed source gets a new file"""
+    key = hashlib.blake2b(source, digest_size=16)
+    key.update(os.path.realpath(directory).encode('utf-8'))
+    name = f"{key.hexdigest()}-{minichurch.__version__}-{FORMAT}{COMPILED_EXTENSION}"
+    return os.path.join(cache or cache_directory(), name)
+
+
+def dependencies(paths: typing.Iterable[str]) -> dict:
+    """Hashes of the files imported by a source by their paths"""
+    hashes = {}
+    for path in paths:
+        with open(path, 'rb') as file:
+            hashes[path] = digest(file.read())
+    return hashes
+
+
+def dump(expression: syntax.Expression, imports: dict = None) -> bytes:
+    """Serialize a built expression into words of de Bruijn indexed nodes in prefix order.
+    The definitions that Names are bound to are stored once each, in segments after the one of the expression.
+    imports maps the paths of the imported files to their hashes, load checks them again"""
+    symbols = {}
+    free = {}  # unbound Name -> slot
+    free_symbols = []
+    segments = {}  # expression of a definition -> index of its segment
+    # each segment is [symbol of the definition name or -1, first word, number of words]
+    table = [[-1, 0, 0]]
+    roots = [expression]
+    words = array.array('I')
+
+    def symbol(text):
+        if text not in symbols:
+            symbols[text] = len(symbols)
+        return symbols[text]
+
+    for index, root in enumerate(roots):
+        table[index][1] = len(words)
+        levels = {}  # binder name -> number of functions enclosing it
+        # each task is (expression, function depth) or (function, None, level its name shadowed) to leave it
+        tasks = [(root, 0)]
+        while tasks:
+            task = tasks.pop()
+            if len(task) == 3:
+                function, _, shadowed = task
+                if shadowed is None:
+                    del levels[function.name]
+                else:
+                    levels[function.name] = shadowed
+                continue
+            expr, depth = task
+            if isinstance(expr, syntax.Name):
+                if expr.value is not None:
+                    if expr.value not in segments:
+                        segments[expr.value] = len(table)
+                        table.append([symbol(expr.symbol), 0, 0])
+                        roots.append(expr.value)
+                    words.append(segments[expr.value] << KIND_BITS | BOUND)
+                elif expr in levels:
+                    words.append((depth - levels[expr] - 1) << KIND_BITS | VAR)
+                else:
+                    if expr not in free:
+                        free[expr] = len(free_symbols)
+                        free_symbols.append(symbol(expr.symbol))
+                    words.append(free[expr] << KIND_BITS | FREE)
+            elif isinstance(expr, syntax.Function):
+                words.append(symbol(expr.name.symbol) << KIND_BITS | LAM)
+                tasks.append((expr, None, levels.get(expr.name)))
+                levels[expr.name] = depth
+                tasks.append((expr.inner_data, depth + 1))
+            elif isinstance(expr, syntax.Application):
+                words.append(APP)
+                tasks.append((expr.right, depth))
+                tasks.append((expr.left, depth))
+            else:
+                raise TypeError(f"Cannot compile {expr!r}")
+        table[index][2] = len(words) - table[index][1]
+    header = json.dumps({'format': FORMAT, 'version': minichurch.__version__, 'byteorder': sys.byteorder,
+                         'symbols': list(symbols), 'free': free_symbols, 'segments': table,
+                         'imports': imports or {}}).encode('utf-8')
+    # pad the header so the words start on a multiple of their size
+    padding = -(len(MAGIC) + 4 + len(header)) % words.itemsize
+    return MAGIC + struct.pack('<I', len(header)) + header + b' ' * padding + words.tobytes()
+
+
+def load(path: str) -> typing.Optional[syntax.Expression]:
+    """Map a compiled file and build its expression without parsing anything.
+    None is returned when there is no file, it is from another version or an imported file has changed"""
+    try:
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return loads(data)
+    finally:
+        data.close()
+
+
+def loads(data: typing.Union[bytes, mmap.mmap]) -> typing.Optional[syntax.Expression]:
+    """Build the expression of compiled bytes, None if they are from another version, damaged or an import has changed"""
+    words = None
+    try:
+        if data[:len(MAGIC)] != MAGIC:
+            return None
+        (length,) = struct.unpack_from('<I', data, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(data[start:start + length]).decode('utf-8'))
+        if (header['format'], header['version'], header['byteorder']) != (FORMAT, minichurch.__version__, sys.byteorder):
+            return None
+        for imported, expected in header['imports'].items():
+            try:
+                if dependencies([imported])[imported] != expected:
+                    return None
+            except OSError:
+                return None
+        start += length
+        words = memoryview(data)[start + -start % 4:].cast('I')
+        return construct(header, words)
+    except (ValueError, KeyError, IndexError, TypeError, struct.error):
+        # a damaged file is compiled again
+        return None
+    finally:
+        if words is not None:
+            words.release()
+
+
+def construct(header: dict, words: typing.Sequence[int]) -> syntax.Expression:
+    """Build the expressions of every segment from their node words, returns the expression of the first one"""
+    symbols = header['symbols']
+    segments = header['segments']
+    free = [syntax.Name(symbols[index]) for index in header['free']]
+    expressions = []
+    bound = []  # (Name, segment) to bind once every segment is built
+    for _, first, count in segments:
+        root = syntax.Application()
+        binders = []  # Names of the enclosing functions, innermost last
+        # each task is (parent expression, attribute of the parent to fill) or None to leave a function
+        tasks = [(root, 'left')]
+        position = first
+        while tasks:
+            task = tasks.pop()
+            if task is None:
+                binders.pop()
+                continue
+            parent, slot = task
+            word = words[position]
+            position += 1
+            kind, operand = word & KIND_MASK, word >> KIND_BITS
+            if kind == VAR:
+                node = binders[-1 - operand]
+            elif kind == FREE:
+                node = free[operand]
+            elif kind == LAM:
+                name = syntax.Name(symbols[operand])
+                node = syntax.Function(name)
+                binders.append(name)
+                tasks.append(None)
+                tasks.append((node, 'inner_data'))
+            elif kind == APP:
+                node = syntax.Application()
+                tasks.append((node, 'right'))
+                tasks.append((node, 'left'))
+            elif kind == BOUND:
+                node = syntax.Name(symbols[segments[operand][0]])
+                bound.append((node, operand))
+            else:
+                raise ValueError(f"Unknown node kind {kind}")
+            setattr(parent, slot, node)
+        if position != first + count:
+            raise ValueError("Segment does not end where its table says")
+        expressions.append(root.left)
+    for name, segment in bound:
+        name.value = expressions[segment]
+    return expressions[0]
+
+
+def save(path: str, expression: syntax.Expression, imports: dict = None) -> bool:
+    """Write the compiled form of an expression, returns False if the cache directory cannot be written"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so a reader never maps half of a file
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(dump(expression, imports))
+        os.replace(temporary, path)
+        return True
+    except OSError:
+        return False
+
+
+def compile_file(path: str, cache: str = None) -> typing.Optional[str]:
+    """Compile a source file into the cache unless it is there already, returns the compiled path.
+    Files with only definitions and imports have no expression to compile, None is returned for them"""
+    with open(path, 'rb') as file:
+        source = definitions.read(file)
+        target = locate(source, os.path.dirname(os.path.realpath(path)), cache)
+        if load(target) is not None:
+            return target
+        library = definitions.Library()
+        main = library.load(file, source)
+    if not main.strip():
+        return None
+    expression = parser.build_source(main.decode('utf-8'), library=library)
+    imports = dependencies(library.imported - {os.path.realpath(path)})
+    return target if save(target, expression, imports) else None
+
+
+def precompile(directory: str, cache: str = None) -> typing.Generator[tuple, None, None]:
+    """Compile every source file under a directory, yields each path with its compiled path or the error it raised"""
+    for root, folders, files in os.walk(directory):
+        folders.sort()
+        for name in sorted(files):
+            if name.endswith(SOURCE_EXTENSION):
+                path = os.path.join(root, name)
+                try:
+                    yield path, compile_file(path, cache)
+                except Exception as e:
+                    yield path, e
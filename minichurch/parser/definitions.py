@@ -0,0 +1,174 @@
+import mmap
+import os
+import re
+import typing
+
+from minichurch.evaluator import syntax
+from minichurch.parser import parser
+
+# statements start at the beginning of a line, indented lines go on with the statement above them
+STATEMENT = re.compile(rb'^(?=\S)', re.M)
+# import "path"
+IMPORT = re.compile(rb'import[ \t]+"([^"\r\n]+)"\s*\Z')
+# name = term, the name is a run of name characters (anything but whitespace, separators, λ, = and ")
+DEFINITION = re.compile(rb'((?:(?!\xce\xbb)[^\s()^.="])+)[ \t]*=')
+
+
+class Definition:
+    """Named term indexed from a source, the term is built the first time something refers to it"""
+    def __init__(self, name: str, source: bytes, start: int, end: int):
+        self.name = name
+        self.source = source  # contents of the file the definition is in
+        self.start = start  # byte offsets of the term in the source
+        self.end = end
+        self.expression = None
+        self.references = set()  # definitions the term refers to, known once it is built
+
+    def text(self) -> str:
+        """Decode the term of the definition"""
+        return self.source[self.start:self.end].decode('utf-8')
+
+
+class Library:
+    """Definitions by name, indexed from files and statements without lexing their terms.
+    A definition is only lexed, parsed and built when an expression that is being built refers to it"""
+    def __init__(self):
+        self.definitions = {}
+        self.names = set()  # names longer than a character, the lexer has to look for them
+        self.imported = set()  # paths of the files indexed so far
+        self._pending = []  # (definition, Name referring to it) waiting for the definition to be built
+        self._building = None  # definition whose term is being built
+        self._linking = False
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.definitions
+
+    def __len__(self):
+        return len(self.definitions)
+
+    def load(self, file: typing.BinaryIO, source: bytes = None) -> bytes:
+        """Index the definitions and imports of a file opened in binary mode, returns the source of its main expression.
+        Imports are relative to the directory of the file, source is its contents if they have been read already"""
+        path = source_path(file)
+        if path is not None:
+            self.imported.add(path)  # a file importing itself is skipped
+        return self.index(read(file) if source is None else source, source_directory(file))
+
+    def import_file(self, path: str, directory: str = None):
+        """Index the definitions of a file and of the files it imports, the main expression of the file is ignored.
+        Files that have been imported already are skipped"""
+        path = os.path.realpath(os.path.join(directory or os.getcwd(), path))
+        if path in self.imported:
+            return
+        self.imported.add(path)
+        with open(path, 'rb') as file:
+            self.index(read(file), os.path.dirname(path))
+
+    def index(self, source: bytes, directory: str = None) -> bytes:
+        """Record the definitions of a source and import the files it names, returns the rest of it as the main expression.
+        A later definition replaces an earlier one with the same name"""
+        main = []
+        starts = [match.start() for match in STATEMENT.finditer(source)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        starts.append(len(source))
+        for start, end in zip(starts, starts[1:]):
+            match = IMPORT.match(source, start, end)
+            if match is not None:
+                self.import_file(match.group(1).decode('utf-8'), directory)
+                continue
+            match = DEFINITION.match(source, start, end)
+            if match is not None:
+                self.define(Definition(match.group(1).decode('utf-8'), source, match.end(), end))
+            else:
+                main.append(source[start:end])
+        return b''.join(main)
+
+    def define(self, definition: Definition):
+        """Add a definition, replacing the one with the same name"""
+        self.definitions[definition.name] = definition
+        if len(definition.name) > 1:
+            self.names.add(definition.name)
+
+    def refer(self, name: str) -> syntax.Name:
+        """Create a Name that will be bound to the term of a definition once link has built it"""
+        definition = self.definitions[name]
+        if self._building is not None:
+            self._building.references.add(definition)
+        reference = syntax.Name(name)
+        self._pending.append((definition, reference))
+        return reference
+
+    def link(self):
+        """Build every definition that has been referred to and bind the references to their terms.
+        Building a definition refers to more definitions, which are built in turn"""
+        if self._linking:
+            return
+        self._linking = True
+        built = []
+        try:
+            while self._pending:
+                definition, reference = self._pending.pop()
+                if definition.expression is None:
+                    definition.expression = self._build(definition)
+                    built.append(definition)
+                reference.value = definition.expression
+        finally:
+            self._pending.clear()
+            self._building = None
+            self._linking = False
+        self._check(built)
+
+    def _build(self, definition: Definition) -> syntax.Expression:
+        """Lex, parse and build the term of a definition"""
+        self._building = definition
+        definition.references = set()
+        expression = parser.build_source(definition.text(), library=self)
+        if expression is None:
+            raise TypeError(f"Expected a term in the definition of {definition.name}")
+        return expression
+
+    def _check(self, built: list):
+        """Raise a NameError if one of the definitions refers back to itself, its Names would never stop copying"""
+        done = set()
+        for first in built:
+            if first in done:
+                continue
+            # depth first search keeping the definitions on the current path
+            path = {first}
+            stack = [(first, iter(first.references))]
+            while stack:
+                definition, remaining = stack[-1]
+                target = next(remaining, None)
+                if target is None:
+                    stack.pop()
+                    path.discard(definition)
+                    done.add(definition)
+                elif target in path:
+                    target.expression = None
+                    raise NameError(f"Definition {target.name} refers to itself")
+                elif target not in done:
+                    path.add(target)
+                    stack.append((target, iter(target.references)))
+
+
+def source_path(file: typing.BinaryIO) -> typing.Optional[str]:
+    """Real path of an opened file, None for streams that are not files"""
+    path = getattr(file, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        return os.path.realpath(path)
+    return None
+
+
+def source_directory(file: typing.BinaryIO) -> str:
+    """Directory the imports of an opened file are relative to, the working directory for streams"""
+    path = source_path(file)
+    return os.getcwd() if path is None else os.path.dirname(path)
+
+
+def read(file: typing.BinaryIO) -> bytes:
+    """Map a file into memory, streams that cannot be mapped are read instead"""
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return file.read()
@@ -1,116 +1,306 @@
+import itertools
 import typing
 
 from minichurch.evaluator import syntax
-from minichurch.lexer import tokens
+from minichurch.lexer import lexer, tokens
 from minichurch.parser import parsertypes
 
 
-def create_innerstream(layer: int, lexstream: typing.Generator[tokens.Token, None, None]) -> typing.Generator[tokens.Token, None, None]:
-    """Takes a layer number and a stream and returns a generator that will yield until it sees a closing block with the matching layer number"""
-    for token in lexstream:
-        yield token
-        if isinstance(token, tokens.ClosingBlock) and token.value == layer:
-            break
+# kinds of frames kept by parse
+TOP = 0  # the whole input, ends with the input or at a closing block without an opening one
+BLOCK = 1  # a parenthesized block, ends at its closing block
+BODY = 2  # the body of a function, ends along with the frame around it or at a closing block
 
 
-def parse(lexstream: typing.Generator[tokens.Token, None, None]) -> parsertypes.SyntaxTree:
-    """Take a generator of tokens and parse them into a syntax tree"""
+def parse(lexstream: typing.Iterable[tokens.Token]) -> parsertypes.SyntaxTree:
+    """Take a stream of tokens and parse them into a syntax tree.
+    Every token is handled once, the blocks and function bodies being parsed are kept on a stack of frames"""
     # <expression> := <name>|<function>|<application>
-    buffer = []
+    # a scanner knows where the last token it yielded is, errors about that token say where it is
+    scanner = lexstream if isinstance(lexstream, lexer.Scanner) else None
+    lexstream = iter(lexstream)
+    try:
+        return parse_tokens(lexstream)
+    except TypeError as e:
+        if scanner is None:
+            raise
+        raise TypeError(locate(str(e), scanner.offset, scanner.unit)) from None
+
+
+def parse_tokens(lexstream: typing.Iterator[tokens.Token]) -> parsertypes.SyntaxTree:
+    """Parse an iterator of tokens on a stack of frames, see parse"""
+    # each frame is [kind, function tree the body belongs to, tree parsed so far]
+    frames = [[TOP, None, None]]
+    blocks = 0  # number of block frames on the stack
     for token in lexstream:
-        # retrieve the next values to parse a function
         if isinstance(token, tokens.Function):
             # <function> := λ <name> . <expression>
             tempvar = parsertypes.FunctionTree()  # create a function to add to block
-            nameval = next(lexstream)  # retrieve the name of the function
+            nameval = next(lexstream, None)  # retrieve the name of the function
             # make sure a name follows the function definition
             if not isinstance(nameval, tokens.Name):
                 raise TypeError(
                     "Expected named value after function declaration")
             # check to make sure body separator is in place
-            if not isinstance(next(lexstream), tokens.Body):
+            if not isinstance(next(lexstream, None), tokens.Body):
                 raise TypeError("Expected body value after name separator")
             tempvar.left = nameval
-            # parse the body as the right of the tree
-            tempvar.right = parse(lexstream)  # parse the rest as a body
-            # add tempvar to buffer for association processing
-            buffer.append(tempvar)
-            continue
-        # create a new stream and parse it as a block, then append to the buffer
-        if isinstance(token, tokens.OpeningBlock):
-            # only grab values from inside the block
-            # parse until the end of the block is reached
-            innerstream = create_innerstream(token.value, lexstream)
-            buffer.append(parse(innerstream))  # spawn a new processing step
-            continue
-        # end of the readable stream, end the parsing and begin evaluation
-        if isinstance(token, tokens.ClosingBlock):
-            break  # break and consolidate to return
+            # the rest of the block is the body of the function
+            frames.append([BODY, tempvar, None])
+        elif isinstance(token, tokens.OpeningBlock):
+            frames.append([BLOCK, None, None])
+            blocks += 1
+        elif isinstance(token, tokens.ClosingBlock):
+            if blocks:
+                # end the block along with the function bodies inside it
+                while close(frames) != BLOCK:
+                    pass
+                blocks -= 1
+            elif len(frames) > 1:
+                # a function body outside of any block only ends itself
+                close(frames)
+            else:
+                break  # nothing left to close, end the parsing
+        elif isinstance(token, tokens.Body):
+            raise TypeError("Expected function declaration before body separator")
         else:
-            # encountered a name
-            buffer.append(token)
-    # nothing encountered, this block is empty
-    if len(buffer) == 0:
-        return None
-    # create a new syntax tree to output
+            # encountered a name, bind it to the left
+            frames[-1][2] = associate(frames[-1][2], token)
+    # end of the readable stream, close whatever is still open
+    while len(frames) > 1:
+        close(frames)
+    return frames[0][2]
+
+
+def locate(message: str, position: typing.Optional[int], unit: str = 'character') -> str:
+    """Add the position of the token an error is about to its message"""
+    return message if position is None else f"{message} at {unit} {position} of the expression"
+
+
+def parse_timed(lexstream: typing.Iterable[tokens.Token]) -> parsertypes.SyntaxTree:
+    """Parse a stream of tokens, timing the lexing and the parsing apart when statistics are collected.
+    The tokens are read up front in that case, otherwise the parser pulls them from the lexer as it goes"""
+    if syntax.stats is not None:
+        with syntax.phase('lex'):
+            lexstream = list(lexstream)
+    with syntax.phase('parse'):
+        return parse(lexstream)
+
+
+def close(frames: list) -> int:
+    """End the innermost frame and apply what it parsed to the frame around it, returns the kind of the frame"""
+    kind, function, tree = frames.pop()
+    if kind == BODY:
+        if tree is None:
+            raise TypeError("Expected an expression as the body of the function")
+        function.right = tree
+        tree = function
+    frames[-1][2] = associate(frames[-1][2], tree)
+    return kind
+
+
+def associate(left, right):
+    """Create a tree that applies the right value to the left (so far parsed) one.
+    Makes applications left associative, an empty side leaves the other one as it is"""
+    if right is None:
+        return left
+    if left is None:
+        return right
     output_val = parsertypes.SyntaxTree()
-    # pop from the buffer and associate the left(so far parsed) to the right (newly encountered)
-    # makes the function left associative, binds right to left
-    while len(buffer) != 0:
-        # start binding to the left
-        if output_val.left is None:
-            output_val.left = buffer.pop(0)
-        else:
-            # create a new tree that binds the current tree (left) to a new value on the right
-            new_val = parsertypes.SyntaxTree()
-            # current right is none, bind the singular current value with the new
-            if output_val.right is None:
-                new_val.left = output_val.left
-            else:
-                # current tree is populated, create a new empty tree to bind to the old
-                new_val.left = output_val
-            # set the binding value to be the latest value
-            new_val.right = buffer.pop(0)
-            # updated tree is now head
-            output_val = new_val
-    # find the most populated tree to return
-    if output_val.right is None:
-        return output_val.left
+    output_val.left = left
+    output_val.right = right
     return output_val
 
 
-def build(body: typing.Union[parsertypes.SyntaxTree, tokens.Name], outerscope: parsertypes.Scope = None) -> syntax.Expression:
-    """Takes a syntax tree or name and scope block and returns an evaluatable syntax expression"""
+def build(body: typing.Union[parsertypes.SyntaxTree, tokens.Name], outerscope: parsertypes.Scope = None,
+          library=None) -> syntax.Expression:
+    """Takes a syntax tree or name and scope block and returns an evaluatable syntax expression.
+    Names that are not bound by a function are looked up in the definitions of the library if one is given"""
+    if body is None:
+        return None  # the source holds no term
     # base scope
     if outerscope is None:
         outerscope = parsertypes.Scope()
-    # <expression> := <name>|<function>|<application>
-    # create or bind a new name
-    if isinstance(body, tokens.Name):
-        if not outerscope.name_exists(body.value):
-            outerscope.add_name(body.value)
-        return outerscope.find_name(body.value)
-    if isinstance(body, parsertypes.FunctionTree):
-        # create a function with the current scope
-        return create_function(body, outerscope)
-    else:
-        # create an application with the current scope
-        return create_application(body, outerscope)
-
-
-def create_application(body: parsertypes.SyntaxTree, outerscope: parsertypes.Scope) -> syntax.Application:
-    """Creates a syntax application that applies the right value to the left value"""
+    root = syntax.Application()
+    # each task is (body, scope, parent expression, attribute of the parent to fill) or a scope to leave
+    # built from the left so names are bound in the same order as a recursive build
+    tasks = [(body, outerscope, root, 'left')]
+    while tasks:
+        task = tasks.pop()
+        if isinstance(task, parsertypes.Scope):
+            # everything inside the scope is built
+            task.close()
+            continue
+        body, scope, parent, slot = task
+        # <expression> := <name>|<function>|<application>
+        # create or bind a new name
+        if isinstance(body, tokens.Name):
+            if library is not None and not scope.name_exists(body.value) and body.value in library:
+                # a name that no function binds refers to the definition
+                expression = library.refer(body.value)
+            else:
+                if not scope.name_exists(body.value):
+                    scope.add_name(body.value)
+                expression = scope.find_name(body.value)
+        elif isinstance(body, tokens.Reference):
+            if library is None or body.value not in library:
+                raise NameError(f"Could not find definition {body.value}")
+            expression = library.refer(body.value)
+        elif isinstance(body, parsertypes.FunctionTree):
+            # create a function with the current scope
+            expression, inner = create_function(body, scope)
+            tasks.append(inner[1])  # leave the scope of the function after its body
+            tasks.append(inner)
+        else:
+            # create an application with the current scope
+            expression, left, right = create_application(body, scope)
+            tasks.append(left[1])  # leave the scope of the application after both sides
+            tasks.append(right)
+            tasks.append(left)
+        setattr(parent, slot, expression)
+    if library is not None:
+        # build the definitions that were referred to
+        library.link()
+    return unwrap(root.left)
+
+
+def build_source(source: str, library=None) -> typing.Optional[syntax.Expression]:
+    """Lex, parse and build a source in a single pass, returns the same expression as building the syntax tree of its
+    tokens or None when it holds no term. No tokens or syntax tree are made, the characters are read straight into
+    syntax expressions on the frames of parse and names are resolved as soon as they are read: each symbol keeps a
+    stack of the names bound to it by the functions that are open, the innermost on top"""
+    names = None if library is None else library.names
+    bound = {}  # symbol -> names bound to it, one for each open function that binds it
+    free = {}  # symbol -> the name it has when no function binds it
+    # each frame is [kind, function the body belongs to, expression built so far]
+    frames = [[TOP, None, None]]
+    blocks = 0  # number of block frames on the stack
+    header = None  # True after a function token until its name is read, then the name until its body token
+    pattern = lexer.WORD if names else lexer.TOKEN
+    index = 0  # pieces read before the current one, an error is about the current one
+    inside = 0  # characters of the current piece before the one an error is about
+    try:
+        for index, piece in enumerate(pattern.findall(source)):
+            if header is not None:
+                # <function> := λ <name> . <expression>
+                if header is True:
+                    if piece in lexer.SEPARATORS or piece in '()' or (len(piece) > 1 and piece in names):
+                        raise TypeError("Expected named value after function declaration")
+                    if len(piece) > 1:
+                        # the characters after the first one are names of their own
+                        inside = 1
+                        raise TypeError("Expected body value after name separator")
+                    header = piece
+                    continue
+                if piece != '.':
+                    raise TypeError("Expected body value after name separator")
+                name = syntax.Name(header)
+                bound.setdefault(header, []).append(name)
+                # the rest of the block is the body of the function
+                frames.append([BODY, syntax.Function(name), None])
+                header = None
+                continue
+            if piece == '^' or piece == 'λ':
+                header = True
+                continue
+            if piece == '(':
+                frames.append([BLOCK, None, None])
+                blocks += 1
+                continue
+            if piece == ')':
+                if blocks:
+                    # end the block along with the function bodies inside it
+                    while finish(frames, bound) != BLOCK:
+                        pass
+                    blocks -= 1
+                elif len(frames) > 1:
+                    # a function body outside of any block only ends itself
+                    finish(frames, bound)
+                else:
+                    break  # nothing left to close, end the building
+                continue
+            if piece == '.':
+                raise TypeError("Expected function declaration before body separator")
+            if len(piece) > 1 and piece in names:
+                expressions = (library.refer(piece),)
+            else:
+                # a run of name characters that is not a definition is a name for every character
+                expressions = []
+                for char in piece:
+                    stack = bound.get(char)
+                    if stack:
+                        expressions.append(stack[-1])
+                    elif library is not None and char in library:
+                        # a name that no function binds refers to the definition
+                        expressions.append(library.refer(char))
+                    else:
+                        if char not in free:
+                            free[char] = syntax.Name(char)
+                        expressions.append(free[char])
+            frame = frames[-1]
+            for expression in expressions:
+                frame[2] = expression if frame[2] is None else apply(frame[2], expression)
+        # errors at the end of the source are about the last piece read, like those of parse
+        if header is True:
+            raise TypeError("Expected named value after function declaration")
+        if header is not None:
+            raise TypeError("Expected body value after name separator")
+        # end of the source, close whatever is still open
+        while len(frames) > 1:
+            finish(frames, bound)
+    except TypeError as e:
+        match = next(itertools.islice(pattern.finditer(source), index, None), None)
+        raise TypeError(locate(str(e), None if match is None else match.start() + inside)) from None
+    if library is not None:
+        # build the definitions that were referred to
+        library.link()
+    return unwrap(frames[0][2])
+
+
+def unwrap(expression: typing.Optional[syntax.Expression]) -> typing.Optional[syntax.Expression]:
+    """An expression that is only a reference to a definition becomes a copy of the definition's term,
+    the solvers reduce the expression they are given in place and a reference would keep pointing at the term"""
+    if isinstance(expression, syntax.Name) and expression.value is not None:
+        return expression.get()
+    return expression
+
+
+def finish(frames: list, bound: dict) -> int:
+    """End the innermost frame of build_source and apply what it built to the frame around it,
+    returns the kind of the frame"""
+    kind, function, expression = frames.pop()
+    if kind == BODY:
+        if expression is None:
+            raise TypeError("Expected an expression as the body of the function")
+        function.inner_data = expression
+        bound[function.name.symbol].pop()  # the name goes out of scope with the function
+        expression = function
+    if expression is not None:
+        frame = frames[-1]
+        frame[2] = expression if frame[2] is None else apply(frame[2], expression)
+    return kind
+
+
+def apply(left: syntax.Expression, right: syntax.Expression) -> syntax.Application:
+    """Create an application of the right expression to the left one"""
+    application = syntax.Application()
+    application.left = left
+    application.right = right
+    return application
+
+
+def create_application(body: parsertypes.SyntaxTree, outerscope: parsertypes.Scope) -> tuple:
+    """Creates a syntax application that applies the right value to the left value.
+    Returns the application along with the build tasks for its left and right sides"""
     scope = parsertypes.Scope(outer=outerscope)  # create a new scope for binding
     # <application> := <expression> <expression>
-    return syntax.Application().set_left(
-        build(body.left, scope)  # recursively build the left side
-    ).set_right(
-        build(body.right, scope)  # recursively build the right side
-    )
+    application = syntax.Application()
+    return application, (body.left, scope, application, 'left'), (body.right, scope, application, 'right')
 
 
-def create_function(body: parsertypes.FunctionTree, outerscope: parsertypes.Scope) -> syntax.Function:
-    """creates a syntax function with a name and body binding"""
+def create_function(body: parsertypes.FunctionTree, outerscope: parsertypes.Scope) -> tuple:
+    """creates a syntax function with a name and body binding.
+    Returns the function along with the build task for its body"""
     funcscope = parsertypes.Scope(outer=outerscope)  # create a new scope for the function
     # <function> := λ <name> . <expression>
     name = body.left  # retrieve the name
@@ -119,8 +309,5 @@ def create_function(body: parsertypes.FunctionTree, outerscope: parsertypes.Scop
     newfunc = syntax.Function(funcscope.find_name(
         name.value)
     )
-    # recursively build the expression body of the function
-    newfunc.set_expr(
-        build(body.right, funcscope)
-    )
-    return newfunc
+    # the expression body of the function is built by the caller
+    return newfunc, (body.right, funcscope, newfunc, 'inner_data')
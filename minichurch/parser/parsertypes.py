@@ -1,33 +1,31 @@
 
+import io
+import typing
+
 from minichurch.evaluator import syntax
 
 class Scope:
-    """A scope block that emulates a runtime stack block with a pointer to the parent stack"""
+    """A scope block that emulates a runtime stack block with a pointer to the parent stack.
+    Scopes in a chain share one table of the names visible from the innermost open scope,
+    so they have to be closed innermost first and looked up from the innermost one"""
     def __init__(self, outer=None):
         self._lookuptable = {}
         self._outerblock = outer
+        # name -> Names bound to it by the open scopes of the chain, innermost last
+        self._visible = {} if outer is None else outer._visible
 
     def find_name(self, name: str) -> syntax.Name:
         """Find a syntax Name object that matches the given name in the scope"""
-        if name in self._lookuptable:
-            # in current scope, return the localmost value
-            return self._lookuptable[name]
-        elif self._outerblock is not None:
-            # search recursively outside the scope
-            return self._outerblock.find_name(name)
-        else:
-            # name not found at base level scope
-            raise NameError("Could not find name binding")
+        bindings = self._visible.get(name)
+        if bindings:
+            # return the localmost value
+            return bindings[-1]
+        # name not found at base level scope
+        raise NameError("Could not find name binding")
 
     def name_exists(self, name: str) -> bool:
         """Check if the name has been bound and available in scope"""
-        if name in self._lookuptable:
-            # in current scope
-            return True
-        elif self._outerblock is not None:
-            # check outer scope
-            return self._outerblock.name_exists(name)
-        return False # not found anywhere
+        return bool(self._visible.get(name))
 
     def add_name(self, name: str):
         """Bind a new name to the current scope"""
@@ -37,8 +35,14 @@ class Scope:
         else:
             # add a new name to the lookup table
             self._lookuptable[name] = syntax.Name(name)
+            self._visible.setdefault(name, []).append(self._lookuptable[name])
             return True
 
+    def close(self):
+        """Leave the scope, the names bound by it are no longer visible"""
+        for name in self._lookuptable:
+            self._visible[name].pop()
+
 
 class SyntaxTree:
     """Binary tree that represents an application of right to left"""
@@ -47,7 +51,7 @@ class SyntaxTree:
         self.right = None
 
     def __str__(self):
-        return f"APPLICATION(\n{''.join(['    '+i for i in str(self.left).splitlines(True)])}, \n{''.join(['    '+i for i in str(self.right).splitlines(True)])}\n)"
+        return format_tree(self)
 
     def __repr__(self):
         return str(self)
@@ -59,8 +63,42 @@ class FunctionTree(SyntaxTree):
         self.left = None
         self.right = None
 
-    def __str__(self):
-        return f"FUNCTION(\n{''.join(['    '+i for i in str(self.left).splitlines(True)])}, \n{''.join(['    '+i for i in str(self.right).splitlines(True)])}\n)"
-
     def __repr__(self):
         return str(self)
+
+
+def dump_tree(tree: SyntaxTree, stream: typing.TextIO, limit: int = None, depth: int = None):
+    """Write a tree with each level of children indented by four spaces to a text stream, without recursing on its depth.
+    The output is cut short past a limit of characters and subtrees nested deeper than depth are written as an ellipsis"""
+    output = syntax.Output(stream, limit)
+    # each item is (subtree or token, nesting) or a literal string
+    items = [(tree, 0)]
+    while items:
+        item = items.pop()
+        if isinstance(item, str):
+            piece = item
+        else:
+            node, level = item
+            indent = '    ' * level
+            if isinstance(node, SyntaxTree):
+                if depth is not None and level >= depth:
+                    piece = indent + '…'
+                else:
+                    piece = indent + ("FUNCTION(\n" if isinstance(node, FunctionTree) else "APPLICATION(\n")
+                    items.append("\n" + indent + ")")
+                    items.append((node.right, level + 1))
+                    items.append(", \n")
+                    items.append((node.left, level + 1))
+            else:
+                # indent every line of the leaf
+                piece = ''.join([indent + i for i in str(node).splitlines(True)])
+        if not output.add(piece):
+            break
+    output.flush()
+
+
+def format_tree(tree: SyntaxTree, limit: int = None, depth: int = None) -> str:
+    """Print a tree with each level of children indented by four spaces, see dump_tree for the options"""
+    stream = io.StringIO()
+    dump_tree(tree, stream, limit, depth)
+    return stream.getvalue()
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+from concurrent.futures.process import BrokenProcessPool
+
+from minichurch import batch
+from minichurch.address import DEFAULT_SOCKET
+from minichurch.evaluator import strategies
+
+# bytes of a request line, a longer one closes the connection
+LINE_LIMIT = 1 << 24
+
+
+def check(request) -> tuple:
+    """Arguments of batch.evaluate_item for a request, raises ValueError when the request is not valid"""
+    if not isinstance(request, dict) or not isinstance(request.get('expression'), str):
+        raise ValueError("Expected an object with an expression")
+    strategy = request.get('strategy')
+    if strategy is not None and strategy not in strategies.STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}, choose from {', '.join(strategies.STRATEGIES)}")
+    timeout = request.get('timeout')
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout < 0):
+        raise ValueError("Expected a timeout of zero or more seconds")
+    steps = request.get('steps')
+    if steps is not None:
+        if isinstance(steps, bool) or not isinstance(steps, int) or steps < 0:
+            raise ValueError("Expected a step limit of zero or more")
+        if (strategy or strategies.DEFAULT) != strategies.DEFAULT:
+            raise ValueError(f"Step limits are only supported by the {strategies.DEFAULT} strategy")
+    return (request.get('id'), request['expression'], None), strategy, timeout, steps
+
+
+class Server:
+    """Evaluator kept running behind a unix socket, so a statement does not pay for starting a process and loading
+    the prelude. Every line a client sends is a json request {"id": ..., "expression": ..., "strategy": ...,
+    "timeout": seconds, "steps": beta steps} where all but the expression are optional, the strategy and timeout
+    of the server are used by default. Each request is answered with a json line as soon as it is done, in any order,
+    with the same record as a --batch --jsonl result. A request that uses its steps up gets the term it reached as its
+    result and the limit, steps and message of its budget.Partial as stopped. Reductions run in a pool of worker
+    processes that load the prelude once and keep their cache of normal forms, the server itself only reads and
+    writes the lines"""
+    def __init__(self, path: str = DEFAULT_SOCKET, workers: int = 1, settings: tuple = ()):
+        self.path = path
+        self.workers = workers
+        self.settings = settings  # arguments of batch.Worker
+        self.executor = batch.start(workers, settings)
+
+    async def answer(self, line: bytes) -> dict:
+        """Evaluate a request line, returns its result record"""
+        request = None
+        try:
+            request = json.loads(line)
+            item, strategy, timeout, steps = check(request)
+        except ValueError as e:
+            return {'id': request.get('id') if isinstance(request, dict) else None, 'error': f"Invalid request: {e}"}
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, batch.evaluate_item, item, strategy, timeout, steps)
+        except BrokenProcessPool:
+            # the first request to notice replaces the pool, the others that were running on it fail with it
+            if self.executor is executor:
+                executor.shutdown(wait=False)
+                self.executor = batch.start(self.workers, self.settings)
+            return {'id': item[0], 'error': "Worker process exited unexpectedly"}
+
+    async def reply(self, line: bytes, writer: asyncio.StreamWriter):
+        record = await self.answer(line)
+        try:
+            writer.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            await writer.drain()
+        except ConnectionError:
+            pass  # the client went away, its result is dropped
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the requests of a client until it closes its side of the connection"""
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.ensure_future(self.reply(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except (ConnectionError, ValueError):
+            # the client went away or sent a line past LINE_LIMIT
+            for task in pending:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_unix_server(self.handle, self.path, limit=LINE_LIMIT)
+        # SIGTERM, which is how services are stopped, ends serving like Ctrl-C so run still cleans up
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """Listen on the socket until interrupted or terminated, a socket file left behind by a server that stopped
+        is replaced"""
+        if os.path.exists(self.path):
+            if listening(self.path):
+                raise OSError(f"A server is already listening on {self.path}")
+            os.unlink(self.path)
+        try:
+            asyncio.run(self.serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def listening(path: str) -> bool:
+    """Whether a server accepts connections on a socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(path)
+        except OSError:
+            return False
+    return True
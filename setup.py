@@ -21,6 +21,6 @@ setup(
         'test': tests_require
     },
     entry_points={
-        'console_scripts': ['minichurch=minichurch.ops:run']
+        'console_scripts': ['minichurch=minichurch.ops:run', 'minichurch-client=minichurch.client:main']
     }
 )
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from minichurch.parser import definitions
+
+# definitions the tests can refer to
+PRELUDE = """
+true = ^x.^y.x
+false = ^x.^y.y
+zero = ^f.^x.x
+one = ^f.^x.f x
+two = ^f.^x.f (f x)
+three = ^f.^x.f (f (f x))
+succ = ^n.^f.^x.f (n f x)
+add = ^m.^n.^f.^x.m f (n f x)
+mul = ^m.^n.^f.m (n f)
+exp = ^m.^n.n m
+pred = ^n.^f.^x.n (^g.^h.h (g f)) (^u.x) (^u.u)
+iszero = ^n.n (^x.false) true
+omega = (^x.x x) (^x.x x)
+"""
+# symbols of the names in random terms, the free ones are never bound
+BOUND = 'abcdefgh'
+FREE = 'uvw'
+# random terms generated for each test that uses them
+COUNT = 300
+
+
+def generate(rng: random.Random, depth: int, bound: list = ()) -> str:
+    """Source of a random term, most names are bound by a function around them"""
+    roll = rng.random()
+    if depth == 0 or roll < 0.3:
+        return rng.choice(bound) if bound and rng.random() < 0.85 else rng.choice(FREE)
+    if roll < 0.6:
+        symbol = rng.choice(BOUND)
+        return f"(^{symbol}.{generate(rng, depth - 1, list(bound) + [symbol])})"
+    return f"({generate(rng, depth - 1, bound)} {generate(rng, depth - 1, bound)})"
+
+
+@pytest.fixture(scope='session')
+def random_sources() -> list:
+    """Sources of random terms, the same ones on every run"""
+    rng = random.Random(20)
+    return [generate(rng, 5) for _ in range(COUNT)]
+
+
+@pytest.fixture
+def library():
+    """Create a library holding the prelude, every build needs its own since building links the definitions"""
+    def create() -> definitions.Library:
+        output_val = definitions.Library()
+        output_val.index(PRELUDE.encode('utf-8'))
+        return output_val
+    return create
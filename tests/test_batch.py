@@ -0,0 +1,61 @@
+import io
+import json
+
+import pytest
+
+from minichurch import batch
+
+OMEGA = '(^x.x x) (^x.x x)'
+# lines of a batch, the second one fails to parse and the fourth one never reaches a normal form
+LINES = ['(^x.x) a', '^x.', '(^f.^x.f (f x)) (^f.^x.f (f x)) g y', OMEGA, '', 'b']
+TIMEOUT = 0.2
+
+
+def run(items, workers: int = 2, chunksize: int = 1, ordered: bool = True, **settings) -> list:
+    settings = (None, 'subst', 16, settings.get('timeout', TIMEOUT), settings.get('stats', False))
+    return list(batch.evaluate(items, workers, chunksize, ordered, settings))
+
+
+def lines() -> list:
+    return list(batch.read_lines(io.StringIO('\n'.join(LINES))))
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 10])
+def test_ordered(chunksize):
+    records = run(lines(), chunksize=chunksize)
+    assert [record['id'] for record in records] == [1, 2, 3, 4, 6]  # blank lines are skipped
+    assert records[0]['result'] == 'a'
+    assert records[1]['error'] == "TypeError: Expected an expression as the body of the function at character 2 of the expression"
+    assert records[2]['result'] == '(g (g (g (g y))))'
+    # the timeout only stops its own expression
+    assert records[3]['error'] == f"Timeout: no normal form within {TIMEOUT:g}s"
+    assert records[4]['result'] == 'b'
+
+
+def test_unordered():
+    records = run(lines(), ordered=False)
+    assert sorted(record['id'] for record in records) == [1, 2, 3, 4, 6]
+    # the expression that runs out of time is the last one done
+    assert records[-1]['id'] == 4
+
+
+def test_jsonl():
+    source = '\n'.join([json.dumps({'id': 'a', 'expression': '(^x.x) y'}), '{"expression": "z"}', '[1]', '{}'])
+    records = run(batch.read_jsonl(io.StringIO(source)), workers=1)
+    assert records[0] == {'id': 'a', 'result': 'y', 'seconds': records[0]['seconds']}
+    assert records[1]['id'] == 2 and records[1]['result'] == 'z'
+    assert records[2]['error'].startswith('Invalid record: AttributeError')
+    assert records[3]['error'].startswith('Invalid record: KeyError')
+
+
+def test_stats():
+    records = run([(1, '(^f.^x.f (f x)) (^f.^x.f (f x))', None)], workers=1, stats=True)
+    assert records[0]['stats']['beta_steps'] > 0
+
+
+def test_consumer_stops_early():
+    # the items left waiting are cancelled
+    items = ((number, OMEGA, None) for number in range(100))
+    records = batch.evaluate(items, 2, 1, True, (None, 'subst', 16, TIMEOUT))
+    assert next(records)['error'].startswith('Timeout')
+    records.close()
@@ -0,0 +1,67 @@
+import pytest
+
+from minichurch.evaluator import budget, strategies, syntax, terms
+from minichurch.parser import parser
+
+OMEGA = '(^x.x x) (^x.x x)'
+# a term that needs STEPS beta steps to reach its normal form
+NORMALISING = '(^f.^x.f (f (f x))) (^y.y) z'
+STEPS = 5
+
+
+def solve(source: str, limits: budget.Budget):
+    return strategies.evaluate(parser.build_source(source), limits=limits)
+
+
+def test_step_limit():
+    partial = solve(OMEGA, budget.Budget(steps=10))
+    assert isinstance(partial, budget.Partial)
+    assert (partial.limit, partial.steps) == ('steps', 10)
+    assert str(partial) == "stopped after 10 steps: no normal form within 10 steps"
+    assert partial.as_dict() == {'limit': 'steps', 'steps': 10, 'message': partial.message}
+    # the step that hit the limit was not taken, so the term is whole
+    assert terms.from_expression(partial.term) is terms.from_expression(parser.build_source(OMEGA))
+    assert syntax.budget is None
+
+
+def test_step_limit_is_exact():
+    limits = budget.Budget(steps=STEPS)
+    normal = solve(NORMALISING, limits)
+    assert not isinstance(normal, budget.Partial)
+    assert limits.taken == STEPS
+    assert str(normal) == 'z'
+    partial = solve(NORMALISING, budget.Budget(steps=STEPS - 1))
+    assert isinstance(partial, budget.Partial) and partial.steps == STEPS - 1
+
+
+def test_partial_term_can_be_resumed():
+    partial = solve(NORMALISING, budget.Budget(steps=2))
+    assert isinstance(partial, budget.Partial)
+    assert str(strategies.evaluate(partial.term)) == 'z'
+
+
+def test_size_limit():
+    partial = solve('(^x.x x x) (^x.x x x)', budget.Budget(size=200))
+    assert isinstance(partial, budget.Partial)
+    assert partial.limit == 'size'
+    assert partial.message == "the term grew past 200 nodes"
+
+
+def test_time_limit():
+    partial = solve(OMEGA, budget.Budget(seconds=0))
+    assert isinstance(partial, budget.Partial)
+    assert partial.limit == 'time'
+    assert partial.steps == budget.CHECK_INTERVAL
+
+
+def test_head_normal_form_within_limits():
+    reached = strategies.evaluate(parser.build_source(f"^y.y ({OMEGA})"), limits=budget.Budget(steps=10),
+                                  target=syntax.HNF)
+    assert not isinstance(reached, budget.Partial)
+    assert str(reached).startswith('λ y. (y')
+
+
+@pytest.mark.parametrize('strategy', [strategy for strategy in strategies.STRATEGIES if strategy != strategies.DEFAULT])
+def test_limits_need_the_reference_solver(strategy):
+    with pytest.raises(ValueError):
+        strategies.evaluate(parser.build_source('x'), strategy, limits=budget.Budget(steps=1))
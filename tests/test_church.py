@@ -0,0 +1,77 @@
+import pytest
+
+from minichurch.evaluator import church, memo, strategies, terms
+from minichurch.parser import parser
+
+OMEGA = '((^x.x x) (^x.x x))'
+
+
+def numeral(n: int) -> str:
+    return '(^f.^x.' + 'f (' * n + 'x' + ')' * n + ')'
+
+
+def head(source: str, library=None):
+    """Weak head normal form of a source on the church machine"""
+    term, _ = church.whnf(terms.from_expression(parser.build_source(source, library)), None, [])
+    return term
+
+
+def normal_form(source: str, strategy: str, library=None) -> terms.Term:
+    expression = parser.build_source(source, library)
+    return terms.from_expression(strategies.evaluate(expression, strategy, cache=memo.create_cache(0)))
+
+
+@pytest.mark.parametrize('source,value', [
+    (f"succ {numeral(41)}", 42),
+    (f"add {numeral(300)} {numeral(700)}", 1000),
+    (f"mul {numeral(300)} {numeral(300)}", 90000),
+    (f"exp {numeral(10)} {numeral(5)}", 100000),
+    (f"pred {numeral(0)}", 0),
+    (f"pred (mul {numeral(100)} {numeral(100)})", 9999),
+    (f"iszero (add {numeral(0)} {numeral(0)})", True),
+    (f"iszero {numeral(3)}", False),
+])
+def test_native_results(source, value, library):
+    term = head(source, library())
+    assert type(term) is church.Native and term.value == value
+
+
+@pytest.mark.parametrize('source', [
+    '^n.^f.^x.n f (f x)',  # the other encodings of the combinators are recognized too
+    '^m.^n.^f.^x.n f (m f x)',
+    '^m.^n.m (^n.^f.^x.f (n f x)) n',
+    '^m.^n.^f.^x.m (n f) x',
+    '^m.^n.n (^n.^f.^x.n (^g.^h.h (g f)) (^u.x) (^u.u)) m',
+])
+def test_encodings(source):
+    assert church.compile_term(source) in church.OPERATIONS
+
+
+def test_arguments_not_needed_are_not_evaluated(library):
+    term = head(f"mul zero {OMEGA}", library())
+    assert type(term) is church.Native and term.value == 0
+
+
+@pytest.mark.parametrize('source', [
+    'add (^x.x) two',  # not a numeral, left to beta steps
+    'exp two zero',  # the identity
+    'mul two three g y',  # a native value applied to arguments
+    '^y.add y two',  # stuck on a name that is being read back
+    '(^n.n n) two',
+    'iszero one true false',
+])
+def test_agrees_with_need(source, library):
+    assert normal_form(source, 'church', library()) is normal_form(source, 'need', library())
+
+
+def test_nested_past_max_depth(library):
+    # the innermost operations are left to plain beta steps
+    source = 'succ (' * (church.MAX_DEPTH * 2) + 'zero' + ')' * (church.MAX_DEPTH * 2)
+    assert normal_form(source, 'church', library()) is church.numeral(church.MAX_DEPTH * 2)
+
+
+def test_booleans_read_back():
+    assert church.expand(True) is church.TRUE
+    assert church.expand(False) is church.numeral(0)  # false is the same term as zero
+    assert church.decode(church.numeral(7)) == 7
+    assert church.decode(church.TRUE) is None
@@ -0,0 +1,78 @@
+import pytest
+
+from minichurch.evaluator import strategies, syntax, terms
+from minichurch.parser import compiled, parser
+
+SOURCES = [
+    'x',
+    '^x.x',
+    '(^x.^y.x) y',  # the free y stays apart from the bound one
+    '^x.^x.x',  # the inner function shadows the outer one
+    '(^x.x x) (^x.x x)',
+    '^f.^x.f (f (f x))',
+]
+# main expressions that refer to the definitions of the prelude
+DEFINED = ['add two three', 'mul (add one one) (pred three)', 'iszero (pred one)', 'true two omega']
+
+
+def round_trip(expression: syntax.Expression) -> syntax.Expression:
+    loaded = compiled.loads(compiled.dump(expression))
+    assert loaded is not None
+    return loaded
+
+
+@pytest.mark.parametrize('source', SOURCES)
+def test_round_trip(source):
+    expression = parser.build_source(source)
+    loaded = round_trip(expression)
+    assert str(loaded) == str(expression)
+    assert terms.from_expression(loaded) is terms.from_expression(expression)
+
+
+def test_round_trip_random_terms(random_sources):
+    for source in random_sources:
+        expression = parser.build_source(source)
+        assert terms.from_expression(round_trip(expression)) is terms.from_expression(expression), source
+
+
+@pytest.mark.parametrize('source', DEFINED)
+def test_round_trip_keeps_definitions(source, library):
+    expression = parser.build_source(source, library())
+    loaded = round_trip(expression)
+    assert terms.from_expression(strategies.evaluate(loaded)) is \
+        terms.from_expression(strategies.evaluate(parser.build_source(source, library())))
+
+
+def test_loads_rejects_other_data():
+    data = compiled.dump(parser.build_source('^x.x'))
+    assert compiled.loads(b'') is None
+    assert compiled.loads(b'XXXX' + data[4:]) is None
+    assert compiled.loads(data[:-4]) is None
+
+
+def test_loads_checks_imports(tmp_path):
+    imported = tmp_path / 'prelude.lc'
+    imported.write_bytes(b'one = ^f.^x.f x\n')
+    data = compiled.dump(parser.build_source('^x.x'), compiled.dependencies([str(imported)]))
+    assert compiled.loads(data) is not None
+    imported.write_bytes(b'one = ^f.^x.f (f x)\n')
+    assert compiled.loads(data) is None
+
+
+def test_save_and_load(tmp_path):
+    expression = parser.build_source('(^x.^y.x) y')
+    path = compiled.locate(b'(^x.^y.x) y', str(tmp_path), str(tmp_path / 'cache'))
+    assert compiled.load(path) is None
+    assert compiled.save(path, expression)
+    assert str(compiled.load(path)) == str(expression)
+
+
+def test_compile_file(tmp_path):
+    (tmp_path / 'prelude.lc').write_bytes(b'one = ^f.^x.f x\nsucc = ^n.^f.^x.f (n f x)\n')
+    (tmp_path / 'main.lc').write_bytes(b'import "prelude.lc"\nsucc one\n')
+    (tmp_path / 'defines.lc').write_bytes(b'import "prelude.lc"\n')
+    cache = str(tmp_path / 'cache')
+    path = compiled.compile_file(str(tmp_path / 'main.lc'), cache)
+    assert terms.from_expression(strategies.evaluate(compiled.load(path))) is \
+        terms.from_expression(parser.build_source('^f.^x.f (f x)'))
+    assert compiled.compile_file(str(tmp_path / 'defines.lc'), cache) is None
@@ -0,0 +1,78 @@
+import pytest
+
+from minichurch.evaluator import strategies, terms
+from minichurch.parser import definitions, parser
+
+
+def library(source: str, directory: str = None) -> definitions.Library:
+    output_val = definitions.Library()
+    main = output_val.index(source.encode('utf-8'), directory)
+    assert not main.strip()
+    return output_val
+
+
+def normal_form(source: str, built: definitions.Library) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source, built)))
+
+
+def term(source: str) -> terms.Term:
+    return terms.from_expression(parser.build_source(source))
+
+
+def test_index_leaves_the_main_expression():
+    built = definitions.Library()
+    main = built.index(b'id = ^x.x\nid y\n  z\nk = ^x.^y.x\n')
+    assert main == b'id y\n  z\n'  # an indented line goes on with the statement above it
+    assert sorted(built.definitions) == ['id', 'k']
+    assert built.names == {'id'}  # single characters need no lookup by the lexer
+
+
+def test_built_on_first_use():
+    built = library('id = ^x.x\nbroken = ^x.\n')
+    assert normal_form('id y', built) is term('y')
+    assert built.definitions['id'].expression is not None
+    # a definition nothing refers to is never built, so its error never shows
+    assert built.definitions['broken'].expression is None
+    with pytest.raises(TypeError, match="Expected an expression as the body of the function"):
+        parser.build_source('broken', built)
+
+
+def test_forward_reference():
+    built = library('two = succ one\nsucc = ^n.^f.^x.f (n f x)\none = ^f.^x.f x\n')
+    assert normal_form('two', built) is term('^f.^x.f (f x)')
+
+
+def test_name_bound_by_a_function_is_not_a_definition():
+    built = library('x = ^a.a\n')
+    assert normal_form('(^x.x) z', built) is term('z')
+    assert normal_form('x z', built) is term('z')
+
+
+@pytest.mark.parametrize('source,name', [
+    ('loop = ^x.loop x\n', 'loop'),
+    ('a = ^x.b x\nb = ^x.a x\n', None),
+])
+def test_reference_to_itself(source, name):
+    built = library(source)
+    with pytest.raises(NameError, match=f"Definition {name or '.'} refers to itself"):
+        parser.build_source('a' if name is None else name, built)
+
+
+def test_redefinition():
+    built = library('one = ^f.^x.f x\none = ^f.^x.f (f x)\n')
+    assert normal_form('one', built) is term('^f.^x.f (f x)')
+    built.index(b'one = ^f.^x.x\n')
+    assert normal_form('one', built) is term('^f.^x.x')
+
+
+def test_imports(tmp_path):
+    (tmp_path / 'numerals.lc').write_bytes(b'one = ^f.^x.f x\nnumerals\n')
+    (tmp_path / 'prelude.lc').write_bytes(b'import "numerals.lc"\nsucc = ^n.^f.^x.f (n f x)\nimport "prelude.lc"\n')
+    built = library('import "prelude.lc"\n', str(tmp_path))
+    assert normal_form('succ one', built) is term('^f.^x.f (f x)')
+    assert built.imported == {str(tmp_path / 'numerals.lc'), str(tmp_path / 'prelude.lc')}
+
+
+def test_import_of_a_missing_file(tmp_path):
+    with pytest.raises(OSError):
+        library('import "missing.lc"\n', str(tmp_path))
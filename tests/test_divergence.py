@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from minichurch.evaluator import budget, divergence, strategies, syntax, terms
+from minichurch.parser import parser
+
+
+@pytest.fixture
+def watch(monkeypatch):
+    """Watch the reference solver for the length of a test"""
+    output_val = divergence.Watch(stream=io.StringIO())
+    monkeypatch.setattr(syntax, 'watch', output_val)
+    return output_val
+
+
+@pytest.mark.parametrize('source,length', [
+    ('(^x.x x) (^x.x x)', 1),
+    ('(^x.^y.x x y) (^x.^y.x x y) z', 2),
+    ('^a.a ((^x.x x) (^x.x x))', 1),  # the loop is below a name that cannot be bound
+    ('^a.a ((^x.x x) (^x.x x)) a', 1),
+])
+def test_cycle(source, length, watch):
+    with pytest.raises(divergence.Diverges) as e:
+        strategies.evaluate(parser.build_source(source))
+    assert e.value.length == length
+    assert str(e.value) == f"diverges: cycle of length {length} at step {e.value.step}"
+
+
+def test_normal_form_is_not_flagged(watch):
+    source = '(^m.^n.^f.m (n f)) (^f.^x.f (f (f x))) (^f.^x.f (f (f x)))'
+    assert str(strategies.evaluate(parser.build_source(source))) == 'λ f. λ x. (f (f (f (f (f (f (f (f (f x)))))))))'
+    assert watch.growth is None
+
+
+def test_growth_warning(watch):
+    partial = strategies.evaluate(parser.build_source('(^x.x x x) (^x.x x x)'), limits=budget.Budget(steps=1500))
+    assert isinstance(partial, budget.Partial)
+    assert watch.growth is not None
+    assert watch.stream.getvalue() == f"warning: {watch.growth}\n"
+
+
+def test_walking_a_normal_form_takes_no_state(watch, monkeypatch):
+    states = []
+    from_expression = terms.from_expression
+    monkeypatch.setattr(terms, 'from_expression', lambda *args: states.append(args) or from_expression(*args))
+    arguments = ' '.join(f"(^x.x {name})" for name in 'abcdefgh' * 250)
+    strategies.evaluate(parser.build_source(f"^f.f {arguments}"))
+    assert states == []
+    assert watch.steps == 0
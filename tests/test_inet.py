@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from minichurch.evaluator import inet, memo, strategies, terms
+from minichurch.parser import parser
+
+
+def numeral(n: int) -> str:
+    return '(^f.^x.' + 'f (' * n + 'x' + ')' * n + ')'
+
+
+def read(source: str) -> terms.Term:
+    """Normal form read back from the net, without the fallback to the call-by-need machine"""
+    return terms.from_expression(inet.read_back(inet.translate(terms.from_expression(parser.build_source(source)))))
+
+
+def reference(source: str) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), 'need', cache=memo.create_cache(0)))
+
+
+@pytest.mark.parametrize('source', [
+    '(^d.^p.p (d a) (d b)) (^v.^w.w v v)',  # the variable of a shared function is read in each copy
+    '(^x.x x) (^f.^y.f (f y))',
+    f"{numeral(2)} {numeral(3)}",
+    f"{numeral(3)} (^h.^z.h (h z)) g",  # fans inside fans on the way to the variables
+    '^a.(^d.d (d a)) (^v.^w.v w w)',
+    '(^x.^y.y x x) (^z.z)',
+])
+def test_shared_variables(source):
+    assert read(source) is reference(source)
+
+
+def test_numeral_applied_to_free_names():
+    count = 3000
+    start = time.perf_counter()
+    result = read(f"{numeral(count)} g z")
+    # the read back is linear, it took minutes before the variables shared through fans jumped to their ends
+    assert time.perf_counter() - start < 10
+    assert result is terms.from_expression(parser.build_source('g (' * count + 'z' + ')' * count))
+
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from minichurch import jobs
+from minichurch.evaluator import syntax, terms
+from minichurch.parser import parser
+
+OMEGA = '(^x.x x) (^x.x x)'
+
+
+@pytest.fixture
+def pool():
+    output_val = jobs.Jobs(memo_size=16, workers=1)
+    try:
+        yield output_val
+    finally:
+        output_val.close()
+
+
+def same(expression: syntax.Expression, source: str) -> bool:
+    return terms.from_expression(expression) is terms.from_expression(parser.build_source(source))
+
+
+def submit(pool: jobs.Jobs, source: str, strategy: str = 'subst', **options) -> jobs.Job:
+    return pool.submit(source, parser.build_source(source), strategy, **options)
+
+
+@pytest.mark.parametrize('strategy', ['subst', 'need', 'inet'])
+def test_done(pool, strategy):
+    job = submit(pool, '(^f.^x.f (f x)) (^f.^x.f (f x))', strategy)
+    pool.wait(job)
+    assert job.state == 'done'
+    assert same(job.result, '^f.^x.f (f (f (f x)))')
+
+
+def test_target(pool):
+    job = submit(pool, f"^y.(^x.x) y ({OMEGA})", target=syntax.WHNF)
+    pool.wait(job)
+    assert job.state == 'done'
+    assert same(job.result, f"^y.(^x.x) y ({OMEGA})")
+
+
+def test_stopped_by_limits(pool):
+    job = submit(pool, OMEGA, limits=(10,))
+    pool.wait(job)
+    assert job.state == 'stopped'
+    assert job.error == "stopped after 10 steps: no normal form within 10 steps"
+    assert same(job.result, OMEGA)
+
+
+def test_failed(pool):
+    job = submit(pool, 'x', 'eager')
+    pool.wait(job)
+    assert job.state == 'failed'
+    assert job.error.startswith('Unknown strategy eager')
+
+
+def test_cancel(pool):
+    running = submit(pool, OMEGA)
+    queued = submit(pool, 'x')
+    assert (running.state, queued.state) == ('running', 'queued')
+    assert pool.pending() == [running, queued]
+    assert pool.cancel(queued)
+    assert queued.state == 'cancelled'
+    assert pool.cancel(running)
+    assert running.state == 'cancelled'
+    assert not pool.cancel(running)
+    # a new worker takes the place of the stopped one
+    job = submit(pool, '(^x.x) z')
+    pool.wait(job)
+    assert job.state == 'done' and same(job.result, 'z')
+
+
+def test_background(pool):
+    job = submit(pool, '(^x.x) z', background=True)
+    pool.wait(job)
+    assert pool.finished == [job]
+
+
+def test_progress_without_stats(pool):
+    job = submit(pool, OMEGA)
+    assert job.stats is None
+    time.sleep(jobs.PROGRESS_INTERVAL * 3)
+    steps, seconds = pool.progress(job)
+    assert steps > 0 and seconds > 0
+    pool.cancel(job)
+
+
+def test_stats(pool):
+    # the worker's statistics are only added to the jobs that carry them
+    job = submit(pool, '(^f.^x.f (f x)) (^f.^x.f (f x))', stats=syntax.Stats())
+    pool.wait(job)
+    assert job.stats.beta_steps > 0
+    assert job.stats.wall['solve'] > 0
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+
+from minichurch.lexer import lexer, tokens
+from minichurch.parser import parser
+
+# lambdas take two bytes in utf-8, the names of definitions are runs of several characters
+SOURCE = 'λf.λx.add (mul two two) (f x)\n  (^y.succ y) three λz.z'
+NAMES = {'add', 'mul', 'two', 'succ', 'three'}
+
+
+def scanned(scanner: lexer.Scanner) -> list:
+    """Type and value of every token with its offset"""
+    return [(type(token), token.value, scanner.offset) for token in scanner]
+
+
+def expected(source: str, names: set = None, binary: bool = False) -> list:
+    """Tokens of the whole source scanned at once, with their positions found character by character"""
+    found, _ = lexer.scan(source, names=names)
+    pattern = lexer.WORD if names else lexer.TOKEN
+    starts = []
+    for match in pattern.finditer(source):
+        if len(match.group()) > 1 and match.group() not in names:
+            starts.extend(range(match.start(), match.end()))
+        else:
+            starts.append(match.start())
+    if binary:
+        starts = [len(source[:start].encode('utf-8')) for start in starts]
+    return [(type(token), token.value, start) for token, start in zip(found, starts)]
+
+
+@pytest.mark.parametrize('names', [None, NAMES])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8, lexer.CHUNK_SIZE])
+def test_chunks(chunk_size, names):
+    scanner = lexer.Scanner(io.BytesIO(SOURCE.encode('utf-8')), chunk_size, names)
+    assert scanned(scanner) == expected(SOURCE, names, binary=True)
+
+
+def test_name_split_across_chunks():
+    # every chunk boundary cuts a name of a definition or a lambda in two
+    found = [token for token in lexer.Scanner(io.BytesIO('three succλ'.encode('utf-8')), 3, NAMES)]
+    assert found == [tokens.reference('three'), tokens.reference('succ'), tokens.func_val]
+
+
+def test_string_offsets():
+    scanner = lexer.Scanner(SOURCE, names=NAMES)
+    assert scanned(scanner) == expected(SOURCE, NAMES)
+    assert scanner.unit == 'character'
+
+
+def test_offset_before_the_first_token():
+    assert lexer.Scanner('x').offset is None
+
+
+@pytest.mark.parametrize('source,message,character,byte', [
+    ('(^x.x) ^(y', "Expected named value after function declaration", 8, 8),
+    ('λx.x ^.y', "Expected named value after function declaration", 6, 7),  # the lambda takes two bytes in a file
+    ('a b ^x y', "Expected body value after name separator", 7, 7),
+])
+def test_parse_errors_say_where(source, message, character, byte):
+    with pytest.raises(TypeError, match=f"{message} at character {character} of the expression"):
+        parser.parse(lexer.Scanner(source))
+    with pytest.raises(TypeError, match=f"{message} at character {character} of the expression"):
+        parser.build_source(source)
+    with pytest.raises(TypeError, match=f"{message} at byte {byte} of the expression"):
+        parser.parse(lexer.Scanner(io.BytesIO(source.encode('utf-8')), 2))
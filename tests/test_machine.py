@@ -0,0 +1,53 @@
+import collections
+
+import pytest
+
+from minichurch.evaluator import machine, memo, strategies, terms
+from minichurch.parser import parser
+
+# an argument that takes steps to reach a lambda, used four times
+SHARED = '(^x.^k.k (x x) (x x)) ((^i.i) (^i.i) (^z.z))'
+
+
+@pytest.fixture
+def entered(monkeypatch) -> collections.Counter:
+    """Count how often each thunk is evaluated, an Update marker is made every time one is"""
+    counts = collections.Counter()
+
+    class Counted(machine.Update):
+        __slots__ = ()
+
+        def __init__(self, thunk: machine.Thunk):
+            super().__init__(thunk)
+            counts[thunk] += 1
+
+    monkeypatch.setattr(machine, 'Update', Counted)
+    return counts
+
+
+def normal_form(source: str, strategy: str) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), strategy, cache=memo.create_cache(0)))
+
+
+def test_arguments_evaluated_once(entered):
+    assert normal_form(SHARED, 'need') is normal_form(SHARED, strategies.DEFAULT)
+    assert entered and max(entered.values()) == 1
+
+
+def test_shared_numeral(entered):
+    # the product is an argument of both sides of the pair
+    source = '(^n.^p.p n (^f.^x.n f (n f x))) ((^m.^k.^f.m (k f)) (^f.^x.f (f x)) (^f.^x.f (f (f x))))'
+    assert normal_form(source, 'need') is normal_form(source, strategies.DEFAULT)
+    assert max(entered.values()) == 1
+
+
+def test_stuck_thunks_are_left():
+    # the argument gets stuck on the variable of the lambda being read back, it is not written over
+    source = '^y.(^x.x x) (y y)'
+    assert normal_form(source, 'need') is normal_form(source, 'name') is normal_form(source, strategies.DEFAULT)
+
+
+def test_name_agrees_with_need():
+    # call-by-name has no thunks, every use of x evaluates its closure again to the same value
+    term = terms.from_expression(parser.build_source(SHARED))
+    assert terms.from_expression(machine.normalize_term(term)) is terms.from_expression(machine.normalize_shared(term))
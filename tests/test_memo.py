@@ -0,0 +1,36 @@
+from minichurch.evaluator import memo, strategies, syntax, terms
+from minichurch.parser import parser
+
+
+def reduce(source: str, target: str, cache) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), cache=cache, target=target))
+
+
+def term(source: str) -> terms.Term:
+    return terms.from_expression(parser.build_source(source))
+
+
+def test_alpha_equivalent_terms_share_an_entry():
+    cache = memo.create_cache(16)
+    assert reduce('(^x.^y.x) (^z.z)', syntax.NF, cache) is reduce('(^a.^b.a) (^c.c)', syntax.NF, cache)
+    assert (len(cache), cache.hits) == (1, 1)
+
+
+def test_cache_keeps_targets_apart():
+    cache = memo.create_cache(16)
+    source = '(^x.x) (^y.(^x.x) y)'
+    assert reduce(source, syntax.WHNF, cache) is term('^y.(^x.x) y')
+    assert reduce(source, syntax.HNF, cache) is term('^y.y')
+    assert reduce(source, syntax.NF, cache) is term('^y.y')
+    assert reduce(source, syntax.WHNF, cache) is term('^y.(^x.x) y')
+    assert cache.hits == 1
+
+
+def test_cache_eviction():
+    cache = memo.create_cache(2)
+    for source in ['(^x.x) a', '(^x.x) b', '(^x.x) c']:
+        reduce(source, syntax.NF, cache)
+    assert (len(cache), cache.evictions) == (2, 1)
+    cache.resize(1)
+    assert (len(cache), cache.evictions) == (1, 2)
+    assert memo.create_cache(0) is None
@@ -0,0 +1,28 @@
+import pytest
+
+from minichurch.evaluator import memo, nbe, strategies, terms
+from minichurch.parser import parser
+
+
+def normal_form(source: str, strategy: str) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), strategy, cache=memo.create_cache(0)))
+
+
+@pytest.mark.parametrize('source', [
+    '(^g.^p.p (g u) (g v)) (x w)',  # both applications of the neutral x w start from its one argument
+    '(^g.g (g (g x))) (^a.a y)',  # each application extends the neutral value of the one before
+    '^a.^b.(^g.g b (g a)) (a b)',
+])
+def test_shared_arguments(source):
+    assert normal_form(source, 'nbe') is normal_form(source, strategies.DEFAULT)
+
+
+def test_arguments_read_back_in_order():
+    # x applied to y once for each f of the numeral, without going through the machine fallback
+    count = 50
+    term = terms.from_expression(parser.build_source(f"(^f.^x.{'f (' * count}x{')' * count}) (^a.a y) x"))
+    value = nbe.compile_term(term)(None)
+    assert terms.from_expression(nbe.read_back(value)) is terms.from_expression(
+        parser.build_source('x' + ' y' * count))
+    # the arguments are linked, the last one first
+    assert value.args[0].force().head == 'y'
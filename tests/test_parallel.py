@@ -0,0 +1,65 @@
+import concurrent.futures
+
+from minichurch.evaluator import budget, memo, parallel, strategies, terms
+from minichurch.parser import parser
+
+# numerals whose products are the independent parts of a tuple
+FOUR = '(^f.^x.f (f (f (f x))))'
+MUL = '(^m.^n.^f.m (n f))'
+# beta steps the reference solver may take on a random term, the others are not compared
+STEPS = 500
+
+
+class Inline(concurrent.futures.Executor):
+    """Pool that runs what it is sent right away, keeping the compiled terms it was sent"""
+    def __init__(self):
+        self.sent = []
+
+    def submit(self, function, data):
+        self.sent.append(data)
+        future = concurrent.futures.Future()
+        future.set_result(function(data))
+        return future
+
+
+def normal_form(source: str, pool, threshold: int = parallel.THRESHOLD) -> terms.Term:
+    return terms.from_expression(parallel.normalize(parser.build_source(source), pool, threshold, memo.create_cache(0)))
+
+
+def reference(source: str) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), 'need', cache=memo.create_cache(0)))
+
+
+def test_threshold():
+    # the first part is a closed redex larger than the threshold, the others are below it
+    source = f"^p.p ({MUL} {FOUR} {FOUR}) (^x.x) {FOUR}"
+    pool = Inline()
+    assert normal_form(source, pool) is reference(source)
+    assert len(pool.sent) == 1
+    pool = Inline()
+    assert normal_form(source, pool, threshold=1) is reference(source)
+    assert len(pool.sent) == 3
+
+
+def test_open_arguments_stay():
+    # every argument uses the variable of the lambda being read back
+    source = f"^y.y ({MUL} {FOUR} (^f.^x.y f x)) ({MUL} (^f.^x.y f x) {FOUR})"
+    pool = Inline()
+    assert normal_form(source, pool, threshold=1) is reference(source)
+    assert pool.sent == []
+
+
+def test_agrees_with_the_solver(random_sources):
+    pool = Inline()
+    for source in random_sources[:100]:
+        expected = strategies.evaluate(parser.build_source(source), strategies.DEFAULT,
+                                       limits=budget.Budget(STEPS, size=10 * STEPS))
+        if isinstance(expected, budget.Partial):
+            continue  # no normal form within the limits
+        assert normal_form(source, pool, threshold=1) is terms.from_expression(expected), source
+
+
+def test_pool():
+    source = '^p.p ' + ' '.join(f"({MUL} {FOUR} {FOUR})" for _ in range(4))
+    with parallel.start(2, 'need', 16) as pool:
+        assert normal_form(source, pool) is reference(source)
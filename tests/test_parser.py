@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from minichurch.evaluator import terms
+from minichurch.lexer import lexer, tokens
+from minichurch.parser import parser, parsertypes
+
+# nesting far beyond the recursion limit
+DEPTH = 100000
+# names of the prelude the random terms are applied to
+PRELUDE_NAMES = ['true', 'false', 'zero', 'one', 'two', 'succ', 'add', 'mul', 'pred', 'iszero']
+# sources that are not well formed, both ways of building must reject or read them the same way
+MALFORMED = [
+    '(^x.x',  # unbalanced parens, the missing closing block is added
+    '((x) y',
+    '^x.x)',  # a closing block without an opening one ends the expression
+    'x) y',
+    ')x',
+    '()',
+    '',
+    '  ',
+    'q',  # an unbound name is a free name
+    'q one',
+    '^one.one x',  # a function's name shadows the definition
+    '^', '^x', '^x.', '^x.(', '(^x.)', 'x ^x.', '^x.()',
+    '^(.x', '^xy.x', '.x', 'a . b', '^x.x . y',
+]
+
+
+def tree_built(source: str, library=None):
+    """Build a source from the syntax tree of its tokens"""
+    names = None if library is None else library.names
+    return parser.build(parser.parse(lexer.Scanner(source, names=names)), library=library)
+
+
+def outcome(build, source: str, library=None):
+    """The term a source builds to or the error building it raises"""
+    try:
+        expression = build(source, library)
+    except (TypeError, NameError) as e:
+        return type(e), str(e)
+    return None if expression is None else terms.from_expression(expression)
+
+
+def test_random_sources(random_sources):
+    for source in random_sources:
+        assert outcome(parser.build_source, source) is outcome(tree_built, source), source
+
+
+def test_random_sources_with_definitions(random_sources, library):
+    rng = random.Random(23)
+    for source in random_sources[:100]:
+        # the definitions go in the middle of the term, next to names of one character
+        source = f"{rng.choice(PRELUDE_NAMES)} {source} ({rng.choice(PRELUDE_NAMES)} {rng.choice('uvw')})"
+        assert outcome(parser.build_source, source, library()) is outcome(tree_built, source, library()), source
+
+
+@pytest.mark.parametrize('with_library', [False, True])
+@pytest.mark.parametrize('source', MALFORMED)
+def test_malformed(source, with_library, library):
+    fused = outcome(parser.build_source, source, library() if with_library else None)
+    tree = outcome(tree_built, source, library() if with_library else None)
+    assert fused == tree
+
+
+def test_deep_blocks():
+    assert parser.parse(lexer.Scanner('(' * DEPTH + 'x' + ')' * DEPTH)) is tokens.name('x')
+    # the closing blocks are added at the end of the input
+    assert parser.parse(lexer.Scanner('(' * DEPTH + 'x')) is tokens.name('x')
+
+
+def test_deep_functions():
+    tree = parser.parse(lexer.Scanner('(^x.' * DEPTH + 'x' + ')' * DEPTH))
+    for _ in range(DEPTH):
+        assert isinstance(tree, parsertypes.FunctionTree) and tree.left is tokens.name('x')
+        tree = tree.right
+    assert tree is tokens.name('x')
+
+
+def test_long_application():
+    # applications associate to the left
+    tree = parser.parse(lexer.Scanner('x ' * DEPTH + '(y)'))
+    assert tree.right is tokens.name('y')
+    for _ in range(DEPTH - 1):
+        tree = tree.left
+        assert tree.right is tokens.name('x')
+    assert tree.left is tokens.name('x')
+
+
+def test_deep_right_nesting():
+    tree = parser.parse(lexer.Scanner('x (' * DEPTH + 'y' + ')' * DEPTH))
+    for _ in range(DEPTH):
+        assert tree.left is tokens.name('x')
+        tree = tree.right
+    assert tree is tokens.name('y')
+
+
+@pytest.mark.parametrize('source,message', [
+    ('^', "Expected named value after function declaration"),
+    ('^.x', "Expected named value after function declaration"),
+    ('^(x', "Expected named value after function declaration"),
+    ('^x', "Expected body value after name separator"),
+    ('^x x', "Expected body value after name separator"),
+    ('x . y', "Expected function declaration before body separator"),
+    ('^x.', "Expected an expression as the body of the function"),
+    ('(^x.) y', "Expected an expression as the body of the function"),
+])
+def test_errors(source, message):
+    # a stream of tokens has no positions to add to the message
+    found, _ = lexer.scan(source)
+    with pytest.raises(TypeError, match=f"^{message}$"):
+        parser.parse(found)
+    with pytest.raises(TypeError, match=f"^{message} at character"):
+        parser.parse(lexer.Scanner(source))
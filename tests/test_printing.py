@@ -0,0 +1,84 @@
+import io
+import re
+import sys
+
+import pytest
+
+from minichurch.evaluator import syntax
+from minichurch.lexer import lexer
+from minichurch.parser import parser, parsertypes
+
+SOURCE = '^x.x (^y.y (^z.z)) x'
+
+
+def test_limit_cuts_the_full_output(random_sources):
+    for source in random_sources[:50]:
+        expression = parser.build_source(source)
+        full = syntax.write(expression)
+        for limit in range(1, len(full) + 2):
+            cut = syntax.write(expression, limit)
+            assert cut == (full if limit >= len(full) else full[:limit] + '…')
+
+
+def test_limit_past_the_output_buffer():
+    expression = parser.build_source('^x.' + 'x ' * (2 * syntax.DUMP_BUFFER) + 'x')
+    full = syntax.write(expression)
+    limit = len(full) - 10
+    assert syntax.write(expression, limit) == full[:limit] + '…'
+
+
+@pytest.mark.parametrize('depth,printed', [
+    (1, 'λ x. …'),
+    (2, 'λ x. (… x)'),
+    (3, 'λ x. ((x …) x)'),
+    (4, 'λ x. ((x λ y. …) x)'),
+    (10, 'λ x. ((x λ y. (y λ z. z)) x)'),
+])
+def test_depth(depth, printed):
+    assert syntax.write(parser.build_source(SOURCE), depth=depth) == printed
+
+
+def test_depth_and_limit():
+    assert syntax.write(parser.build_source(SOURCE), 8, 3) == 'λ x. ((x…'
+
+
+def test_shared_subterms():
+    function = parser.build_source('^y.y y')
+    argument = parser.build_source(SOURCE)
+    expression = parser.apply(parser.apply(parser.apply(function, function), argument), argument)
+    full = syntax.write(expression)
+    shared = syntax.write(expression, share=True)
+    assert shared == f"(((#1=λ y. (y y) #1#) #2={syntax.write(argument)}) #2#)"
+    # replacing every label by what it stands for gives back the full output
+    labelled = {'1': syntax.write(function), '2': syntax.write(argument)}
+    assert re.sub(r'#(\d+)#', lambda match: labelled[match.group(1)], re.sub(r'#\d+=', '', shared)) == full
+    assert syntax.write(expression, 20, share=True) == shared[:20] + '…'
+
+
+def test_nothing_shared():
+    expression = parser.build_source(SOURCE)
+    assert syntax.write(expression, share=True) == syntax.write(expression)
+
+
+def test_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() * 10
+    expression = parser.build_source('^x.' + 'x (' * depth + 'x' + ')' * depth)
+    full = syntax.write(expression)
+    assert full == 'λ x. ' + '(x ' * depth + 'x' + ')' * depth
+    assert syntax.write(expression, 100) == full[:100] + '…'
+    assert syntax.write(expression, depth=3) == 'λ x. (x (x …))'
+    assert syntax.size(expression) == 2 * depth + 2
+    stream = io.StringIO()
+    syntax.dump(expression, stream, share=True)
+    assert stream.getvalue() == full
+
+
+def test_parse_tree_limit():
+    tree = parser.parse(lexer.Scanner(SOURCE))
+    stream = io.StringIO()
+    parsertypes.dump_tree(tree, stream)
+    full = stream.getvalue()
+    for limit in range(1, len(full)):
+        stream = io.StringIO()
+        parsertypes.dump_tree(tree, stream, limit)
+        assert stream.getvalue() == full[:limit] + '…'
@@ -0,0 +1,52 @@
+import string
+
+from minichurch.evaluator import syntax, terms
+from minichurch.parser import parser
+
+# functions that all bind the same symbol as a free name below them, each one has to be renamed
+DEPTH = 120
+
+
+def binders(expression: syntax.Expression) -> list:
+    symbols = []
+    while isinstance(expression, syntax.Function):
+        symbols.append(expression.name.symbol)
+        expression = expression.inner_data
+    return symbols
+
+
+def shadowing(depth: int) -> syntax.Expression:
+    """^a.^a. ... ^a.a a ... a applied to the free a, every name refers to a different function"""
+    free = syntax.Name('a')
+    names = [syntax.Name('a') for _ in range(depth)]
+    body = free
+    for name in names:
+        body = parser.apply(body, name)
+    for name in reversed(names):
+        body = syntax.Function(name).set_expr(body)
+    return body
+
+
+def test_fresh_names():
+    fresh = syntax.fresh_names({'b', 'a1'})
+    symbols = [next(fresh) for _ in range(60)]
+    assert symbols[:51] == [char for char in string.ascii_letters if char != 'b']
+    assert symbols[51:] == ['b1', 'c1', 'd1', 'e1', 'f1', 'g1', 'h1', 'i1', 'j1']
+
+
+def test_renamer_past_the_letters():
+    expression = shadowing(DEPTH)
+    before = terms.from_expression(expression)
+    syntax.renamer(expression)
+    symbols = binders(expression)
+    assert len(set(symbols + ['a'])) == DEPTH + 1
+    # the innermost function is renamed first, the letters other than a run out after 51 of them
+    assert symbols[::-1][:52] == list(string.ascii_letters[1:]) + ['a1']
+    assert all(symbol.isascii() for symbol in symbols)
+    assert terms.from_expression(expression) is before
+
+
+def test_renamer_keeps_names_that_do_not_capture():
+    expression = parser.build_source('^x.^y.(^x.x) y x')
+    syntax.renamer(expression)
+    assert str(expression) == str(parser.build_source('^x.^y.(^x.x) y x'))
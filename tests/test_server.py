@@ -0,0 +1,80 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from minichurch import batch, client, server
+
+OMEGA = '(^x.x x) (^x.x x)'
+# seconds the server gets to start listening or to stop
+STARTUP = 20
+
+
+@pytest.fixture
+def prelude(tmp_path) -> str:
+    output_val = tmp_path / 'prelude.lc'
+    output_val.write_bytes(b'two = ^f.^x.f (f x)\nadd = ^m.^n.^f.^x.m f (n f x)\n')
+    return str(output_val)
+
+
+@pytest.fixture
+def socket_path(tmp_path, prelude):
+    """Path of a server running with the definitions of the prelude, stopped with SIGTERM after the test"""
+    path = str(tmp_path / 'server.sock')
+    process = subprocess.Popen([sys.executable, '-m', 'minichurch.ops', 'serve', '--socket', path, '--file', prelude,
+                                '--workers', '1', '--timeout', '5'], stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + STARTUP
+        while not (os.path.exists(path) and server.listening(path)):
+            assert process.poll() is None and time.monotonic() < deadline, "The server did not start"
+            time.sleep(0.05)
+        yield path
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(STARTUP) == 0
+    # the socket is removed once the server stopped
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('request_, message', [
+    ([], "Expected an object with an expression"),
+    ({'expression': 1}, "Expected an object with an expression"),
+    ({'expression': 'x', 'strategy': 'eager'}, "Unknown strategy eager"),
+    ({'expression': 'x', 'timeout': -1}, "Expected a timeout of zero or more seconds"),
+    ({'expression': 'x', 'steps': True}, "Expected a step limit of zero or more"),
+    ({'expression': 'x', 'strategy': 'need', 'steps': 10}, "Step limits are only supported by the subst strategy"),
+])
+def test_check_rejects(request_, message):
+    with pytest.raises(ValueError, match=message):
+        server.check(request_)
+
+
+def test_check():
+    assert server.check({'id': 3, 'expression': 'x', 'steps': 10}) == ((3, 'x', None), None, None, 10)
+
+
+def test_requests(socket_path, prelude):
+    expressions = ['add two two', '(^x.^y.x) z', 'two two x']
+    records = client.evaluate(expressions, socket_path, strategy='need')
+    assert [record['id'] for record in records] == [0, 1, 2]
+    # the same results as a batch
+    worker = batch.Worker(prelude)
+    assert [record['result'] for record in records] == [worker.evaluate(expression)[0] for expression in expressions]
+
+
+def test_step_limit(socket_path):
+    (record,) = client.evaluate([OMEGA], socket_path, steps=10)
+    assert record['stopped'] == {'limit': 'steps', 'steps': 10, 'message': "no normal form within 10 steps"}
+    assert 'result' in record
+
+
+def test_errors(socket_path):
+    records = list(client.send([{'id': 'bad'}, {'id': 'slow', 'expression': OMEGA, 'timeout': 0.2},
+                                {'id': 'broken', 'expression': '^x.'}], socket_path))
+    records = {record['id']: record for record in records}
+    assert records['bad']['error'] == "Invalid request: Expected an object with an expression"
+    assert records['slow']['error'] == "Timeout: no normal form within 0.2s"
+    assert records['broken']['error'] == "TypeError: Expected an expression as the body of the function at character 2 of the expression"
@@ -0,0 +1,51 @@
+import pytest
+
+from minichurch.evaluator import syntax, terms
+from minichurch.parser import parser
+
+# arguments of the wide spines, and nesting of the deep terms (well past the recursion limit)
+WIDTH = 2000
+DEPTH = 20000
+
+
+@pytest.fixture
+def reductions(monkeypatch) -> list:
+    """Count the calls to Application.reduce, each one walks the left spine of its application"""
+    calls = []
+    reduce = syntax.Application.reduce
+
+    def counted(self, showstep=None):
+        calls.append(self)
+        return reduce(self, showstep)
+    monkeypatch.setattr(syntax.Application, 'reduce', counted)
+    return calls
+
+
+def same(expression: syntax.Expression, source: str) -> bool:
+    return terms.from_expression(expression) is terms.from_expression(parser.build_source(source))
+
+
+def test_every_argument_of_a_stuck_head(reductions):
+    normal = syntax.solver(parser.build_source('^w.w ((^x.x) w) ((^x.x) (^y.(^x.x) y)) w ((^x.x) w)'))
+    assert same(normal, '^w.w w (^y.y) w w')
+
+
+def test_wide_stuck_spine_is_walked_once(reductions):
+    arguments = ' '.join('a' for _ in range(WIDTH))
+    normal = syntax.solver(parser.build_source(f"^f.^a.f {arguments}"))
+    assert same(normal, f"^f.^a.f {arguments}")
+    # a spine already in normal form is bound once, not once for each of its left parts
+    assert len(reductions) == 1
+
+
+def test_wide_stuck_spine_of_redexes(reductions):
+    normal = syntax.solver(parser.build_source('^s.s ' + ' '.join('((^x.x) s)' for _ in range(WIDTH))))
+    assert same(normal, '^s.s ' + ' '.join('s' for _ in range(WIDTH)))
+    assert len(reductions) <= 2 * WIDTH + 1
+
+
+def test_deep_terms():
+    normal = syntax.solver(parser.build_source('^a.' * DEPTH + '(^x.x) a'))
+    assert same(normal, '^a.' * DEPTH + 'a')
+    normal = syntax.solver(parser.build_source('(^y.^x.' + 'y (' * DEPTH + 'x' + ')' * DEPTH + ') z'))
+    assert same(normal, '^x.' + 'z (' * DEPTH + 'x' + ')' * DEPTH)
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from minichurch.evaluator import budget, memo, strategies, terms
+from minichurch.parser import parser
+
+# terms with a normal form, each one the kind of term a strategy could get wrong
+SOURCES = [
+    '(^x.x) y',
+    '(^x.^y.x) y',  # the function must not capture the free y
+    '(^x.^y.^z.x z (y z)) (^x.^y.x) (^x.^y.x)',
+    '(^x.^y.y) ((^x.x x) (^x.x x))',  # the argument without a normal form is dropped
+    '(^f.^x.f (f x)) (^f.^x.f (f x))',
+    '^a.(^f.^x.f (f (f x))) (^y.a y)',
+    '(^x.x x) (^y.^z.y (y z))',
+    '(^f.^x.f (f (f x))) g z',
+    '(w ((^e.e) (^d.d))) ((^x.x) u)',  # every argument of a stuck head is reduced
+    '^w.(((w w) ((^e.e) w)) ((^e.e) w)) ((^e.e) w)',
+]
+# arithmetic built from the definitions of the prelude, the church strategy runs them natively
+ARITHMETIC = ['zero', 'one', 'two', 'three']
+OPERATIONS = {'succ': 1, 'pred': 1, 'add': 2, 'mul': 2, 'exp': 2}
+# beta steps the reference solver may take on a random term, the others are not compared
+STEPS = 500
+
+
+def normal_form(source: str, strategy: str, library=None) -> terms.Term:
+    expression = parser.build_source(source, library)
+    return terms.from_expression(strategies.evaluate(expression, strategy, cache=memo.create_cache(0)))
+
+
+def arithmetic(rng: random.Random, depth: int) -> str:
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(ARITHMETIC)
+    operation = rng.choice(list(OPERATIONS))
+    if operation == 'exp':
+        # keep the powers small
+        return f"(exp {rng.choice(ARITHMETIC)} {rng.choice(ARITHMETIC)})"
+    return f"({operation} {' '.join(arithmetic(rng, depth - 1) for _ in range(OPERATIONS[operation]))})"
+
+
+@pytest.mark.parametrize('strategy', list(strategies.STRATEGIES))
+@pytest.mark.parametrize('source', SOURCES)
+def test_strategies_agree(source, strategy):
+    assert normal_form(source, strategy) is normal_form(source, strategies.DEFAULT)
+
+
+@pytest.mark.parametrize('strategy', [strategy for strategy in strategies.STRATEGIES if strategy != strategies.DEFAULT])
+def test_strategies_agree_on_random_terms(strategy, random_sources):
+    compared = 0
+    for source in random_sources:
+        reference = strategies.evaluate(parser.build_source(source), strategies.DEFAULT,
+                                        limits=budget.Budget(STEPS, size=10 * STEPS))
+        if isinstance(reference, budget.Partial):
+            continue  # no normal form within the limits
+        assert normal_form(source, strategy) is terms.from_expression(reference), source
+        compared += 1
+    assert compared > len(random_sources) // 2
+
+
+def test_church_agrees_with_need_on_arithmetic(library):
+    rng = random.Random(4)
+    for _ in range(60):
+        source = arithmetic(rng, 3)
+        assert normal_form(source, 'church', library()) is normal_form(source, 'need', library()), source
+
+
+def test_cache_reuses_normal_forms():
+    cache = memo.create_cache(16)
+    source = '(^f.^x.f (f x)) (^f.^x.f (f x))'
+    first = terms.from_expression(strategies.evaluate(parser.build_source(source), 'need', cache=cache))
+    second = terms.from_expression(strategies.evaluate(parser.build_source(source), strategies.DEFAULT, cache=cache))
+    assert first is second
+    assert cache.hits == 1
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        strategies.evaluate(parser.build_source('x'), 'eager')
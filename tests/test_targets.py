@@ -0,0 +1,40 @@
+import pytest
+
+from minichurch.evaluator import strategies, syntax, terms
+from minichurch.parser import parser
+
+OMEGA = '(^x.x x) (^x.x x)'
+# source, then its weak head, head and full normal form
+FORMS = [
+    ('^y.(^x.x) y', '^y.(^x.x) y', '^y.y', '^y.y'),
+    ('(^x.x) a ((^x.x) b)', 'a ((^x.x) b)', 'a ((^x.x) b)', 'a b'),
+    (f"(^x.^y.x) (^y.(^x.x) y) ({OMEGA})", '^y.(^x.x) y', '^y.y', '^y.y'),
+    (f"^a.a ({OMEGA})", f"^a.a ({OMEGA})", f"^a.a ({OMEGA})", None),
+]
+
+
+def reduce(source: str, target: str, cache=None) -> terms.Term:
+    return terms.from_expression(strategies.evaluate(parser.build_source(source), cache=cache, target=target))
+
+
+def term(source: str) -> terms.Term:
+    return terms.from_expression(parser.build_source(source))
+
+
+@pytest.mark.parametrize('source,weak,head,normal', FORMS)
+def test_targets(source, weak, head, normal):
+    assert reduce(source, syntax.WHNF) is term(weak)
+    assert reduce(source, syntax.HNF) is term(head)
+    if normal is not None:
+        assert reduce(source, syntax.NF) is term(normal)
+
+
+@pytest.mark.parametrize('strategy', [strategy for strategy in strategies.STRATEGIES if strategy != strategies.DEFAULT])
+def test_targets_need_the_reference_solver(strategy):
+    with pytest.raises(ValueError, match="Only the subst strategy can stop at a head normal form"):
+        strategies.evaluate(parser.build_source('x'), strategy, target=syntax.HNF)
+
+
+def test_unknown_target():
+    with pytest.raises(ValueError):
+        strategies.evaluate(parser.build_source('x'), target='normal')
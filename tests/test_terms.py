@@ -0,0 +1,72 @@
+import gc
+
+import pytest
+
+from minichurch.evaluator import terms
+from minichurch.parser import parser
+
+# nesting far beyond the recursion limit
+DEPTH = 20000
+
+
+def term(source: str) -> terms.Term:
+    return terms.from_expression(parser.build_source(source))
+
+
+def test_alpha_equivalent_terms_are_shared():
+    assert term('^x.^y.x y') is term('^a.^b.a b')
+    assert term('^x.^y.x y') is not term('^x.^y.y x')
+    # free names are compared by their symbol
+    assert term('^x.x z') is not term('^x.x w')
+    # the numeral is one object wherever it appears
+    two = term('^f.^x.f (f x)')
+    pair = term('^p.p (^f.^x.f (f x)) (^g.^y.g (g y))')
+    assert pair.body.left.right is two and pair.body.right is two
+
+
+def test_indices():
+    built = term('^x.^y.^x.x y z')
+    assert built.body.body.body.left.left is terms.Var(0)  # the innermost x shadows the outer one
+    assert built.body.body.body.left.right is terms.Var(1)
+    assert built.body.body.body.right is terms.Free('z')
+
+
+def test_size_and_free():
+    built = term('^x.(^y.y x) x')
+    assert built.size == 7
+    assert built.free == 0
+    assert built.body.free == 1 and built.body.left.body.free == 2
+
+
+def test_immutable():
+    built = term('^x.x')
+    with pytest.raises(AttributeError):
+        built.body = terms.Var(1)
+    with pytest.raises(AttributeError):
+        del built.hint
+
+
+def test_round_trip(random_sources):
+    for source in random_sources:
+        built = term(source)
+        assert terms.from_expression(terms.to_expression(built)) is built, source
+
+
+def test_loose_index():
+    with pytest.raises(ValueError):
+        terms.to_expression(terms.Var(0))
+
+
+def test_table_drops_unused_terms():
+    before = terms.interned()
+    built = term('^u.^v.^w.w (v u) (' * 10 + 'u' + ')' * 10)
+    assert terms.interned() > before
+    del built
+    gc.collect()
+    assert terms.interned() == before
+
+
+def test_deep_terms():
+    built = term('^x.' + 'x (' * DEPTH + 'x' + ')' * DEPTH)
+    assert built.size == 2 * DEPTH + 2
+    assert term(str(built)) is built
@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+
+from minichurch.evaluator import budget, strategies, syntax, terms, trace
+from minichurch.parser import parser
+
+SOURCE = '^w.(w ((^e.e) (^d.d))) ((^x.x) w) ((^f.^x.f (f x)) (^y.y) w)'
+
+
+def record(source: str, every: int = 0, target: str = syntax.NF) -> list:
+    stream = io.StringIO()
+    expression = parser.build_source(source)
+    recorder = trace.Trace(stream, expression, every, target=target)
+    recorder.expression = strategies.evaluate(expression, showstep=recorder, target=target)
+    recorder.close()
+    return stream.getvalue().splitlines()
+
+
+def test_records():
+    lines = record(SOURCE, every=2)
+    records = [json.loads(line) for line in lines]
+    assert records[0]['type'] == 'start' and records[0]['target'] == syntax.NF
+    steps = [entry for entry in records if entry['type'] == 'step']
+    assert [entry['step'] for entry in steps] == list(range(1, len(steps) + 1))
+    assert sum(entry['type'] == 'term' for entry in records) == len(steps) // 2
+    assert records[-1] == {'type': 'end', 'steps': len(steps), 'term': str(strategies.evaluate(parser.build_source(SOURCE)))}
+
+
+def test_replay_matches_the_solver():
+    lines = record(SOURCE)
+    steps = json.loads(lines[-1])['steps']
+    assert str(trace.replay(lines, 0)) == str(parser.build_source(SOURCE))
+    for step in range(1, steps):
+        # the reference solver stopped after as many steps reached the same term
+        partial = strategies.evaluate(parser.build_source(SOURCE), limits=budget.Budget(steps=step))
+        assert terms.from_expression(trace.replay(lines, step)) is terms.from_expression(partial.term)
+    assert str(trace.replay(lines)) == json.loads(lines[-1])['term']
+
+
+def test_replay_to_a_head_normal_form():
+    lines = record('^a.a ((^x.x) a) ((^x.^y.y) a)', target=syntax.HNF)
+    assert str(trace.replay(lines)) == json.loads(lines[-1])['term']
+
+
+def test_replay_rejects_other_traces():
+    lines = record(SOURCE)
+    with pytest.raises(ValueError):
+        trace.replay(lines[1:])
+    with pytest.raises(ValueError):
+        trace.replay(lines, json.loads(lines[-1])['steps'] + 1)
+    changed = [json.loads(line) for line in lines]
+    changed[1]['position'] += 'l'
+    with pytest.raises(ValueError):
+        trace.replay(json.dumps(entry) for entry in changed)